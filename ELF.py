@@ -1,68 +1,168 @@
 from ElfHdr import ElfHdr
 from ElfSegmentTable import ElfSegmentTable, ElfSegment
-from ElfSectionTable import ElfSectionTable, ElfSection
+from ElfSectionTable import ElfSectionTable, ElfSection, ElfSectionList
+from ElfLayout import ElfLayout
+from ElfSymbolTable import ElfSymbolTable
+from ElfNotes import ElfNote, parse_notes
+from ElfValidation import ElfIssues
+from ElfStats import phase
+from bisect import bisect_left
 import mmap
-from typing import List
+from typing import List, Tuple
 
 class ELF:
 
-    def __init__(self, filename: str):
-        self._f = open(filename, 'rb')
-        self._mm = mmap.mmap(self._f.fileno(), 0, flags=mmap.MAP_PRIVATE, prot=mmap.PROT_READ)
-
+    def __init__(self, filename: str, mm: 'mmap.mmap' = None, strict: bool = False,
+                 stats: 'ElfStats' = None):
+        # mm lets the object be parsed out of memory mapped by someone
+        # else, e.g. a member of an archive, who then remains its owner;
+        # stats, when given, collects the time spent in each phase
+        self._filename = filename
+        self._stats = stats
+        if mm is None:
+            self._f = open(filename, 'rb')
+            try:
+                self._mm = mmap.mmap(self._f.fileno(), 0, flags=mmap.MAP_PRIVATE, prot=mmap.PROT_READ)
+            except (ValueError, OSError):
+                self._f.close()
+                raise
+        else:
+            self._f = None
+            self._mm = mm
+
+        # Every offset, size and count is checked against the file before
+        # it is used. Only a broken ELF header stops the parse, any other
+        # problem is recorded in issues and the component left out (or
+        # raised when strict).
+        self._issues = ElfIssues(strict)
+        try:
+            self.parse()
+        except Exception:
+            self.__exit__(None, None, None)
+            raise
+
+        # built on first use
+        self._symtabs = None
+
+    def parse(self):
         self._ehdr = ElfHdr()
-        self._ehdr.parse(self._mm)
+        with phase(self._stats, 'ElfHdr.parse', objects=1) as p:
+            self._ehdr.parse(self._mm)
+            p.bytes = self._ehdr.get_size()
+        elf32 = self._ehdr.get_class() == 'ELF32'
 
         # segments only play a part for the process image,
         # in
         self._segtab = ElfSegmentTable(self._ehdr)
-        self._segtab.parse(self._mm)
+        self._segtab_ok = self._issues.check_table('segment table', self._segtab.offset, self._segtab.num,
+                                                   self._segtab.entsize, 32 if elf32 else 56, self.size)
+        if self._segtab_ok:
+            with phase(self._stats, 'ElfSegmentTable.parse', self._segtab.size, self._segtab.num):
+                self._segtab.parse(self._mm)
         self._sectab = ElfSectionTable(self._ehdr)
-        self._sectab.parse(self._mm)
+        self._sectab_ok = self._issues.check_table('section table', self._sectab.offset, self._sectab.num,
+                                                   self._sectab.entsize, 40 if elf32 else 64, self.size)
+        if self._sectab_ok:
+            with phase(self._stats, 'ElfSectionTable.parse', self._sectab.size, self._sectab.num):
+                self._sectab.parse(self._mm)
 
         # The section table and the sections are independent
         # components of the ELF file, so it's not really advantageous
         # to consider the sections a part of the section table
-        self._sections = self.parse_sections(self._mm)
-        self._segments = self.parse_segments(self._mm)
+        with phase(self._stats, 'parse_sections'):
+            self._sections = self.parse_sections(self._mm)
+        with phase(self._stats, 'parse_segments') as p:
+            self._segments = self.parse_segments(self._mm)
+            p.objects = len(self._segments)
 
     def parse_segments(self, mm: 'mmap.mmap') -> List['ElfSegment']:
         segments = []
+        if not self._segtab or not self._segtab_ok:
+            # relocatable objects have no program headers
+            return segments
         end = self._segtab.offset + self._segtab.num * self._segtab._entsize
-        for offset in range(self._segtab.offset, end, self._segtab.entsize):
-            segment = ElfSegment(self._ehdr.get_class())
+        for index, offset in enumerate(range(self._segtab.offset, end, self._segtab.entsize)):
+            segment = ElfSegment(self._ehdr.get_class(), index)
             segment.parse(mm, offset)
             if segment.get_type() != 'NULL':
+                self._issues.check_range('segment ' + str(index), segment.get_offset(),
+                                         segment.get_filesz(), self.size)
                 segments.append(segment)
         segments.sort(key=lambda segment: segment.offset)
         return segments
 
-    def parse_sections(self, mm: 'mmap.mmap') -> List['ElfSection']:
-        names = self.get_names_section_hdr(mm).content
-
-        sections = []
-        end = self._sectab.offset + self._sectab.num * self._sectab.entsize
-        for offset in range(self._sectab.offset, end, self._sectab.entsize):
-            section = ElfSection(self._ehdr.get_class())
-            section.parse(mm, offset, names)
-            if section.type != 'NULL':
-                sections.append(section)
-
-        sections.sort(key=lambda section: section.offset)
-        return sections
+    def parse_sections(self, mm: 'mmap.mmap') -> 'ElfSectionList':
+        # core files have no section headers
+        usable = self._sectab and self._sectab_ok
+        return ElfSectionList(self._sectab if usable else None, mm, self._issues, self.size, self._stats)
 
     def get_names_section_hdr(self, mm: 'mmap.mmap') -> 'ElfSection':
-        section = ElfSection(self._ehdr.get_class())
-        offset = self._sectab.offset + self._sectab.strndx * self._sectab.entsize
-        section.parse(mm, offset)
-        return section
+        return self._sections[self._sectab.strndx]
+
+    def get_notes(self) -> List['ElfNote']:
+        # from the NOTE segments, or the NOTE sections of relocatable objects
+        notes = []
+        for segment in self.segments:
+            if segment.get_type() == 'NOTE':
+                start = segment.get_offset()
+                content = self._mm[start:start+segment.get_filesz()]
+                self._parse_notes(notes, content, start, segment.get_align())
+        if not self.segments:
+            for section in self.sections:
+                if section.type == 'NOTE':
+                    self._parse_notes(notes, section.content, section.offset, section.addralign)
+        return notes
+
+    def _parse_notes(self, notes: List['ElfNote'], content: bytes, offset: int, align: int):
+        try:
+            for note in parse_notes(content, offset, align):
+                notes.append(note)
+        except ValueError as e:
+            self._issues.add('notes', str(e), offset)
+
+    def get_section_by_index(self, index: int) -> 'ElfSection':
+        if not 0 < index < self._sections.num:
+            return None
+        section = self._sections[index]
+        return section if section.type != 'NULL' else None
+
+    def get_symbol_tables(self) -> List['ElfSymbolTable']:
+        if self._symtabs is None:
+            with phase(self._stats, 'symbol tables') as p:
+                self._symtabs = self._parse_symbol_tables()
+                p.bytes = sum(symtab.section.size for symtab in self._symtabs)
+                p.objects = sum(len(symtab) for symtab in self._symtabs)
+        return self._symtabs
+
+    def _parse_symbol_tables(self) -> List['ElfSymbolTable']:
+        symtabs = []
+        for section in self.sections:
+            if section.type in ('SYMTAB', 'DYNSYM'):
+                component = 'section ' + str(section.index)
+                strtab = self.get_section_by_index(section.link)
+                if strtab is None:
+                    self._issues.add(component, 'no string table at index {}'.format(section.link))
+                    continue
+                xindex = None
+                for other in self.sections:
+                    if other.type == 'SYMTAB_SHNDX' and other.link == section.index:
+                        xindex = other
+                symtab = ElfSymbolTable(self._ehdr.get_class(), section, strtab, xindex)
+                try:
+                    symtab.parse()
+                except ValueError as e:
+                    self._issues.add(component, str(e))
+                    continue
+                symtabs.append(symtab)
+        return symtabs
 
     def __enter__(self):
         return self
 
     def __exit__(self, exc_type, exc_val, exc_tb):
-        self._mm.close()
-        self._f.close()
+        if self._f is not None:
+            self._mm.close()
+            self._f.close()
 
     def get_components_by_offset(self):
         components = []
@@ -74,6 +174,61 @@ class ELF:
         components.sort(key=lambda component: component.offset)
         return components
 
+    def get_layout(self) -> 'ElfLayout':
+        return ElfLayout(self)
+
+    def get_segment_mapping(self) -> List[Tuple[int, 'ElfSegment', List['ElfSection']]]:
+        # Like the 'Section to Segment mapping' of readelf -l: (program
+        # header index, segment, sections), in program header order. Instead of
+        # testing every section against every segment, the sections are
+        # kept sorted by file offset and (for NOBITS) by address, so each
+        # segment only looks at the sections falling inside its range.
+        by_offset = sorted((s for s in self.sections if s.type != 'NOBITS'),
+                           key=lambda section: section.offset)
+        offsets = [s.offset for s in by_offset]
+        by_address = sorted((s for s in self.sections if s.type == 'NOBITS'),
+                            key=lambda section: section.address)
+        addresses = [s.address for s in by_address]
+
+        mapping = []
+        for segment in sorted(self.segments, key=lambda segment: segment.index):
+            start = segment.get_offset()
+            low = bisect_left(offsets, start)
+            # an empty segment still holds the empty sections at its start
+            high = bisect_left(offsets, start + max(segment.get_filesz(), 1))
+            candidates = by_offset[low:high]
+
+            start = segment.get_vaddr()
+            low = bisect_left(addresses, start)
+            high = bisect_left(addresses, start + max(segment.get_memsz(), 1))
+            candidates += by_address[low:high]
+
+            candidates.sort(key=lambda section: (section.address, section.offset))
+            mapping.append((segment.index, segment, [s for s in candidates if segment.contains(s)]))
+        return mapping
+
+    @property
+    def issues(self) -> 'ElfIssues':
+        return self._issues
+
+    @property
+    def filename(self):
+        return self._filename
+
+    @property
+    def mm(self):
+        return self._mm
+
+    @property
+    def has_file(self) -> bool:
+        # whether filename is the file mapped here, which worker processes
+        # can map again; not for archive members or standard input
+        return self._f is not None
+
+    @property
+    def size(self):
+        return len(self._mm)
+
     @property
     def segment_table(self):
         return self._segtab
@@ -1,39 +1,391 @@
 from ELF import ELF
+from ElfSizeReport import ElfSizeReport
+from ElfStrings import ElfStrings
+from ElfSearch import ElfSearch
+from ElfCore import ElfCore
+from ElfDebugLine import ElfDebugLine
+from ElfDemangle import demangle
+from ElfEhFrame import ElfEhFrame
+from ElfEntropy import ElfEntropy, ElfEntropyMap
+from ElfFunctions import ElfFunctions
+from ElfHardening import HardeningSummary, check_elf, check_files
+from ElfQuery import ElfQuery
+from ElfVersions import ElfVersions, check_sysroot
+from ElfArchive import ElfArchive, ARMAG
+from ElfStats import ElfStats
+from ElfStream import ElfStream, StreamError, scan_tar, DEFAULT_LIMIT
+import argparse
+import json
 import mmap
 import os
 import sys
+import tarfile
 
 
 class ELFviewer:
 
-    def __init__(self, filename: str):
-        if not os.path.exists(filename):
+    def __init__(self, filename: str, stats: 'ElfStats' = None, limit: int = DEFAULT_LIMIT):
+        # filename '-' is standard input, read through a buffer of limit
+        # bytes
+        if filename != '-' and not os.path.exists(filename):
             print('ERROR: file ' + filename + ' does not exist')
             sys.exit(-1)
 
-        if not os.access(filename, os.R_OK):
+        if filename != '-' and not os.access(filename, os.R_OK):
             print('ERROR: file ' + filename + ' is not readable')
             sys.exit(-1)
 
         self._filename = filename
+        self._stats = stats
+        self._limit = limit
+
+    def open(self) -> 'ELF':
+        # an ElfStream, like an ELF, gives the ELF object to a with block
+        if self._filename == '-':
+            return ElfStream(sys.stdin.buffer, limit=self._limit, stats=self._stats)
+        return ELF(self._filename, stats=self._stats)
 
     def run(self):
-        with ELF(self._filename) as elf:
+        if self._filename != '-':
+            with open(self._filename, 'rb') as f:
+                if f.read(len(ARMAG)) == ARMAG:
+                    return self.archive()
+
+        with self.open() as elf:
             print(elf.header)
             for segment in elf.segments:
                 print(segment)
+            if elf.header.get_type() == 'CORE (Core file)':
+                print(ElfCore(elf))
             for section in elf.sections:
                 print(section)
 
-            #for comp in elf.get_components_by_offset():
-            #    print(comp)
+            print('Section to Segment mapping')
+            print('---')
+            for i, segment, sections in elf.get_segment_mapping():
+                names = ' '.join(section.name for section in sections)
+                print('{:02d} {:<12s} {}'.format(i, segment.get_type(), names))
+            print()
+
+            print(elf.get_layout())
+
+            if elf.issues:
+                print('Issues')
+                print('---')
+                for issue in elf.issues:
+                    print(issue)
+
+    def archive(self):
+        with ElfArchive(self._filename) as archive:
+            print('Archive ' + self._filename + ' (' + str(len(archive)) + ' members)')
+            print('---')
+            for member in archive:
+                try:
+                    with archive.open_member(member) as elf:
+                        names = ' '.join(section.name for section in elf.sections)
+                except ValueError as e:
+                    names = '(' + str(e) + ')'
+                print('{} 0x{:08x} {:>10d} {}'.format(member.name, member.offset, member.size, names))
+
+    def sizes(self, top: int):
+        with self.open() as elf:
+            print(ElfSizeReport(elf, top=top))
+
+    def search(self, signatures: list, jobs: int):
+        search = ElfSearch(signatures)
+        if self._filename == '-':
+            with self.open() as elf:
+                results = [(self._filename, list(search.search(elf)), None)]
+        else:
+            results = search.search_files([self._filename], jobs)
+        for filename, hits, error in results:
+            if error:
+                print('ERROR: ' + filename + ': ' + error)
+                continue
+            for hit in hits:
+                address = '0x{:x}'.format(hit.address) if hit.address is not None else '-'
+                print('{} {:<16s} 0x{:08x} {:>12s} {}'.format(filename, hit.section, hit.offset,
+                                                                address, hit.pattern))
+
+    def query(self, expression: str, jobs: int):
+        try:
+            query = ElfQuery(expression)
+        except ValueError as e:
+            print('ERROR: ' + str(e))
+            sys.exit(-1)
+        if self._filename == '-':
+            with self.open() as elf:
+                results = [(self._filename, query.select(elf), None)]
+        else:
+            results = query.query_files([self._filename], jobs)
+        for filename, matches, error in results:
+            if error:
+                print('ERROR: ' + filename + ': ' + error)
+                continue
+            for match in matches:
+                print('{} {:<7s} {:>5d} {:<24s} 0x{:08x} {:>10d}'.format(
+                    filename, match.kind, match.index, match.name, match.offset, match.size))
+
+    def hardening(self, jobs: int):
+        # one line per file, then the counts over all of them for directories
+        if self._filename == '-':
+            with self.open() as elf:
+                return self._print_hardening(self._filename, check_elf(elf))
+        summary = HardeningSummary()
+        for filename, hardening, error in check_files([self._filename], jobs):
+            if error:
+                print('ERROR: ' + filename + ': ' + error)
+                summary.add_error()
+                continue
+            summary.add(hardening)
+            self._print_hardening(filename, hardening)
+        if os.path.isdir(self._filename):
+            print()
+            print(summary, end='')
+
+    @staticmethod
+    def _print_hardening(filename: str, hardening: 'Hardening'):
+        canary = '-' if hardening.canary is None else 'yes' if hardening.canary else 'no'
+        fortified = '-' if hardening.fortified is None else str(hardening.fortified)
+        print('{} pie={} nx={} relro={} canary={} fortified={}{}{}'.format(
+            filename, hardening.pie, 'yes' if hardening.nx else 'no', hardening.relro, canary, fortified,
+            ' rpath=' + hardening.rpath if hardening.rpath is not None else '',
+            ' runpath=' + hardening.runpath if hardening.runpath is not None else ''))
+
+    def tar(self, hardening: bool):
+        # the ELF members of a tar file or stream, '-' for standard input,
+        # as they go by: one line each, or their hardening and its counts
+        f = sys.stdin.buffer if self._filename == '-' else open(self._filename, 'rb')
+        summary = HardeningSummary()
+        func = check_elf if hardening else self._describe
+        try:
+            for name, result, error in scan_tar(f, func, limit=self._limit):
+                if error:
+                    print('ERROR: ' + name + ': ' + error)
+                    summary.add_error()
+                elif hardening:
+                    summary.add(result)
+                    self._print_hardening(name, result)
+                else:
+                    print(name + ' ' + result)
+        except tarfile.TarError as e:
+            print('ERROR: ' + str(e))
+            sys.exit(-1)
+        finally:
+            if f is not sys.stdin.buffer:
+                f.close()
+        if hardening:
+            print()
+            print(summary, end='')
+
+    @staticmethod
+    def _describe(elf: 'ELF') -> str:
+        header = elf.header
+        return '{} {} {} {} segments {} sections'.format(
+            header.get_class(), header.get_type().split()[0], header.get_machine(),
+            len(elf.segments), len(elf.sections))
+
+    def lines(self, addresses: list):
+        with self.open() as elf:
+            try:
+                debug_line = ElfDebugLine(elf)
+            except ValueError as e:
+                print('ERROR: ' + str(e))
+                sys.exit(-1)
+            for address, found in zip(addresses, debug_line.lookup_many(addresses)):
+                where = '{}:{}'.format(found.file, found.line) if found else '??:0'
+                print('0x{:x} {}'.format(address, where))
+
+    def unwind(self, addresses: list):
+        with self.open() as elf:
+            try:
+                eh_frame = ElfEhFrame(elf)
+            except ValueError as e:
+                print('ERROR: ' + str(e))
+                sys.exit(-1)
+            for address in addresses:
+                fde = eh_frame.lookup(address)
+                print('0x{:x} {}'.format(address, '{} {}'.format(fde, fde.cie) if fde else '-'))
+
+    def versions(self):
+        with self.open() as elf:
+            versions = ElfVersions(elf)
+            for definition in versions.get_definitions():
+                print('defined  {:>3d} {}{}'.format(definition.index, definition.name,
+                                                    ' : ' + ' '.join(definition.parents) if definition.parents else ''))
+            for requirement in versions.get_requirements():
+                print('required {:>3d} {} from {}'.format(requirement.index, requirement.name, requirement.file))
+
+    def abi_report(self, jobs: int):
+        # the highest version required per family, then what the libraries
+        # found next to the file (or below the directory) do not provide
+        if self._filename == '-':
+            print('ERROR: --abi-report reads the libraries next to the file, give a path instead of -')
+            sys.exit(-1)
+        for filename, report, error in check_sysroot([self._filename], jobs):
+            if error:
+                print('ERROR: ' + filename + ': ' + error)
+                continue
+            if report is None:
+                continue
+            required = ' '.join(report.max_required[family] for family in sorted(report.max_required))
+            print('{} {}'.format(filename, required or '-'))
+            for library, version in report.missing:
+                print('    missing {} from {}'.format(version, library))
+
+    def functions(self):
+        # one line per function: address, size, how many distinct functions
+        # call it and how many it calls
+        with self.open() as elf:
+            functions = ElfFunctions(elf)
+            graph = functions.get_call_graph()
+            called_by = {}
+            for callees in graph.values():
+                for callee in callees:
+                    called_by[callee] = called_by.get(callee, 0) + 1
+            for function in functions.get_functions():
+                name = demangle(function.name) if function.name else 'sub_{:x}'.format(function.start)
+                print('0x{:08x} {:>8d} {:>6d} {:>6d} {}'.format(
+                    function.start, function.end - function.start, called_by.get(function.start, 0),
+                    len(graph.get(function.start, ())), name))
+
+    def entropy(self, sections: list, as_json: bool, jobs: int):
+        with self.open() as elf:
+            entropy = ElfEntropy(elf, sections, jobs=jobs)
+            if as_json:
+                print(json.dumps(entropy.to_dict()))
+            else:
+                print(entropy, end='')
+
+    def entropy_map(self, window: int, stride: int, threshold: float, as_json: bool):
+        with self.open() as elf:
+            try:
+                entropy_map = ElfEntropyMap(elf, window, stride)
+            except ValueError as e:
+                print('ERROR: ' + str(e))
+                sys.exit(-1)
+            if as_json:
+                for window in entropy_map:
+                    print(json.dumps(window._asdict()))
+                return
+            for region in entropy_map.find_regions(threshold):
+                print('0x{:08x}-0x{:08x} {:>10d} {:>6.3f} {}'.format(
+                    region.start, region.end, region.end - region.start, region.max_entropy,
+                    ', '.join(region.components)))
+            print('{} bytes at {:.1f} MB/s'.format(elf.size, entropy_map.throughput / (1 << 20)),
+                  file=sys.stderr)
+
+    def tui(self):
+        # curses is not there on every platform, so only loaded when asked for
+        from ElfTui import ElfTui
+        with self.open() as elf:
+            ElfTui(elf).run()
+
+    def strings(self, min_length: int, sections: list, jobs: int):
+        with self.open() as elf:
+            for match in ElfStrings(elf, min_length, ('ascii', 'utf-16le'), sections, jobs=jobs):
+                print('{:<20s} 0x{:08x} {}'.format(match.section, match.offset, match.value))
 
 
-USAGE = 'python3 elfviewer <filename>'
+parser = argparse.ArgumentParser(prog='elfviewer')
+parser.add_argument('filename', help="ELF file, '-' for standard input")
+parser.add_argument('--sizes', metavar='N', type=int, nargs='?', const=10,
+                    help='only report where the bytes go, top N entries (default 10)')
+parser.add_argument('--strings', metavar='N', type=int, nargs='?', const=4,
+                    help='only print the strings of at least N characters (default 4)')
+parser.add_argument('--search', metavar='HEX', action='append',
+                    help="byte signature to look for in executable sections, '??' for any "
+                         'byte, may be repeated; filename may be a directory')
+parser.add_argument('--section', metavar='NAME', action='append',
+                    help='section to scan, may be repeated (default: all allocated ones for --strings, '
+                         'all with content for --entropy)')
+parser.add_argument('--filter', metavar='EXPR',
+                    help="only print the sections, segments or files matching the expression, e.g. "
+                         "'segment.type == LOAD and segment.flags has WE'; filename may be a directory")
+parser.add_argument('--hardening', action='store_true',
+                    help='only print the PIE, NX, RELRO, stack protector, fortify and RPATH status; '
+                         'filename may be a directory, then summed up')
+parser.add_argument('--tar', action='store_true',
+                    help="only print a line for each ELF member of the tar file (compressed or not; "
+                         "'-' for standard input) as it is read, or with --hardening its hardening")
+parser.add_argument('--buffer', metavar='BYTES', type=int, default=DEFAULT_LIMIT,
+                    help='bytes of a file read from standard input or a tar stream held in memory; of '
+                         'bigger files only the headers, tables and the last BYTES read are kept '
+                         '(default 64 MiB)')
+parser.add_argument('--lines', metavar='ADDR', type=lambda value: int(value, 16), action='append',
+                    help='only print the source file and line of the hex address, may be repeated')
+parser.add_argument('--unwind', metavar='ADDR', type=lambda value: int(value, 16), action='append',
+                    help='only print the .eh_frame FDE covering the hex address, may be repeated')
+parser.add_argument('--versions', action='store_true',
+                    help='only print the symbol versions defined and required')
+parser.add_argument('--abi-report', action='store_true',
+                    help='only print the highest symbol version required of each family and the ones '
+                         'missing from the libraries; filename may be a directory (sysroot)')
+parser.add_argument('--functions', action='store_true',
+                    help='only print the functions with the number of their callers and callees')
+parser.add_argument('--entropy', action='store_true',
+                    help='only print the entropy, zero bytes and runs of zeros of each section '
+                         '(or of the --section ones)')
+parser.add_argument('--entropy-map', metavar='WINDOW', type=int, nargs='?', const=1 << 16,
+                    help='only print the regions of the file where a sliding window of WINDOW bytes '
+                         '(default 65536) reaches the --threshold, with what they overlap')
+parser.add_argument('--stride', metavar='N', type=int,
+                    help='bytes the --entropy-map window moves by (default: the window)')
+parser.add_argument('--threshold', metavar='BITS', type=float, default=7.2,
+                    help='entropy in bits per byte of the --entropy-map regions (default 7.2)')
+parser.add_argument('--json', action='store_true',
+                    help='print --entropy as JSON, with the byte histograms, and --entropy-map as '
+                         'a JSON line per window')
+parser.add_argument('--tui', action='store_true',
+                    help='browse the headers, sections and hexdump interactively')
+parser.add_argument('--stats', action='store_true',
+                    help='print the time, bytes and objects of each parse phase to stderr')
+parser.add_argument('--trace', metavar='FILE',
+                    help='write the parse phases as a Chrome trace (chrome://tracing, Perfetto)')
+parser.add_argument('-j', '--jobs', type=int, default=1,
+                    help='number of worker processes for the scans')
+args = parser.parse_args()
 
-if len(sys.argv) != 2:
-    print(USAGE)
+stats = ElfStats(trace=bool(args.trace)) if args.stats or args.trace else None
+viewer = ELFviewer(args.filename, stats, args.buffer)
+try:
+    if args.sizes is not None:
+        viewer.sizes(args.sizes)
+    elif args.search:
+        viewer.search(args.search, args.jobs)
+    elif args.filter:
+        viewer.query(args.filter, args.jobs)
+    elif args.tar:
+        viewer.tar(args.hardening)
+    elif args.hardening:
+        viewer.hardening(args.jobs)
+    elif args.lines:
+        viewer.lines(args.lines)
+    elif args.unwind:
+        viewer.unwind(args.unwind)
+    elif args.versions:
+        viewer.versions()
+    elif args.abi_report:
+        viewer.abi_report(args.jobs)
+    elif args.functions:
+        viewer.functions()
+    elif args.entropy:
+        viewer.entropy(args.section, args.json, args.jobs)
+    elif args.entropy_map is not None:
+        viewer.entropy_map(args.entropy_map, args.stride, args.threshold, args.json)
+    elif args.tui:
+        viewer.tui()
+    elif args.strings is not None:
+        viewer.strings(args.strings, args.section, args.jobs)
+    else:
+        viewer.run()
+except StreamError as e:
+    # a scan over streamed input that went past the bytes the buffer holds
+    print('ERROR: ' + str(e) + ' (the input is bigger than the buffer of ' + str(args.buffer) +
+          ' bytes, raise --buffer above its size)')
     sys.exit(-1)
 
-viewer = ELFviewer(sys.argv[1])
-viewer.run()
\ No newline at end of file
+if args.stats:
+    print(stats, file=sys.stderr, end='')
+if args.trace:
+    stats.write_trace(args.trace)
@@ -0,0 +1,235 @@
+from concurrent.futures import ProcessPoolExecutor
+from ELF import ELF
+import mmap
+import os
+from typing import Callable, Dict, Iterator, List, Tuple
+
+ARMAG = b'!<arch>\n'
+ARMAG_THIN = b'!<thin>\n'
+ARFMAG = b'`\n'
+HEADER_SIZE = 60
+
+
+class MemberView:
+    # A window on the archive mmap with the few mmap methods the parsers
+    # use, with offsets relative to the start of the member, so that an
+    # ELF object can be parsed in place without copying the member.
+
+    def __init__(self, mm: 'mmap.mmap', start: int, size: int):
+        self._mm = mm
+        self._start = start
+        self._size = size
+        self._pos = 0
+
+    def seek(self, pos: int):
+        self._pos = pos
+
+    def read(self, n: int) -> bytes:
+        start = self._start + min(self._pos, self._size)
+        end = self._start + min(self._pos + n, self._size)
+        self._pos += n
+        return self._mm[start:end]
+
+    def find(self, sub: bytes, start: int = 0, end: int = None) -> int:
+        end = self._size if end is None else min(end, self._size)
+        found = self._mm.find(sub, self._start + start, self._start + end)
+        return found - self._start if found >= 0 else -1
+
+    def __getitem__(self, item):
+        if isinstance(item, slice):
+            start, stop, step = item.indices(self._size)
+            return self._mm[self._start + start:self._start + stop:step]
+        if item < 0:
+            item += self._size
+        if not 0 <= item < self._size:
+            raise IndexError('index out of range')
+        return self._mm[self._start + item]
+
+    def __len__(self):
+        return self._size
+
+    def close(self):
+        pass
+
+
+class ArchiveMember:
+
+    def __init__(self, name: str, header_offset: int, offset: int, size: int):
+        self._name = name
+        self._header_offset = header_offset
+        self._offset = offset
+        self._size = size
+
+    def __repr__(self):
+        return '<MEMBER {} at 0x{:x} ({} bytes)>'.format(self.name, self.offset, self.size)
+
+    @property
+    def name(self) -> str:
+        return self._name
+
+    @property
+    def header_offset(self) -> int:
+        return self._header_offset
+
+    @property
+    def offset(self) -> int:
+        return self._offset
+
+    @property
+    def size(self) -> int:
+        return self._size
+
+
+class ElfArchive:
+    # A static library (ar archive, GNU or BSD flavour). The archive is
+    # mapped once; listing the members only reads their 60 byte headers,
+    # and each member opens as an ELF object over a MemberView of that
+    # same mapping.
+
+    def __init__(self, filename: str):
+        self._filename = filename
+        self._f = open(filename, 'rb')
+        try:
+            self._mm = mmap.mmap(self._f.fileno(), 0, flags=mmap.MAP_PRIVATE, prot=mmap.PROT_READ)
+        except (ValueError, OSError):
+            self._f.close()
+            raise
+
+        self._members = []
+        self._symtab = None     # (offset, size) of the symbol index
+        self._symtab64 = False
+        self._longnames = b''
+        try:
+            magic = self._mm[:8]
+            if magic == ARMAG_THIN:
+                raise ValueError('thin archives do not contain their members')
+            if magic != ARMAG:
+                raise ValueError('not an archive')
+            self.parse()
+        except Exception:
+            self.__exit__(None, None, None)
+            raise
+
+    def parse(self):
+        mm = self._mm
+        pos = len(ARMAG)
+        while pos + HEADER_SIZE <= len(mm):
+            header = mm[pos:pos+HEADER_SIZE]
+            if header[58:60] != ARFMAG:
+                raise ValueError('bad member header at 0x{:x}'.format(pos))
+            name = header[0:16].rstrip(b' ')
+            size = int(header[48:58].strip() or b'0')
+            data = pos + HEADER_SIZE
+            if size < 0 or data + size > len(mm):
+                raise ValueError('bad member size {} at 0x{:x}'.format(size, pos))
+
+            if name == b'/' or name == b'/SYM64/':
+                self._symtab = (data, size)
+                self._symtab64 = name == b'/SYM64/'
+            elif name == b'//':
+                self._longnames = mm[data:data+size]
+            elif name.startswith(b'#1/'):
+                # BSD: the name precedes the data and counts in its size
+                namelen = int(name[3:])
+                if not 0 <= namelen <= size:
+                    raise ValueError('bad member name length {} at 0x{:x}'.format(namelen, pos))
+                member = mm[data:data+namelen].rstrip(b'\x00').decode('utf-8', 'replace')
+                if not member.startswith('__.SYMDEF'):
+                    self._members.append(ArchiveMember(member, pos, data + namelen, size - namelen))
+            else:
+                self._members.append(ArchiveMember(self._member_name(name), pos, data, size))
+
+            # members are 2-byte aligned
+            pos = data + size + (size & 1)
+
+    def _member_name(self, name: bytes) -> str:
+        if name.startswith(b'/') and name[1:].isdigit():
+            start = int(name[1:])
+            end = self._longnames.find(b'/\n', start)
+            name = self._longnames[start:end if end >= 0 else len(self._longnames)]
+        elif name.endswith(b'/'):
+            name = name[:-1]
+        return name.decode('utf-8', 'replace')
+
+    def get_symbol_index(self) -> Dict[str, 'ArchiveMember']:
+        # symbol name to defining member, from the GNU armap
+        if self._symtab is None:
+            return {}
+        offset, size = self._symtab
+        width = 8 if self._symtab64 else 4
+        data = self._mm[offset:offset+size]
+        count = int.from_bytes(data[:width], 'big')
+        table_end = width + count * width
+        by_header = {member.header_offset: member for member in self._members}
+        names = data[table_end:].split(b'\x00')
+
+        index = {}
+        for i in range(count):
+            header = int.from_bytes(data[width + i*width:width + (i+1)*width], 'big')
+            member = by_header.get(header)
+            if member is not None and i < len(names):
+                index.setdefault(names[i].decode('utf-8', 'replace'), member)
+        return index
+
+    def open_member(self, member: 'ArchiveMember') -> 'ELF':
+        view = MemberView(self._mm, member.offset, member.size)
+        return ELF(self._filename + '(' + member.name + ')', view)
+
+    def __iter__(self) -> Iterator['ArchiveMember']:
+        return iter(self._members)
+
+    def __len__(self):
+        return len(self._members)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self._mm.close()
+        self._f.close()
+
+    def map(self, func: Callable, jobs: int = None, chunks_per_job: int = 4) -> List[Tuple[str, object, str]]:
+        # func(elf) on every ELF member, returning (name, result, error)
+        # in member order. With jobs > 1 the members are split in runs
+        # handed to worker processes, each mapping the archive once.
+        if jobs == 1 or len(self._members) <= 1:
+            return _map_views(self._filename, self._mm, [(m.name, m.offset, m.size) for m in self._members], func)
+
+        members = [(m.name, m.offset, m.size) for m in self._members]
+        workers = jobs or os.cpu_count() or 1
+        n = max(1, len(members) // (workers * chunks_per_job))
+        runs = [members[i:i+n] for i in range(0, len(members), n)]
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            results = []
+            for part in executor.map(_map_members, [self._filename] * len(runs), runs, [func] * len(runs)):
+                results.extend(part)
+            return results
+
+    @property
+    def filename(self) -> str:
+        return self._filename
+
+    @property
+    def members(self) -> List['ArchiveMember']:
+        return self._members
+
+
+def _map_views(filename: str, mm: 'mmap.mmap', members: List[tuple], func: Callable) -> List[Tuple[str, object, str]]:
+    results = []
+    for name, offset, size in members:
+        try:
+            with ELF(filename + '(' + name + ')', MemberView(mm, offset, size)) as elf:
+                results.append((name, func(elf), None))
+        except Exception as e:
+            results.append((name, None, '{}: {}'.format(type(e).__name__, e)))
+    return results
+
+
+def _map_members(filename: str, members: List[tuple], func: Callable) -> List[Tuple[str, object, str]]:
+    # runs in a worker process, which maps the archive on its own
+    with open(filename, 'rb') as f:
+        mm = mmap.mmap(f.fileno(), 0, flags=mmap.MAP_PRIVATE, prot=mmap.PROT_READ)
+        try:
+            return _map_views(filename, mm, members, func)
+        finally:
+            mm.close()
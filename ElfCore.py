@@ -0,0 +1,205 @@
+from bisect import bisect_right
+from typing import Dict, List, NamedTuple
+
+# general purpose registers in the order of elf_gregset_t
+X86_64_REGS = (
+    'r15', 'r14', 'r13', 'r12', 'rbp', 'rbx', 'r11', 'r10', 'r9', 'r8',
+    'rax', 'rcx', 'rdx', 'rsi', 'rdi', 'orig_rax', 'rip', 'cs', 'eflags',
+    'rsp', 'ss', 'fs_base', 'gs_base', 'ds', 'es', 'fs', 'gs',
+)
+AARCH64_REGS = tuple('x{}'.format(i) for i in range(31)) + ('sp', 'pc', 'pstate')
+
+EM_X86_64 = 62
+EM_AARCH64 = 183
+
+AUXV_TYPES = {
+    0: 'AT_NULL', 3: 'AT_PHDR', 4: 'AT_PHENT', 5: 'AT_PHNUM', 6: 'AT_PAGESZ',
+    7: 'AT_BASE', 8: 'AT_FLAGS', 9: 'AT_ENTRY', 11: 'AT_UID', 12: 'AT_EUID',
+    13: 'AT_GID', 14: 'AT_EGID', 15: 'AT_PLATFORM', 16: 'AT_HWCAP',
+    17: 'AT_CLKTCK', 23: 'AT_SECURE', 24: 'AT_BASE_PLATFORM', 25: 'AT_RANDOM',
+    26: 'AT_HWCAP2', 31: 'AT_EXECFN', 33: 'AT_SYSINFO_EHDR', 51: 'AT_MINSIGSTKSZ',
+}
+
+
+class PrStatus(NamedTuple):
+    signal: int
+    pid: int
+    ppid: int
+    pgrp: int
+    sid: int
+    registers: Dict[str, int]
+
+
+class MappedFile(NamedTuple):
+    start: int
+    end: int
+    offset: int      # in the file, in bytes
+    filename: str
+
+
+class CoreMemory:
+    # The memory image of the dumped process, read straight from the
+    # LOAD segments of the core file. Nothing is copied up front: each
+    # read bisects the segments sorted by address and slices the mmap,
+    # filling with zeroes what lies between p_filesz and p_memsz.
+
+    def __init__(self, mm: 'mmap.mmap', segments: List['ElfSegment']):
+        self._mm = mm
+        loads = sorted((s for s in segments if s.get_type() == 'LOAD'), key=lambda s: s.get_vaddr())
+        self._starts = [s.get_vaddr() for s in loads]
+        self._segments = [(s.get_vaddr(), s.get_memsz(), s.get_offset(), s.get_filesz()) for s in loads]
+
+    def _find(self, address: int):
+        i = bisect_right(self._starts, address) - 1
+        if i >= 0:
+            vaddr, memsz, offset, filesz = self._segments[i]
+            if address < vaddr + memsz:
+                return vaddr, memsz, offset, filesz
+        raise ValueError('address 0x{:x} is not mapped'.format(address))
+
+    def is_mapped(self, address: int) -> bool:
+        try:
+            self._find(address)
+        except ValueError:
+            return False
+        return True
+
+    def read(self, address: int, size: int) -> bytes:
+        data = b''
+        while size > 0:
+            vaddr, memsz, offset, filesz = self._find(address)
+            delta = address - vaddr
+            count = min(size, memsz - delta)
+            infile = max(0, min(count, filesz - delta))
+            if infile:
+                data += self._mm[offset+delta:offset+delta+infile]
+            data += bytes(count - infile)
+            address += count
+            size -= count
+        return data
+
+    def read_word(self, address: int, size: int = 8) -> int:
+        return int.from_bytes(self.read(address, size), 'little')
+
+    def read_cstring(self, address: int, limit: int = 4096) -> bytes:
+        s = b''
+        while len(s) < limit:
+            vaddr, memsz, _, _ = self._find(address)
+            chunk = self.read(address, min(256, vaddr + memsz - address, limit - len(s)))
+            end = chunk.find(b'\x00')
+            if end >= 0:
+                return s + chunk[:end]
+            s += chunk
+            address += len(chunk)
+        return s
+
+    @property
+    def ranges(self) -> List[tuple]:
+        return [(vaddr, vaddr + memsz) for vaddr, memsz, _, _ in self._segments]
+
+
+class ElfCore:
+    # Decoding of what a core dump carries in its notes: the status of
+    # each thread (NT_PRSTATUS), the process info (NT_PRPSINFO), the
+    # auxiliary vector (NT_AUXV) and the mapped files (NT_FILE), plus
+    # access to the memory image.
+
+    def __init__(self, elf: 'ELF'):
+        if elf.header.get_type() != 'CORE (Core file)':
+            raise ValueError('not a core file')
+        self._word = 4 if elf.header.get_class() == 'ELF32' else 8
+        self._machine = int.from_bytes(elf.header.e_machine, 'little')
+        self._notes = [n for n in elf.get_notes() if n.name == 'CORE']
+        self._memory = CoreMemory(elf.mm, elf.segments)
+
+    def _words(self, data: bytes) -> List[int]:
+        w = self._word
+        return [int.from_bytes(data[i:i+w], 'little') for i in range(0, len(data) - w + 1, w)]
+
+    def get_threads(self) -> List['PrStatus']:
+        if self._word == 8:
+            pids_at, regs_at = 32, 112
+        else:
+            pids_at, regs_at = 24, 72
+        names = {EM_X86_64: X86_64_REGS, EM_AARCH64: AARCH64_REGS}.get(self._machine)
+
+        threads = []
+        for note in self._notes:
+            if note.get_type() != 'PRSTATUS':
+                continue
+            desc = note.desc
+            signal = int.from_bytes(desc[12:14], 'little')
+            pid, ppid, pgrp, sid = (int.from_bytes(desc[pids_at+4*i:pids_at+4*i+4], 'little')
+                                    for i in range(4))
+            if names is not None:
+                values = self._words(desc[regs_at:regs_at + len(names) * self._word])
+                registers = dict(zip(names, values))
+            else:
+                # unknown layout, the raw gregset up to pr_fpvalid
+                values = self._words(desc[regs_at:len(desc) - self._word])
+                registers = {'r{}'.format(i): v for i, v in enumerate(values)}
+            threads.append(PrStatus(signal, pid, ppid, pgrp, sid, registers))
+        return threads
+
+    def get_process(self) -> Dict[str, object]:
+        for note in self._notes:
+            if note.get_type() == 'PRPSINFO':
+                desc = note.desc
+                # pr_fname and pr_psargs close the structure
+                fname = desc[-96:-80].split(b'\x00')[0].decode('utf-8', 'replace')
+                args = desc[-80:].split(b'\x00')[0].decode('utf-8', 'replace')
+                return {'state': desc[0], 'fname': fname, 'args': args}
+        return {}
+
+    def get_auxv(self) -> Dict[str, int]:
+        auxv = {}
+        for note in self._notes:
+            if note.get_type() == 'AUXV':
+                words = self._words(note.desc)
+                for atype, value in zip(words[0::2], words[1::2]):
+                    if atype == 0:
+                        break
+                    auxv[AUXV_TYPES.get(atype, str(atype))] = value
+        return auxv
+
+    def get_mapped_files(self) -> List['MappedFile']:
+        files = []
+        for note in self._notes:
+            if note.get_type() != 'FILE':
+                continue
+            words = self._words(note.desc[:2 * self._word])
+            count, page_size = words[0], words[1]
+            table_end = (2 + 3 * count) * self._word
+            entries = self._words(note.desc[2 * self._word:table_end])
+            names = note.desc[table_end:].split(b'\x00')
+            for i in range(count):
+                start, end, pgoff = entries[3*i:3*i+3]
+                filename = names[i].decode('utf-8', 'replace') if i < len(names) else ''
+                files.append(MappedFile(start, end, pgoff * page_size, filename))
+        return files
+
+    def __str__(self):
+        s  = 'Core file\n'
+        s += '---\n'
+        process = self.get_process()
+        if process:
+            s += 'Command:  ' + process['args'] + '\n'
+        for thread in self.get_threads():
+            s += 'Thread {} (signal {})\n'.format(thread.pid, thread.signal)
+            for name, value in thread.registers.items():
+                s += '    {:<8s} 0x{:016x}\n'.format(name, value)
+        s += 'Auxiliary vector\n'
+        for name, value in self.get_auxv().items():
+            s += '    {:<16s} 0x{:x}\n'.format(name, value)
+        s += 'Mapped files\n'
+        for f in self.get_mapped_files():
+            s += '    0x{:016x}-0x{:016x} 0x{:08x} {}\n'.format(f.start, f.end, f.offset, f.filename)
+        return s
+
+    @property
+    def notes(self) -> List['ElfNote']:
+        return self._notes
+
+    @property
+    def memory(self) -> 'CoreMemory':
+        return self._memory
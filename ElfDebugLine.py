@@ -0,0 +1,664 @@
+from array import array
+from bisect import bisect_right
+from collections import OrderedDict
+import posixpath
+import struct
+from typing import Dict, Iterable, List, NamedTuple, Optional
+import zlib
+
+
+class SourceLine(NamedTuple):
+    file: str
+    line: int
+
+
+# DW_FORM_* values, and the fixed size of those that have one ('offset'
+# and 'address' depend on the unit)
+FORM_SIZES = {
+    0x01: 'address',    # addr
+    0x05: 2,            # data2
+    0x06: 4,            # data4
+    0x07: 8,            # data8
+    0x0b: 1,            # data1
+    0x0c: 1,            # flag
+    0x0e: 'offset',     # strp
+    0x10: 'offset',     # ref_addr
+    0x11: 1,            # ref1
+    0x12: 2,            # ref2
+    0x13: 4,            # ref4
+    0x14: 8,            # ref8
+    0x17: 'offset',     # sec_offset
+    0x19: 0,            # flag_present
+    0x1c: 4,            # ref_sup4
+    0x1d: 'offset',     # strp_sup
+    0x1e: 16,           # data16
+    0x1f: 'offset',     # line_strp
+    0x20: 8,            # ref_sig8
+    0x21: 0,            # implicit_const, the value is in the abbreviation
+    0x24: 8,            # ref_sup8
+    0x25: 1,            # strx1
+    0x26: 2,            # strx2
+    0x27: 3,            # strx3
+    0x28: 4,            # strx4
+    0x29: 1,            # addrx1
+    0x2a: 2,            # addrx2
+    0x2b: 3,            # addrx3
+    0x2c: 4,            # addrx4
+    0x1f20: 'offset',   # GNU_ref_alt
+    0x1f21: 'offset',   # GNU_strp_alt
+}
+FORM_ULEB = {0x0f, 0x15, 0x1a, 0x1b, 0x22, 0x23, 0x1f01, 0x1f02}
+FORM_BLOCK = {0x03: 2, 0x04: 4, 0x09: None, 0x0a: 1, 0x18: None}   # length size, None for uleb
+DW_FORM_addr = 0x01
+DW_FORM_string = 0x08
+DW_FORM_sdata = 0x0d
+DW_FORM_strp = 0x0e
+DW_FORM_indirect = 0x16
+DW_FORM_line_strp = 0x1f
+DW_FORM_implicit_const = 0x21
+
+DW_AT_name = 0x03
+DW_AT_stmt_list = 0x10
+DW_AT_low_pc = 0x11
+DW_AT_high_pc = 0x12
+DW_AT_comp_dir = 0x1b
+
+DW_LNCT_path = 1
+DW_LNCT_directory_index = 2
+
+END_SEQUENCE = 0xffffffff   # file column of the row closing a sequence
+
+
+def read_uleb(buf: bytes, pos: int) -> tuple:
+    value = shift = 0
+    while True:
+        byte = buf[pos]
+        pos += 1
+        value |= (byte & 0x7f) << shift
+        shift += 7
+        if byte < 0x80:
+            return value, pos
+
+
+def read_sleb(buf: bytes, pos: int) -> tuple:
+    value = shift = 0
+    while True:
+        byte = buf[pos]
+        pos += 1
+        value |= (byte & 0x7f) << shift
+        shift += 7
+        if byte < 0x80:
+            if byte & 0x40:
+                value -= 1 << shift
+            return value, pos
+
+
+def read_cstring(buf: bytes, pos: int) -> tuple:
+    end = buf.find(b'\x00', pos)
+    if end < 0:
+        raise ValueError('unterminated string at 0x{:x}'.format(pos))
+    return buf[pos:end].decode('utf-8', 'replace'), end + 1
+
+
+def read_unit_length(buf: bytes, pos: int) -> tuple:
+    # 32-bit DWARF, or 64-bit DWARF behind the 0xffffffff escape
+    length = int.from_bytes(buf[pos:pos+4], 'little')
+    if length == 0xffffffff:
+        return int.from_bytes(buf[pos+4:pos+12], 'little'), 8, pos + 12
+    return length, 4, pos + 4
+
+
+class DebugSection:
+    # Read access to one .debug_* section, straight from the mapped file so
+    # that a large section is never copied as a whole; compressed sections
+    # (SHF_COMPRESSED, zlib) are inflated once.
+
+    def __init__(self, elf: 'ELF', section: 'ElfSection'):
+        self._name = section.name
+        if 'C' in section.flags:
+            content = section.content
+            word = 8 if elf.header.get_class() == 'ELF64' else 4
+            chdr_size = 24 if word == 8 else 12
+            if int.from_bytes(content[:4], 'little') != 1:
+                raise ValueError('{}: unsupported compression type'.format(section.name))
+            self._buf = zlib.decompress(content[chdr_size:])
+            self._base = 0
+            self._size = len(self._buf)
+        else:
+            self._buf = elf.mm
+            self._base = section.offset
+            self._size = section.size
+
+    def read(self, offset: int, size: int) -> bytes:
+        end = min(offset + size, self._size)
+        return self._buf[self._base + offset:self._base + end]
+
+    def read_cstring(self, offset: int) -> str:
+        if not 0 <= offset < self._size:
+            raise ValueError('string offset 0x{:x} out of {}'.format(offset, self._name))
+        end = self._buf.find(b'\x00', self._base + offset, self._base + self._size)
+        if end < 0:
+            end = self._base + self._size
+        return self._buf[self._base + offset:end].decode('utf-8', 'replace')
+
+    def unit(self, offset: int) -> tuple:
+        # the bytes of the unit at offset, with the length of its offsets
+        length, offset_size, _ = read_unit_length(self.read(offset, 12), 0)
+        header = 4 if offset_size == 4 else 12
+        if offset + header + length > self._size:
+            raise ValueError('unit at 0x{:x} runs past the end of {}'.format(offset, self._name))
+        return self.read(offset, header + length), offset_size
+
+    @property
+    def size(self) -> int:
+        return self._size
+
+
+class LineTable:
+    # The rows of one line number program: all of its sequences sorted by
+    # address and flattened into three columns. A row covers the addresses
+    # up to the next one; the last row of a sequence marks its end.
+
+    def __init__(self, files: List[str]):
+        self._files = files
+        self._addresses = array('Q')
+        self._lines = array('I')
+        self._file_indexes = array('I')
+
+    def set_rows(self, sequences: list):
+        sequences.sort(key=lambda sequence: sequence[0][0] if sequence else 0)
+        for rows in sequences:
+            for address, file, line in rows:
+                # broken programs can wrap around, as the registers would
+                self._addresses.append(address & 0xffffffffffffffff)
+                self._file_indexes.append(file if file <= END_SEQUENCE else END_SEQUENCE - 1)
+                self._lines.append(line & 0xffffffff)
+
+    def lookup(self, address: int) -> Optional['SourceLine']:
+        i = bisect_right(self._addresses, address) - 1
+        if i < 0 or self._file_indexes[i] == END_SEQUENCE:
+            return None
+        file = self._file_indexes[i]
+        name = self._files[file] if file < len(self._files) else '??'
+        return SourceLine(name, self._lines[i])
+
+    def __len__(self):
+        return len(self._addresses)
+
+    @property
+    def files(self) -> List[str]:
+        return self._files
+
+    @property
+    def addresses(self) -> 'array':
+        return self._addresses
+
+    @property
+    def lines(self) -> 'array':
+        return self._lines
+
+
+class ElfDebugLine:
+    # Address to file:line lookups from the DWARF .debug_line section
+    # (versions 2 to 5). Nothing is decoded up front: the unit covering an
+    # address is found through .debug_aranges, or when that is missing
+    # through the address range of each compilation unit's first DIE, and
+    # only the line number program of that unit is then run. The resulting
+    # tables are kept in a small LRU so that a batch of lookups over a huge
+    # file touches a bounded amount of memory.
+
+    def __init__(self, elf: 'ELF', max_tables: int = 64):
+        self._elf = elf
+        self._max_tables = max_tables
+        self._sections = {}
+        for name in ('.debug_line', '.debug_info', '.debug_abbrev', '.debug_aranges',
+                     '.debug_str', '.debug_line_str'):
+            section = elf.sections.get(name)
+            if section is not None and section.type != 'NOBITS':
+                self._sections[name] = DebugSection(elf, section)
+        if '.debug_line' not in self._sections:
+            raise ValueError('no .debug_line section')
+
+        self._starts = None     # sorted start addresses of the known ranges
+        self._ranges = None     # (start, end, unit offset in .debug_info) by start
+        self._pending = None    # units without a known range, decoded on a miss
+        self._units = {}        # unit offset -> attributes of its first DIE
+        self._abbrevs = {}      # abbreviation table offset -> {code: (has children, attributes)}
+        self._tables = OrderedDict()    # .debug_line offset -> LineTable
+
+    def lookup(self, address: int) -> Optional['SourceLine']:
+        return self.lookup_many([address])[0]
+
+    def lookup_many(self, addresses: Iterable[int]) -> List[Optional['SourceLine']]:
+        # sorted, so that each unit's table is built once for the whole batch
+        addresses = list(addresses)
+        results = [None] * len(addresses)
+        if self._ranges is None:
+            self.build_index()
+        for i in sorted(range(len(addresses)), key=addresses.__getitem__):
+            results[i] = self._lookup(addresses[i])
+        return results
+
+    def _lookup(self, address: int) -> Optional['SourceLine']:
+        # ranges of different units may nest: try the few that start closest
+        i = bisect_right(self._starts, address) - 1
+        for i in range(i, max(i - 4, -1), -1):
+            start, end, unit = self._ranges[i]
+            if address < end:
+                table = self.get_unit_table(unit)
+                found = table.lookup(address) if table is not None else None
+                if found is not None:
+                    return found
+
+        # units nothing is known about, one at a time until one has it; the
+        # range of those decoded goes into the index for the next lookups
+        while self._pending:
+            unit = self._pending.pop()
+            table = self.get_unit_table(unit)
+            if table is None or not len(table):
+                continue
+            start, end = min(table.addresses), max(table.addresses)
+            i = bisect_right(self._starts, start)
+            self._starts.insert(i, start)
+            self._ranges.insert(i, (start, end, unit))
+            found = table.lookup(address)
+            if found is not None:
+                return found
+        return None
+
+    def build_index(self):
+        self._ranges = []
+        self._pending = []
+        if '.debug_aranges' in self._sections:
+            self.parse_aranges()
+        elif '.debug_info' in self._sections:
+            self.scan_units()
+        else:
+            # no way to tell units apart: every line program is a candidate
+            self._pending = list(reversed(self.get_line_programs()))
+        self._ranges.sort()
+        self._starts = array('Q', (start for start, _, _ in self._ranges))
+
+    def parse_aranges(self):
+        aranges = self._sections['.debug_aranges']
+        offset = 0
+        while offset + 4 <= aranges.size:
+            try:
+                unit, offset_size = aranges.unit(offset)
+            except ValueError:
+                break
+            pos = 4 if offset_size == 4 else 12
+            if len(unit) < pos + 4 + offset_size:
+                break
+            version = int.from_bytes(unit[pos:pos+2], 'little')
+            info_offset = int.from_bytes(unit[pos+2:pos+2+offset_size], 'little')
+            address_size = unit[pos+2+offset_size]
+            pos += 4 + offset_size
+            # the tuples are aligned to their size from the start of the set
+            tuple_size = 2 * address_size
+            if version == 2 and address_size in (4, 8):
+                pos = -(-pos // tuple_size) * tuple_size
+                while pos + tuple_size <= len(unit):
+                    start = int.from_bytes(unit[pos:pos+address_size], 'little')
+                    length = int.from_bytes(unit[pos+address_size:pos+tuple_size], 'little')
+                    pos += tuple_size
+                    if not start and not length:
+                        break
+                    self._ranges.append((start, start + length, info_offset))
+            offset += len(unit)
+
+    def scan_units(self):
+        # Without .debug_aranges the range of a unit is DW_AT_low_pc and
+        # DW_AT_high_pc of its first DIE. Only the unit headers and that DIE
+        # are read, moving from one unit to the next by their length.
+        info = self._sections['.debug_info']
+        offset = 0
+        while offset + 4 <= info.size:
+            length, offset_size, _ = read_unit_length(info.read(offset, 12), 0)
+            try:
+                attributes = self.get_unit(offset)
+            except (ValueError, IndexError, KeyError):
+                attributes = {}
+            low = attributes.get(DW_AT_low_pc)
+            high = attributes.get(DW_AT_high_pc)
+            if isinstance(low, int) and isinstance(high, tuple):
+                # high_pc of a constant class is an offset from low_pc
+                high = low + high[0]
+            if isinstance(low, int) and isinstance(high, int) and high > low:
+                self._ranges.append((low, high, offset))
+            elif DW_AT_stmt_list in attributes:
+                self._pending.append(offset)
+            offset += length + (4 if offset_size == 4 else 12)
+        self._pending.reverse()
+
+    def get_line_programs(self) -> List[int]:
+        # offsets of all the programs in .debug_line, from their lengths
+        lines = self._sections['.debug_line']
+        offsets = []
+        offset = 0
+        while offset + 4 <= lines.size:
+            length, offset_size, _ = read_unit_length(lines.read(offset, 12), 0)
+            offsets.append(-offset - 1)     # negative: not a .debug_info offset
+            offset += length + (4 if offset_size == 4 else 12)
+        return offsets
+
+    def get_unit_table(self, unit: int) -> Optional['LineTable']:
+        # the line table of a unit (or of a bare line program for negative
+        # values, see get_line_programs)
+        if unit < 0:
+            stmt_list, comp_dir, name = -unit - 1, '', ''
+        else:
+            try:
+                attributes = self.get_unit(unit)
+            except (ValueError, IndexError, KeyError):
+                return None
+            stmt_list = attributes.get(DW_AT_stmt_list)
+            comp_dir = attributes.get(DW_AT_comp_dir) or ''
+            name = attributes.get(DW_AT_name) or ''
+            if not isinstance(stmt_list, int):
+                return None
+
+        table = self._tables.get(stmt_list)
+        if table is not None:
+            self._tables.move_to_end(stmt_list)
+            return table
+        try:
+            table = self.parse_line_program(stmt_list, comp_dir if isinstance(comp_dir, str) else '',
+                                            name if isinstance(name, str) else '')
+        except (ValueError, IndexError):
+            return None
+        self._tables[stmt_list] = table
+        if len(self._tables) > self._max_tables:
+            self._tables.popitem(last=False)
+        return table
+
+    def get_unit(self, offset: int) -> Dict[int, object]:
+        # The attributes of the first DIE of the unit at offset in
+        # .debug_info: strings are resolved, constants of high_pc are
+        # returned as a 1-tuple to tell them apart from addresses.
+        attributes = self._units.get(offset)
+        if attributes is not None:
+            return attributes
+
+        info = self._sections['.debug_info']
+        header = info.read(offset, 64)
+        length, offset_size, pos = read_unit_length(header, 0)
+        version = int.from_bytes(header[pos:pos+2], 'little')
+        pos += 2
+        if version >= 5:
+            unit_type = header[pos]
+            address_size = header[pos+1]
+            abbrev_offset = int.from_bytes(header[pos+2:pos+2+offset_size], 'little')
+            pos += 2 + offset_size
+            if unit_type in (4, 5):         # skeleton and split units: dwo id
+                pos += 8
+            elif unit_type in (2, 6):       # type units: signature and type offset
+                pos += 8 + offset_size
+        elif version >= 2:
+            abbrev_offset = int.from_bytes(header[pos:pos+offset_size], 'little')
+            address_size = header[pos+offset_size]
+            pos += offset_size + 1
+        else:
+            raise ValueError('unsupported DWARF version {}'.format(version))
+
+        # the first DIE, read in growing windows as it may be large
+        end = length + (4 if offset_size == 4 else 12)
+        window = 256
+        while True:
+            die = info.read(offset, min(window, end))
+            try:
+                attributes = self._parse_die(die, pos, abbrev_offset, offset_size, address_size)
+                break
+            except IndexError:
+                if window >= end:
+                    raise
+                window *= 16
+        self._units[offset] = attributes
+        return attributes
+
+    def _parse_die(self, die: bytes, pos: int, abbrev_offset: int, offset_size: int,
+                   address_size: int) -> Dict[int, object]:
+        code, pos = read_uleb(die, pos)
+        _, specs = self.get_abbrevs(abbrev_offset)[code]
+        attributes = {}
+        for name, form, implicit in specs:
+            while form == DW_FORM_indirect:
+                form, pos = read_uleb(die, pos)
+            value = None
+            if form == DW_FORM_string:
+                value, pos = read_cstring(die, pos)
+            elif form == DW_FORM_implicit_const:
+                value = implicit
+            elif form == DW_FORM_sdata:
+                value, pos = read_sleb(die, pos)
+            elif form in FORM_ULEB:
+                value, pos = read_uleb(die, pos)
+            elif form in FORM_BLOCK:
+                size = FORM_BLOCK[form]
+                if size is None:
+                    length, pos = read_uleb(die, pos)
+                else:
+                    length = int.from_bytes(die[pos:pos+size], 'little')
+                    pos += size
+                pos += length
+            elif form in FORM_SIZES:
+                size = FORM_SIZES[form]
+                size = offset_size if size == 'offset' else address_size if size == 'address' else size
+                if pos + size > len(die):
+                    raise IndexError('DIE past the end of the window')
+                value = int.from_bytes(die[pos:pos+size], 'little')
+                pos += size
+                if form == DW_FORM_strp:
+                    value = self.get_string('.debug_str', value)
+                elif form == DW_FORM_line_strp:
+                    value = self.get_string('.debug_line_str', value)
+            else:
+                raise ValueError('unknown attribute form 0x{:x}'.format(form))
+            if name == DW_AT_high_pc and form != DW_FORM_addr and isinstance(value, int):
+                value = (value,)
+            attributes[name] = value
+        if pos > len(die):
+            raise IndexError('DIE past the end of the window')
+        return attributes
+
+    def get_abbrevs(self, offset: int) -> dict:
+        # the abbreviation table at offset in .debug_abbrev, decoded once
+        table = self._abbrevs.get(offset)
+        if table is not None:
+            return table
+
+        abbrev = self._sections['.debug_abbrev']
+        window = 4096
+        while True:
+            buf = abbrev.read(offset, window)
+            try:
+                table = self._parse_abbrevs(buf)
+                break
+            except IndexError:
+                if offset + window >= abbrev.size:
+                    raise ValueError('abbreviation table at 0x{:x} runs past the end'.format(offset))
+                window *= 16
+        self._abbrevs[offset] = table
+        return table
+
+    @staticmethod
+    def _parse_abbrevs(buf: bytes) -> dict:
+        table = {}
+        pos = 0
+        while True:
+            code, pos = read_uleb(buf, pos)
+            if not code:
+                return table
+            _, pos = read_uleb(buf, pos)     # tag
+            children = buf[pos]
+            pos += 1
+            specs = []
+            while True:
+                name, pos = read_uleb(buf, pos)
+                form, pos = read_uleb(buf, pos)
+                implicit = None
+                if form == DW_FORM_implicit_const:
+                    implicit, pos = read_sleb(buf, pos)
+                if not name and not form:
+                    break
+                specs.append((name, form, implicit))
+            table[code] = (children, specs)
+
+    def get_string(self, section: str, offset: int) -> Optional[str]:
+        strings = self._sections.get(section)
+        if strings is None:
+            return None
+        return strings.read_cstring(offset)
+
+    def parse_line_program(self, offset: int, comp_dir: str = '', name: str = '') -> 'LineTable':
+        program, offset_size = self._sections['.debug_line'].unit(offset)
+        pos = 4 if offset_size == 4 else 12
+        version = int.from_bytes(program[pos:pos+2], 'little')
+        pos += 2
+        if not 2 <= version <= 5:
+            raise ValueError('unsupported line table version {}'.format(version))
+        address_size = 8 if self._elf.header.get_class() == 'ELF64' else 4
+        if version >= 5:
+            address_size = program[pos]
+            pos += 2                            # address and segment selector sizes
+        header_length = int.from_bytes(program[pos:pos+offset_size], 'little')
+        pos += offset_size
+        program_start = pos + header_length
+        min_inst_length = program[pos]
+        pos += 1
+        if version >= 4:
+            pos += 1                            # maximum operations per instruction
+        line_base = struct.unpack_from('<b', program, pos + 1)[0]
+        line_range = program[pos+2]
+        opcode_base = program[pos+3]
+        lengths = program[pos+4:pos+3+opcode_base]
+        pos += 3 + opcode_base
+        if not line_range:
+            raise ValueError('line table at 0x{:x} has a line range of 0'.format(offset))
+
+        if version >= 5:
+            directories, pos = self._parse_entries(program, pos, offset_size)
+            directories = [ElfDebugLine._path(entry, '') for entry in directories]
+            entries, pos = self._parse_entries(program, pos, offset_size)
+            files = []
+            for entry in entries:
+                directory = entry.get(DW_LNCT_directory_index)
+                directory = directory if isinstance(directory, int) else 0
+                directory = directories[directory] if directory < len(directories) else ''
+                files.append(posixpath.join(directory, ElfDebugLine._path(entry, '??')))
+        else:
+            # index 0 is the unit itself, directories and files count from 1
+            directories = [comp_dir]
+            while program[pos]:
+                directory, pos = read_cstring(program, pos)
+                directories.append(posixpath.join(comp_dir, directory))
+            pos += 1
+            files = [posixpath.join(comp_dir, name)]
+            while program[pos]:
+                file, pos = read_cstring(program, pos)
+                directory, pos = read_uleb(program, pos)
+                _, pos = read_uleb(program, pos)    # modification time
+                _, pos = read_uleb(program, pos)    # length
+                directory = directories[directory] if directory < len(directories) else ''
+                files.append(posixpath.join(directory, file))
+
+        table = LineTable(files)
+        table.set_rows(self._run_program(program, program_start, min_inst_length,
+                                         line_base, line_range, opcode_base, lengths))
+        return table
+
+    @staticmethod
+    def _path(entry: dict, default: str) -> str:
+        path = entry.get(DW_LNCT_path)
+        return path if isinstance(path, str) and path else default
+
+    def _parse_entries(self, program: bytes, pos: int, offset_size: int) -> tuple:
+        # DWARF 5 directory or file entries, described by (content, form) pairs
+        count = program[pos]
+        pos += 1
+        formats = []
+        for _ in range(count):
+            content, pos = read_uleb(program, pos)
+            form, pos = read_uleb(program, pos)
+            formats.append((content, form))
+        count, pos = read_uleb(program, pos)
+        entries = []
+        for _ in range(count):
+            entry = {}
+            for content, form in formats:
+                value = None
+                if form == DW_FORM_string:
+                    value, pos = read_cstring(program, pos)
+                elif form in (DW_FORM_line_strp, DW_FORM_strp):
+                    value = int.from_bytes(program[pos:pos+offset_size], 'little')
+                    pos += offset_size
+                    section = '.debug_line_str' if form == DW_FORM_line_strp else '.debug_str'
+                    value = self.get_string(section, value)
+                elif form in FORM_ULEB:
+                    value, pos = read_uleb(program, pos)
+                elif form in FORM_BLOCK:
+                    size = FORM_BLOCK[form]
+                    if size is None:
+                        length, pos = read_uleb(program, pos)
+                    else:
+                        length = int.from_bytes(program[pos:pos+size], 'little')
+                        pos += size
+                    pos += length
+                elif isinstance(FORM_SIZES.get(form), int):
+                    size = FORM_SIZES[form]
+                    value = int.from_bytes(program[pos:pos+size], 'little')
+                    pos += size
+                else:
+                    raise ValueError('unknown entry form 0x{:x}'.format(form))
+                entry[content] = value
+            entries.append(entry)
+        return entries, pos
+
+    @staticmethod
+    def _run_program(program: bytes, pos: int, min_inst_length: int, line_base: int,
+                     line_range: int, opcode_base: int, lengths: bytes) -> list:
+        # The line number state machine, keeping address, file and line of
+        # each row; is_stmt, columns and the VLIW op_index are not tracked.
+        sequences = []
+        rows = []
+        address, file, line = 0, 1, 1
+        end = len(program)
+        while pos < end:
+            opcode = program[pos]
+            pos += 1
+            if opcode >= opcode_base:
+                adjusted = opcode - opcode_base
+                address += (adjusted // line_range) * min_inst_length
+                line += line_base + adjusted % line_range
+                rows.append((address, file, line))
+            elif opcode == 0:
+                length, pos = read_uleb(program, pos)
+                sub = program[pos] if length else 0
+                if sub == 1:                        # end_sequence
+                    rows.append((address, END_SEQUENCE, line))
+                    sequences.append(rows)
+                    rows = []
+                    address, file, line = 0, 1, 1
+                elif sub == 2:                      # set_address
+                    address = int.from_bytes(program[pos+1:pos+length], 'little')
+                pos += length
+            elif opcode == 1:                       # copy
+                rows.append((address, file, line))
+            elif opcode == 2:                       # advance_pc
+                advance, pos = read_uleb(program, pos)
+                address += advance * min_inst_length
+            elif opcode == 3:                       # advance_line
+                advance, pos = read_sleb(program, pos)
+                line += advance
+            elif opcode == 4:                       # set_file
+                file, pos = read_uleb(program, pos)
+            elif opcode == 8:                       # const_add_pc
+                address += ((255 - opcode_base) // line_range) * min_inst_length
+            elif opcode == 9:                       # fixed_advance_pc
+                address += int.from_bytes(program[pos:pos+2], 'little')
+                pos += 2
+            else:
+                # set_column, set_isa and unknown ones: skip the operands
+                for _ in range(lengths[opcode-1] if opcode - 1 < len(lengths) else 0):
+                    _, pos = read_uleb(program, pos)
+        return sequences
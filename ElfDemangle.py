@@ -0,0 +1,1514 @@
+from functools import lru_cache
+from typing import Iterable, List
+
+
+# Demangling of C++ (Itanium ABI) and Rust (legacy and v0) symbol names,
+# written to print what c++filt prints. A name that cannot be demangled is
+# returned as is. Results are memoized: the same instantiations come back
+# over and over across the libraries of a system.
+
+def demangle_many(names: Iterable[str]) -> List[str]:
+    return [demangle(name) for name in names]
+
+
+@lru_cache(maxsize=1 << 16)
+def demangle(name: str) -> str:
+    try:
+        if name.startswith('_R'):
+            return RustDemangler(name).demangle()
+        if name.startswith('_Z'):
+            legacy = demangle_rust_legacy(name)
+            if legacy is not None:
+                return legacy
+            return ItaniumDemangler(name).demangle()
+    except (DemangleError, IndexError, RecursionError):
+        pass
+    return name
+
+
+class DemangleError(ValueError):
+    pass
+
+
+#
+# Itanium C++ ABI
+#
+
+BUILTIN_TYPES = {
+    'v': 'void', 'w': 'wchar_t', 'b': 'bool', 'c': 'char', 'a': 'signed char',
+    'h': 'unsigned char', 's': 'short', 't': 'unsigned short', 'i': 'int',
+    'j': 'unsigned int', 'l': 'long', 'm': 'unsigned long', 'x': 'long long',
+    'y': 'unsigned long long', 'n': '__int128', 'o': 'unsigned __int128',
+    'f': 'float', 'd': 'double', 'e': 'long double', 'g': '__float128', 'z': '...',
+}
+
+BUILTIN_D_TYPES = {
+    'd': 'decimal64', 'e': 'decimal128', 'f': 'decimal32', 'h': 'half',
+    'i': 'char32_t', 's': 'char16_t', 'u': 'char8_t', 'a': 'auto',
+    'c': 'decltype(auto)', 'n': 'decltype(nullptr)',
+}
+
+# code: (name, arity)
+OPERATORS = {
+    'nw': ('new', 3), 'na': ('new[]', 3), 'dl': ('delete', 1), 'da': ('delete[]', 1),
+    'ps': ('+', 1), 'ng': ('-', 1), 'ad': ('&', 1), 'de': ('*', 1), 'co': ('~', 1),
+    'pl': ('+', 2), 'mi': ('-', 2), 'ml': ('*', 2), 'dv': ('/', 2), 'rm': ('%', 2),
+    'an': ('&', 2), 'or': ('|', 2), 'eo': ('^', 2), 'aS': ('=', 2), 'pL': ('+=', 2),
+    'mI': ('-=', 2), 'mL': ('*=', 2), 'dV': ('/=', 2), 'rM': ('%=', 2), 'aN': ('&=', 2),
+    'oR': ('|=', 2), 'eO': ('^=', 2), 'ls': ('<<', 2), 'rs': ('>>', 2), 'lS': ('<<=', 2),
+    'rS': ('>>=', 2), 'eq': ('==', 2), 'ne': ('!=', 2), 'lt': ('<', 2), 'gt': ('>', 2),
+    'le': ('<=', 2), 'ge': ('>=', 2), 'ss': ('<=>', 2), 'nt': ('!', 1), 'aa': ('&&', 2),
+    'oo': ('||', 2), 'pp': ('++', 1), 'mm': ('--', 1), 'cm': (',', 2), 'pm': ('->*', 2),
+    'pt': ('->', 2), 'cl': ('()', 2), 'ix': ('[]', 2), 'qu': ('?', 3), 'st': ('sizeof ', 1),
+    'sz': ('sizeof ', 1), 'at': ('alignof ', 1), 'az': ('alignof ', 1),
+}
+
+# code: (expansion, class name for constructors); c++filt prints the full
+# expansions, std::basic_string<...> rather than std::string
+STD_SUBSTITUTIONS = {
+    'a': ('std::allocator', 'allocator'),
+    'b': ('std::basic_string', 'basic_string'),
+    's': ('std::basic_string<char, std::char_traits<char>, std::allocator<char> >', 'basic_string'),
+    'i': ('std::basic_istream<char, std::char_traits<char> >', 'basic_istream'),
+    'o': ('std::basic_ostream<char, std::char_traits<char> >', 'basic_ostream'),
+    'd': ('std::basic_iostream<char, std::char_traits<char> >', 'basic_iostream'),
+}
+
+# literal type code: suffix printed after the value
+LITERAL_SUFFIXES = {'i': '', 'j': 'u', 'l': 'l', 'm': 'ul', 'x': 'll', 'y': 'ull'}
+
+
+class Node:
+    # A piece of a demangled name. Types with a declarator part (arrays,
+    # functions) print around the pointer or reference to them, hence the
+    # left and right halves.
+
+    def left(self, out: list):
+        pass
+
+    def right(self, out: list):
+        pass
+
+    def has_right(self) -> bool:
+        return False
+
+    def text(self) -> str:
+        out = []
+        self.left(out)
+        self.right(out)
+        return ''.join(out)
+
+    def __str__(self):
+        return self.text()
+
+
+class NameNode(Node):
+
+    def __init__(self, name: str):
+        self.name = name
+
+    def left(self, out: list):
+        out.append(self.name)
+
+
+class NestedNode(Node):
+
+    def __init__(self, prefix: 'Node', name: 'Node'):
+        self.prefix = prefix
+        self.name = name
+
+    def left(self, out: list):
+        self.prefix.left(out)
+        out.append('::')
+        self.name.left(out)
+
+    @property
+    def base_name(self) -> str:
+        return base_name(self.name)
+
+
+class StdSubstitutionNode(Node):
+
+    def __init__(self, code: str):
+        self.code = code
+
+    def left(self, out: list):
+        out.append(STD_SUBSTITUTIONS[self.code][0])
+
+    @property
+    def base_name(self) -> str:
+        return STD_SUBSTITUTIONS[self.code][1]
+
+
+class TemplateNode(Node):
+
+    def __init__(self, name: 'Node', args: list):
+        self.name = name
+        self.args = args
+
+    def left(self, out: list):
+        self.name.left(out)
+        if out and out[-1].endswith('<'):
+            out.append(' ')
+        out.append('<')
+        # like c++filt, no space when a trailing empty pack swallowed the
+        # separator after a '>'
+        if not print_list(self.args, out) and out[-1].endswith('>'):
+            out.append(' ')
+        out.append('>')
+
+    @property
+    def base_name(self) -> str:
+        return base_name(self.name)
+
+
+class AbiTagNode(Node):
+
+    def __init__(self, name: 'Node', tag: str):
+        self.name = name
+        self.tag = tag
+
+    def left(self, out: list):
+        self.name.left(out)
+        out.append('[abi:' + self.tag + ']')
+
+    @property
+    def base_name(self) -> str:
+        return base_name(self.name)
+
+
+class CtorDtorNode(Node):
+
+    def __init__(self, prefix: 'Node', dtor: bool):
+        self.prefix = prefix
+        self.dtor = dtor
+
+    def left(self, out: list):
+        out.append(('~' if self.dtor else '') + base_name(self.prefix))
+
+
+class OperatorNode(Node):
+
+    def __init__(self, name: str):
+        self.name = name
+
+    def left(self, out: list):
+        out.append('operator' + (' ' if self.name[0].isalpha() else '') + self.name)
+
+
+class ConversionNode(Node):
+
+    def __init__(self, type: 'Node'):
+        self.type = type
+
+    def left(self, out: list):
+        out.append('operator ')
+        self.type.left(out)
+        self.type.right(out)
+
+
+class LocalNode(Node):
+
+    def __init__(self, encoding: 'Node', entity: 'Node'):
+        self.encoding = encoding
+        self.entity = entity
+
+    def left(self, out: list):
+        # without the return type of the function
+        encoding = self.encoding
+        if isinstance(encoding, EncodingNode) and encoding.ret is not None:
+            encoding = EncodingNode(encoding.name, encoding.params, None, encoding.quals)
+        encoding.left(out)
+        encoding.right(out)
+        out.append('::')
+        self.entity.left(out)
+
+
+class QualNode(Node):
+
+    def __init__(self, child: 'Node', quals: str):
+        self.child = child
+        self.quals = quals
+
+    def left(self, out: list):
+        self.child.left(out)
+        out.append(self.quals)
+
+    def right(self, out: list):
+        self.child.right(out)
+
+    def has_right(self) -> bool:
+        return self.child.has_right()
+
+
+class PointerNode(Node):
+    # pointers and references, symbol is '*', '&' or '&&'
+
+    def __init__(self, pointee: 'Node', symbol: str):
+        if symbol != '*':
+            # reference collapsing: & & -> &, && && -> &&, otherwise &
+            while isinstance(pointee, PointerNode) and pointee.symbol != '*':
+                if pointee.symbol == '&':
+                    symbol = '&'
+                pointee = pointee.pointee
+        self.pointee = pointee
+        self.symbol = symbol
+
+    def left(self, out: list):
+        self.pointee.left(out)
+        if self.opens():
+            out.append('(' if isinstance(self.pointee, FunctionNode) else ' (')
+        out.append(self.symbol)
+
+    def right(self, out: list):
+        if self.opens():
+            out.append(')')
+        self.pointee.right(out)
+
+    def opens(self) -> bool:
+        # a pointer to a pointer to function shares its parentheses
+        pointee = self.pointee.child if isinstance(self.pointee, QualNode) else self.pointee
+        return pointee.has_right() and not isinstance(pointee, (PointerNode, MemberPointerNode))
+
+    def has_right(self) -> bool:
+        return self.pointee.has_right()
+
+
+class MemberPointerNode(Node):
+
+    def __init__(self, cls: 'Node', member: 'Node'):
+        self.cls = cls
+        self.member = member
+
+    def left(self, out: list):
+        self.member.left(out)
+        if self.member.has_right():
+            out.append('(' if isinstance(self.member, FunctionNode) else ' (')
+        else:
+            out.append(' ')
+        self.cls.left(out)
+        out.append('::*')
+
+    def right(self, out: list):
+        if self.member.has_right():
+            out.append(')')
+        self.member.right(out)
+
+    def has_right(self) -> bool:
+        return self.member.has_right()
+
+
+class ArrayNode(Node):
+
+    def __init__(self, element: 'Node', dimension: str):
+        self.element = element
+        self.dimension = dimension
+
+    def left(self, out: list):
+        self.element.left(out)
+
+    def right(self, out: list):
+        out.append(' [' + self.dimension + ']')
+        self.element.right(out)
+
+    def has_right(self) -> bool:
+        return True
+
+
+class FunctionNode(Node):
+
+    def __init__(self, ret: 'Node', params: list, quals: str = ''):
+        self.ret = ret
+        self.params = params
+        self.quals = quals
+
+    def left(self, out: list):
+        self.ret.left(out)
+        out.append(' ')
+
+    def right(self, out: list):
+        print_params(self.params, out)
+        out.append(self.quals)
+        self.ret.right(out)
+
+    def has_right(self) -> bool:
+        return True
+
+
+class EncodingNode(Node):
+    # a function: name, parameters and return type for templates
+
+    def __init__(self, name: 'Node', params: list, ret: 'Node' = None, quals: str = ''):
+        self.name = name
+        self.params = params
+        self.ret = ret
+        self.quals = quals
+
+    def left(self, out: list):
+        if self.ret is not None:
+            self.ret.left(out)
+            if not self.ret.has_right():
+                out.append(' ')
+        self.name.left(out)
+
+    def right(self, out: list):
+        print_params(self.params, out)
+        out.append(self.quals)
+        if self.ret is not None:
+            self.ret.right(out)
+
+
+class SpecialNode(Node):
+
+    def __init__(self, text: str, child: 'Node'):
+        self.prefix = text
+        self.child = child
+
+    def left(self, out: list):
+        out.append(self.prefix)
+        self.child.left(out)
+        self.child.right(out)
+
+
+class TemplateParamNode(Node):
+    # T_ as a substitution candidate: like c++filt, a later S_ referring to
+    # it names the parameter of the template in scope at that point
+
+    def __init__(self, index: int, arg: 'Node'):
+        self.index = index
+        self.arg = arg
+
+
+class PackNode(Node):
+    # a template argument pack, J ... E
+
+    def __init__(self, args: list):
+        self.args = args
+
+    def left(self, out: list):
+        print_list(self.args, out)
+
+
+class PackExpansionNode(Node):
+    # Dp, the parameters come from expanding each element of the pack that
+    # the child refers to
+
+    def __init__(self, child: 'Node', pack: 'PackNode'):
+        self.child = child
+        self.pack = pack
+
+    def expand(self) -> list:
+        if self.pack is None:
+            return [self.child]
+        return [substitute(self.child, self.pack, arg) for arg in self.pack.args]
+
+    def left(self, out: list):
+        print_list(self.expand(), out)
+
+
+class LiteralNode(Node):
+
+    def __init__(self, text: str):
+        self.value = text
+
+    def left(self, out: list):
+        out.append(self.value)
+
+
+def base_name(node: 'Node') -> str:
+    # the unqualified name without template arguments, for constructors
+    if hasattr(node, 'base_name'):
+        return node.base_name
+    return node.text()
+
+
+def substitute(node: 'Node', pack: 'PackNode', arg: 'Node') -> 'Node':
+    # a copy of node with the pack replaced by one of its elements
+    if node is pack:
+        return arg
+    if isinstance(node, PointerNode):
+        return PointerNode(substitute(node.pointee, pack, arg), node.symbol)
+    if isinstance(node, QualNode):
+        return QualNode(substitute(node.child, pack, arg), node.quals)
+    if isinstance(node, TemplateNode):
+        return TemplateNode(node.name, [substitute(a, pack, arg) for a in node.args])
+    if isinstance(node, NestedNode):
+        return NestedNode(substitute(node.prefix, pack, arg), node.name)
+    return node
+
+
+def print_list(nodes: list, out: list) -> bool:
+    # whether the list ends with an empty pack after other elements
+    first = True
+    elided = False
+    for node in nodes:
+        elided = False
+        if isinstance(node, (PackNode, PackExpansionNode)):
+            parts = flatten(node)
+            if not parts:
+                elided = not first
+                continue
+            node = PackNode(parts) if len(parts) > 1 else parts[0]
+        if not first:
+            out.append(', ')
+        first = False
+        node.left(out)
+        node.right(out)
+    return elided
+
+
+def flatten(node: 'Node') -> list:
+    # the elements of a pack or of its expansion, nested packs included
+    if isinstance(node, PackNode):
+        parts = node.args
+    elif isinstance(node, PackExpansionNode):
+        parts = node.expand()
+    else:
+        return [node]
+    return [element for part in parts for element in flatten(part)]
+
+
+def print_subexpression(node: 'Node') -> str:
+    # parenthesized unless it is a plain name, as c++filt does
+    if isinstance(node, NameNode) or isinstance(node, NestedNode) and \
+            not isinstance(node.name, TemplateNode):
+        return node.text()
+    return '(' + node.text() + ')'
+
+
+def print_params(params: list, out: list):
+    out.append('(')
+    if not (len(params) == 1 and isinstance(params[0], NameNode) and params[0].name == 'void'):
+        print_list(params, out)
+    out.append(')')
+
+
+class ItaniumDemangler:
+
+    def __init__(self, name: str):
+        self._s = name
+        self._pos = 0
+        self._subs = []             # substitution candidates, S_ S0_ ...
+        self._template_args = []    # T_ T0_ ... of the function being decoded
+        self._tag_templates = True  # whether template args found set T_ T0_ ...
+        self._quals = ''            # cv and ref qualifiers of the last nested name
+
+    def demangle(self) -> str:
+        s = self._s
+        if not s.startswith('_Z'):
+            raise DemangleError('not a mangled name')
+        self._pos = 2
+        node = self.parse_encoding()
+        text = node.text()
+        # clones made by the compiler: .isra.0, .cold, .constprop.1 ...
+        while self._pos < len(s) and s[self._pos] == '.':
+            end = self._pos + 1
+            if end < len(s) and (s[end].islower() or s[end] == '_'):
+                while end < len(s) and (s[end].islower() or s[end] == '_'):
+                    end += 1
+            elif end < len(s) and s[end].isdigit():
+                pass
+            else:
+                break
+            while end + 1 < len(s) and s[end] == '.' and s[end+1].isdigit():
+                end += 1
+                while end < len(s) and s[end].isdigit():
+                    end += 1
+            text += ' [clone ' + s[self._pos:end] + ']'
+            self._pos = end
+        if self._pos != len(s):
+            raise DemangleError('trailing characters')
+        return text
+
+    def peek(self, n: int = 0) -> str:
+        pos = self._pos + n
+        return self._s[pos] if pos < len(self._s) else ''
+
+    def consume(self, prefix: str) -> bool:
+        if self._s.startswith(prefix, self._pos):
+            self._pos += len(prefix)
+            return True
+        return False
+
+    def expect(self, prefix: str):
+        if not self.consume(prefix):
+            raise DemangleError('expected ' + prefix)
+
+    def parse_number(self) -> int:
+        negative = self.consume('n')
+        start = self._pos
+        while self.peek().isdigit():
+            self._pos += 1
+        if start == self._pos:
+            raise DemangleError('expected a number')
+        value = int(self._s[start:self._pos])
+        return -value if negative else value
+
+    def parse_seq_id(self) -> int:
+        # base 36, then _; nothing means the first one
+        if self.consume('_'):
+            return 0
+        start = self._pos
+        while self.peek().isdigit() or self.peek().isupper():
+            self._pos += 1
+        if start == self._pos:
+            raise DemangleError('expected a sequence id')
+        value = int(self._s[start:self._pos], 36) + 1
+        self.expect('_')
+        return value
+
+    def parse_encoding(self) -> 'Node':
+        c = self.peek()
+        if c in ('T', 'G'):
+            return self.parse_special_name()
+
+        self._quals = ''
+        name = self.parse_name()
+        quals = self._quals
+        if self.peek() in ('', 'E', '.'):
+            return name
+
+        self._tag_templates = False
+        ret = None
+        if is_template(name) and not is_ctor_dtor_conversion(name):
+            ret = self.parse_type()
+        params = []
+        while self.peek() not in ('', 'E', '.'):
+            params.append(self.parse_type())
+        if not params:
+            raise DemangleError('function without parameters')
+        return EncodingNode(name, params, ret, quals)
+
+    def parse_special_name(self) -> 'Node':
+        if self.consume('TV'):
+            return SpecialNode('vtable for ', self.parse_type())
+        if self.consume('TT'):
+            return SpecialNode('VTT for ', self.parse_type())
+        if self.consume('TI'):
+            return SpecialNode('typeinfo for ', self.parse_type())
+        if self.consume('TS'):
+            return SpecialNode('typeinfo name for ', self.parse_type())
+        if self.consume('TH'):
+            return SpecialNode('TLS init function for ', self.parse_name())
+        if self.consume('TW'):
+            return SpecialNode('TLS wrapper function for ', self.parse_name())
+        if self.consume('Th'):
+            self.parse_number()
+            self.expect('_')
+            return SpecialNode('non-virtual thunk to ', self.parse_encoding())
+        if self.consume('Tv'):
+            self.parse_number()
+            self.expect('_')
+            self.parse_number()
+            self.expect('_')
+            return SpecialNode('virtual thunk to ', self.parse_encoding())
+        if self.consume('Tc'):
+            for _ in range(2):
+                if self.consume('h'):
+                    self.parse_number()
+                    self.expect('_')
+                else:
+                    self.expect('v')
+                    self.parse_number()
+                    self.expect('_')
+                    self.parse_number()
+                    self.expect('_')
+            return SpecialNode('covariant return thunk to ', self.parse_encoding())
+        if self.consume('TC'):
+            derived = self.parse_type()
+            self.parse_number()
+            self.expect('_')
+            base = self.parse_type()
+            return LiteralNode('construction vtable for ' + base.text() + '-in-' + derived.text())
+        if self.consume('GV'):
+            return SpecialNode('guard variable for ', self.parse_name())
+        if self.consume('GR'):
+            name = self.parse_name()
+            index = self.parse_seq_id()
+            return SpecialNode('reference temporary #' + str(index) + ' for ', name)
+        if self.consume('GTt'):
+            return SpecialNode('transaction clone for ', self.parse_encoding())
+        if self.consume('GTn'):
+            return SpecialNode('non-transaction clone for ', self.parse_encoding())
+        raise DemangleError('unknown special name')
+
+    def parse_name(self) -> 'Node':
+        c = self.peek()
+        if c == 'N':
+            return self.parse_nested_name()
+        if c == 'Z':
+            return self.parse_local_name()
+
+        if c == 'S' and self.peek(1) != 't':
+            # a substitution can only name a template here
+            name = self.parse_substitution()
+            if self.peek() != 'I':
+                raise DemangleError('substitution that is not a template')
+            return TemplateNode(name, self.parse_template_args())
+
+        std = self.consume('St')
+        name = self.parse_unqualified_name(None)
+        if std:
+            name = NestedNode(NameNode('std'), name)
+        if self.peek() == 'I':
+            self._subs.append(name)
+            name = TemplateNode(name, self.parse_template_args())
+        return name
+
+    def parse_local_name(self) -> 'Node':
+        self.expect('Z')
+        # the function has template parameters of its own
+        tag, args = self._tag_templates, self._template_args
+        self._tag_templates = True
+        encoding = self.parse_encoding()
+        self._tag_templates, self._template_args = tag, args
+        self.expect('E')
+        if self.consume('s'):
+            self.parse_discriminator()
+            return LocalNode(encoding, NameNode('string literal'))
+        if self.consume('d'):
+            # default argument: d [<number>] _ <name>
+            if self.peek() != '_':
+                self.parse_number()
+            self.expect('_')
+        entity = self.parse_name()
+        self.parse_discriminator()
+        return LocalNode(encoding, entity)
+
+    def parse_discriminator(self):
+        if self.consume('__'):
+            self.parse_number()
+            self.expect('_')
+        elif self.consume('_'):
+            if self.peek().isdigit():
+                self._pos += 1
+
+    def parse_nested_name(self) -> 'Node':
+        self.expect('N')
+        quals = self.parse_cv_qualifiers()
+        if self.consume('O'):
+            quals += ' &&'
+        elif self.consume('R'):
+            quals += ' &'
+
+        node = None
+        while not self.consume('E'):
+            c = self.peek()
+            if c == 'S' and self.peek(1) == 't':
+                self._pos += 2
+                node = NameNode('std')
+                continue
+            if c == 'S':
+                if node is not None:
+                    raise DemangleError('substitution inside a nested name')
+                node = self.parse_substitution()
+                continue
+            if c == 'I':
+                if node is None:
+                    raise DemangleError('template arguments without a name')
+                node = TemplateNode(node, self.parse_template_args())
+            elif c == 'T':
+                if node is not None:
+                    raise DemangleError('template parameter inside a nested name')
+                node = self.parse_template_param()
+            elif c == 'D' and self.peek(1) in ('t', 'T'):
+                node = self.parse_decltype()
+            elif c == 'M':
+                # data member initializer of a closure
+                self._pos += 1
+                continue
+            else:
+                name = self.parse_unqualified_name(node)
+                node = NestedNode(node, name) if node is not None else name
+            if self.peek() != 'E':
+                self._subs.append(node)
+        if node is None:
+            raise DemangleError('empty nested name')
+        self._quals = quals
+        return node
+
+    def parse_unqualified_name(self, prefix: 'Node') -> 'Node':
+        c = self.peek()
+        if c.isdigit():
+            name = NameNode(self.parse_source_name())
+        elif c == 'C' and self.peek(1) in '12345I':
+            if prefix is None:
+                raise DemangleError('constructor without a class')
+            self._pos += 2 if self.peek(1) != 'I' else 3
+            name = CtorDtorNode(prefix, False)
+        elif c == 'D' and self.peek(1) in '0124':
+            if prefix is None:
+                raise DemangleError('destructor without a class')
+            self._pos += 2
+            name = CtorDtorNode(prefix, True)
+        elif c == 'U':
+            name = self.parse_unnamed_type()
+        elif c == 'L':
+            # internal linkage
+            self._pos += 1
+            name = NameNode(self.parse_source_name())
+            self.parse_discriminator()
+        elif c.islower():
+            name = self.parse_operator_name()
+        else:
+            raise DemangleError('unknown unqualified name')
+        while self.consume('B'):
+            name = AbiTagNode(name, self.parse_source_name())
+        return name
+
+    def parse_source_name(self) -> str:
+        length = self.parse_number()
+        if length <= 0 or self._pos + length > len(self._s):
+            raise DemangleError('bad source name length')
+        name = self._s[self._pos:self._pos+length]
+        self._pos += length
+        if name.startswith('_GLOBAL_') and len(name) > 10 and name[8] in '._$' and name[9] == 'N':
+            return '(anonymous namespace)'
+        return name
+
+    def parse_unnamed_type(self) -> 'Node':
+        if self.consume('Ut'):
+            index = 1
+            if self.peek() != '_':
+                index = self.parse_number() + 2
+            self.expect('_')
+            return NameNode('{unnamed type#' + str(index) + '}')
+        if self.consume('Ul'):
+            tag = self._tag_templates
+            self._tag_templates = False
+            params = []
+            while not self.consume('E'):
+                params.append(self.parse_type())
+            self._tag_templates = tag
+            index = 1
+            if self.peek() != '_':
+                index = self.parse_number() + 2
+            self.expect('_')
+            out = ['{lambda']
+            print_params(params, out)
+            out.append('#' + str(index) + '}')
+            return NameNode(''.join(out))
+        raise DemangleError('unknown unnamed type')
+
+    def parse_operator_name(self) -> 'Node':
+        code = self._s[self._pos:self._pos+2]
+        if code == 'cv':
+            self._pos += 2
+            tag = self._tag_templates
+            self._tag_templates = False
+            node = ConversionNode(self.parse_type())
+            self._tag_templates = tag
+            return node
+        if code == 'li':
+            self._pos += 2
+            return NameNode('operator"" ' + self.parse_source_name())
+        if code[0] == 'v' and code[1:].isdigit():
+            self._pos += 2
+            return NameNode('operator ' + self.parse_source_name())
+        if code not in OPERATORS:
+            raise DemangleError('unknown operator ' + code)
+        self._pos += 2
+        return OperatorNode(OPERATORS[code][0])
+
+    def parse_cv_qualifiers(self) -> str:
+        quals = ''
+        if self.consume('r'):
+            quals = ' restrict'
+        if self.consume('V'):
+            quals = ' volatile' + quals
+        if self.consume('K'):
+            quals = ' const' + quals
+        return quals
+
+    def parse_substitution(self) -> 'Node':
+        self.expect('S')
+        c = self.peek()
+        if c in STD_SUBSTITUTIONS:
+            self._pos += 1
+            return StdSubstitutionNode(c)
+        index = self.parse_seq_id()
+        if index >= len(self._subs):
+            raise DemangleError('substitution out of range')
+        node = self._subs[index]
+        if isinstance(node, TemplateParamNode):
+            args = self._template_args
+            node = args[node.index] if node.index < len(args) else node.arg
+        return node
+
+    def parse_template_param(self) -> 'Node':
+        self.expect('T')
+        index = self.parse_seq_id()
+        if index >= len(self._template_args):
+            if self._tag_templates is None:
+                return NameNode('auto')
+            raise DemangleError('template parameter out of range')
+        return self._template_args[index]
+
+    def parse_template_args(self) -> list:
+        self.expect('I')
+        tag = self._tag_templates
+        self._tag_templates = False
+        args = []
+        while not self.consume('E'):
+            args.append(self.parse_template_arg())
+        self._tag_templates = tag
+        if tag:
+            self._template_args = args
+        return args
+
+    def parse_template_arg(self) -> 'Node':
+        c = self.peek()
+        if c == 'L':
+            return self.parse_literal()
+        if c == 'X':
+            self._pos += 1
+            node = self.parse_expression()
+            self.expect('E')
+            return node
+        if c == 'J':
+            self._pos += 1
+            args = []
+            while not self.consume('E'):
+                args.append(self.parse_template_arg())
+            return PackNode(args)
+        return self.parse_type()
+
+    def parse_literal(self) -> 'Node':
+        self.expect('L')
+        if self.consume('_Z'):
+            node = self.parse_encoding()
+            self.expect('E')
+            return node
+        if self.consume('Z'):
+            node = self.parse_encoding()
+            self.expect('E')
+            return node
+        c = self.peek()
+        if c == 'b' and self.peek(1) in '01' and self.peek(2) == 'E':
+            self._pos += 3
+            return LiteralNode('true' if self._s[self._pos-2] == '1' else 'false')
+        if c in LITERAL_SUFFIXES:
+            self._pos += 1
+            value = self.parse_number()
+            self.expect('E')
+            return LiteralNode(str(value) + LITERAL_SUFFIXES[c])
+        if c == 'D' and self.peek(1) == 'n':
+            self._pos += 2
+            self.consume('0')
+            self.expect('E')
+            return LiteralNode('(decltype(nullptr))0')
+        type = self.parse_type()
+        start = self._pos
+        while self.peek() not in ('E', ''):
+            self._pos += 1
+        value = self._s[start:self._pos].replace('n', '-', 1) if self._s[start:start+1] == 'n' \
+            else self._s[start:self._pos]
+        self.expect('E')
+        return LiteralNode('(' + type.text() + ')' + value)
+
+    def parse_expression(self) -> 'Node':
+        # the few forms found in template arguments of real libraries
+        c = self.peek()
+        if c == 'T':
+            return self.parse_template_param()
+        if c == 'L':
+            return self.parse_literal()
+        if self.consume('fp'):
+            self.parse_cv_qualifiers()
+            index = self.parse_seq_id() if self.peek() != '_' else 0
+            if index == 0:
+                self.consume('_')
+            return NameNode('{parm#' + str(index + 1) + '}')
+        if self.consume('sr'):
+            # scope resolution: old gcc style qualifiers up to E, or a type
+            if self.peek().isdigit():
+                node = self.parse_simple_id()
+                while not self.consume('E'):
+                    node = NestedNode(node, self.parse_simple_id())
+            else:
+                node = self.parse_type()
+            return NestedNode(node, self.parse_simple_id())
+        if self.consume('sZ'):
+            return LiteralNode('sizeof...(' + self.parse_template_param().text() + ')')
+        if self.consume('st'):
+            return LiteralNode('sizeof (' + self.parse_type().text() + ')')
+        if self.consume('at'):
+            return LiteralNode('alignof (' + self.parse_type().text() + ')')
+        if self.consume('cl'):
+            function = self.parse_expression()
+            args = []
+            while not self.consume('E'):
+                args.append(self.parse_expression().text())
+            return LiteralNode(print_subexpression(function) + '(' + ', '.join(args) + ')')
+        code = self._s[self._pos:self._pos+2]
+        if code in OPERATORS:
+            self._pos += 2
+            name, arity = OPERATORS[code]
+            operands = [print_subexpression(self.parse_expression()) for _ in range(arity)]
+            if arity == 1:
+                return LiteralNode(name + operands[0])
+            if arity == 2:
+                return LiteralNode(operands[0] + name + operands[1])
+            return LiteralNode(operands[0] + '?' + operands[1] + ' : ' + operands[2])
+        raise DemangleError('unsupported expression')
+
+    def parse_simple_id(self) -> 'Node':
+        if self.consume('on'):
+            name = self.parse_operator_name()
+        elif self.consume('dn'):
+            name = NameNode('~' + self.parse_type().text())
+        else:
+            name = NameNode(self.parse_source_name())
+        if self.peek() == 'I':
+            name = TemplateNode(name, self.parse_template_args())
+        return name
+
+    def parse_decltype(self) -> 'Node':
+        self.expect('D')
+        if not (self.consume('t') or self.consume('T')):
+            raise DemangleError('expected decltype')
+        node = self.parse_expression()
+        self.expect('E')
+        return LiteralNode('decltype (' + node.text() + ')')
+
+    def parse_type(self) -> 'Node':
+        c = self.peek()
+        if c in BUILTIN_TYPES:
+            self._pos += 1
+            return NameNode(BUILTIN_TYPES[c])
+        if c == 'D' and self.peek(1) in BUILTIN_D_TYPES:
+            self._pos += 2
+            return NameNode(BUILTIN_D_TYPES[self._s[self._pos-1]])
+        if c == 'D' and self.peek(1) == 'F':
+            self._pos += 2
+            bits = self.parse_number()
+            self.expect('_')
+            return NameNode('_Float' + str(bits))
+        if c == 'u':
+            self._pos += 1
+            return NameNode(self.parse_source_name())
+
+        if c in ('r', 'V', 'K'):
+            quals = self.parse_cv_qualifiers()
+            if self.peek() == 'F':
+                # a qualified function type, as found in pointers to members
+                node = self.parse_function_type(quals)
+                self._subs.append(node)
+                return node
+            child = self.parse_type()
+            if isinstance(child, QualNode):
+                # qualifying an already qualified template argument
+                quals = ''.join(q for q in (' const', ' volatile', ' restrict')
+                                if q in quals or q in child.quals)
+                child = child.child
+            if isinstance(child, ArrayNode):
+                # the qualifiers of an array apply to its elements
+                node = ArrayNode(QualNode(child.element, quals), child.dimension)
+            else:
+                node = QualNode(child, quals)
+        elif c == 'P':
+            self._pos += 1
+            node = PointerNode(self.parse_type(), '*')
+        elif c == 'R':
+            self._pos += 1
+            node = PointerNode(self.parse_type(), '&')
+        elif c == 'O':
+            self._pos += 1
+            node = PointerNode(self.parse_type(), '&&')
+        elif c == 'F':
+            node = self.parse_function_type()
+        elif c == 'A':
+            node = self.parse_array_type()
+        elif c == 'M':
+            self._pos += 1
+            cls = self.parse_type()
+            node = MemberPointerNode(cls, self.parse_type())
+        elif c == 'T':
+            start = self._pos
+            node = self.parse_template_param()
+            self._subs.append(TemplateParamNode(int(self._s[start+1:self._pos-1] or '-1', 36) + 1, node))
+            if self.peek() == 'I':
+                node = TemplateNode(node, self.parse_template_args())
+            else:
+                return node
+        elif c == 'S' and self.peek(1) != 't':
+            node = self.parse_substitution()
+            if self.peek() != 'I':
+                return node
+            node = TemplateNode(node, self.parse_template_args())
+        elif c == 'D' and self.peek(1) == 'p':
+            self._pos += 2
+            node = self.parse_type()
+            node = PackExpansionNode(node, find_pack(node))
+        elif c == 'D' and self.peek(1) in ('t', 'T'):
+            node = self.parse_decltype()
+        else:
+            node = self.parse_name()
+        self._subs.append(node)
+        return node
+
+    def parse_function_type(self, quals: str = '') -> 'Node':
+        self.expect('F')
+        self.consume('Y')
+        ret = self.parse_type()
+        params = []
+        while not self.consume('E'):
+            if self.consume('RE'):
+                quals += ' &'
+                break
+            if self.consume('OE'):
+                quals += ' &&'
+                break
+            params.append(self.parse_type())
+        return FunctionNode(ret, params, quals)
+
+    def parse_array_type(self) -> 'Node':
+        self.expect('A')
+        if self.peek().isdigit():
+            dimension = str(self.parse_number())
+        elif self.peek() == '_':
+            dimension = ''
+        else:
+            dimension = self.parse_expression().text()
+        self.expect('_')
+        return ArrayNode(self.parse_type(), dimension)
+
+
+def is_template(name: 'Node') -> bool:
+    while isinstance(name, (AbiTagNode, LocalNode)):
+        name = name.name if isinstance(name, AbiTagNode) else name.entity
+    return isinstance(name, TemplateNode) and not isinstance(name.name, (PackNode,))
+
+
+def is_ctor_dtor_conversion(name: 'Node') -> bool:
+    while True:
+        if isinstance(name, TemplateNode):
+            name = name.name
+        elif isinstance(name, NestedNode):
+            name = name.name
+        elif isinstance(name, AbiTagNode):
+            name = name.name
+        elif isinstance(name, LocalNode):
+            name = name.entity
+        else:
+            return isinstance(name, (CtorDtorNode, ConversionNode))
+
+
+def find_pack(node: 'Node') -> 'PackNode':
+    if isinstance(node, PackNode):
+        return node
+    for child in ('pointee', 'child', 'prefix'):
+        if hasattr(node, child):
+            return find_pack(getattr(node, child))
+    if isinstance(node, TemplateNode):
+        for arg in node.args:
+            pack = find_pack(arg)
+            if pack is not None:
+                return pack
+    return None
+
+
+#
+# Rust
+#
+
+LEGACY_ESCAPES = {
+    'SP': '@', 'BP': '*', 'RF': '&', 'LT': '<', 'GT': '>', 'LP': '(', 'RP': ')', 'C': ',',
+}
+
+
+def demangle_rust_legacy(name: str) -> str:
+    # _ZN...17h<16 hex digits>E, the components escaped with $..$ and ..,
+    # possibly followed by the suffix of an LLVM clone (.0, .llvm.123,
+    # .cold), which c++filt leaves out
+    if not name.startswith('_ZN'):
+        return None
+    pos = 3
+    parts = []
+    while name[pos] != 'E':
+        start = pos
+        while name[pos].isdigit():
+            pos += 1
+        if start == pos:
+            return None
+        length = int(name[start:pos])
+        parts.append(name[pos:pos+length])
+        pos += length
+        if pos >= len(name):
+            return None
+    if not parts or (pos != len(name) - 1 and name[pos + 1] != '.'):
+        return None
+    last = parts[-1]
+    if len(last) != 17 or last[0] != 'h' or any(c not in '0123456789abcdef' for c in last[1:]):
+        return None
+
+    out = []
+    for part in parts:
+        if part.startswith('_$'):
+            part = part[1:]
+        text = []
+        i = 0
+        while i < len(part):
+            if part[i] == '$':
+                end = part.find('$', i + 1)
+                if end < 0:
+                    return None
+                code = part[i+1:end]
+                if code in LEGACY_ESCAPES:
+                    text.append(LEGACY_ESCAPES[code])
+                elif code.startswith('u') and 1 < len(code) <= 7 and \
+                        all(c in '0123456789abcdef' for c in code[1:]) and int(code[1:], 16) < 0x110000:
+                    text.append(chr(int(code[1:], 16)))
+                else:
+                    return None
+                i = end + 1
+            elif part.startswith('..', i):
+                text.append('::')
+                i += 2
+            else:
+                text.append(part[i])
+                i += 1
+        out.append(''.join(text))
+    return '::'.join(out)
+
+
+RUST_BASIC_TYPES = {
+    'a': 'i8', 'b': 'bool', 'c': 'char', 'd': 'f64', 'e': 'str', 'f': 'f32', 'h': 'u8',
+    'i': 'isize', 'j': 'usize', 'l': 'i32', 'm': 'u32', 'n': 'i128', 'o': 'u128',
+    's': 'i16', 't': 'u16', 'u': '()', 'v': '...', 'x': 'i64', 'y': 'u64', 'z': '!', 'p': '_',
+}
+
+RUST_SIGNED = {'a', 'i', 'l', 'n', 's', 'x'}
+
+
+class RustDemangler:
+    # Rust v0 mangling: _R [version] path [instantiating crate] [vendor suffix]
+
+    def __init__(self, name: str):
+        # vendor suffixes such as .llvm.1234 are not part of the symbol
+        self._s = name.split('.', 1)[0]
+        self._suffix = name[len(self._s):]
+        self._pos = 0
+        self._depth = 0
+        self._bound_lifetimes = 0
+
+    def demangle(self) -> str:
+        if not self._s.startswith('_R'):
+            raise DemangleError('not a Rust v0 name')
+        self._pos = 2
+        if self.peek().isdigit():
+            raise DemangleError('unsupported Rust mangling version')
+        out = []
+        self.print_path(out, True)
+        if self.peek().isupper():
+            # the crate it was instantiated in, not printed
+            self.print_path([], False)
+        if self._pos != len(self._s):
+            raise DemangleError('trailing characters')
+        if self._suffix and not self._suffix.startswith('.llvm.'):
+            out.append(' (' + self._suffix + ')')
+        return ''.join(out)
+
+    def peek(self) -> str:
+        return self._s[self._pos] if self._pos < len(self._s) else ''
+
+    def next(self) -> str:
+        c = self.peek()
+        if not c:
+            raise DemangleError('unexpected end of name')
+        self._pos += 1
+        return c
+
+    def consume(self, c: str) -> bool:
+        if self.peek() == c:
+            self._pos += 1
+            return True
+        return False
+
+    def parse_base62(self) -> int:
+        # _ is 0, otherwise the digits then _, plus one
+        if self.consume('_'):
+            return 0
+        value = 0
+        while not self.consume('_'):
+            c = self.next()
+            if c.isdigit():
+                digit = ord(c) - ord('0')
+            elif c.islower():
+                digit = 10 + ord(c) - ord('a')
+            elif c.isupper():
+                digit = 36 + ord(c) - ord('A')
+            else:
+                raise DemangleError('bad base62 number')
+            value = value * 62 + digit
+        return value + 1
+
+    def parse_opt_base62(self, tag: str) -> int:
+        if not self.consume(tag):
+            return 0
+        return self.parse_base62() + 1
+
+    def parse_decimal(self) -> int:
+        # no leading zeros: 0 stands alone
+        if self.consume('0'):
+            return 0
+        start = self._pos
+        while self.peek().isdigit():
+            self._pos += 1
+        if start == self._pos:
+            raise DemangleError('expected a number')
+        return int(self._s[start:self._pos])
+
+    def parse_ident(self) -> str:
+        punycode = self.consume('u')
+        length = self.parse_decimal()
+        self.consume('_')
+        ident = self._s[self._pos:self._pos+length]
+        if len(ident) != length:
+            raise DemangleError('identifier past the end')
+        self._pos += length
+        if punycode:
+            # the last _ delimits the basic code points, - in RFC 3492
+            basic, _, encoded = ident.rpartition('_')
+            try:
+                ident = (basic + '-' + encoded).encode('ascii').decode('punycode') if basic \
+                    else encoded.encode('ascii').decode('punycode')
+            except UnicodeError:
+                raise DemangleError('bad punycode')
+        return ident
+
+    def backref(self, out: list, func, *args):
+        # B <base62>: print again what is at that position
+        start = self._pos - 1
+        target = self.parse_base62() + 2
+        if target >= start:
+            raise DemangleError('forward back reference')
+        self._depth += 1
+        if self._depth > 64:
+            raise DemangleError('back references too deep')
+        pos = self._pos
+        self._pos = target
+        func(out, *args)
+        self._pos = pos
+        self._depth -= 1
+
+    def print_path(self, out: list, in_value: bool):
+        c = self.next()
+        if c == 'C':
+            disambiguator = self.parse_opt_base62('s')
+            out.append(self.parse_ident())
+            out.append('[{:x}]'.format(disambiguator))
+        elif c == 'N':
+            namespace = self.next()
+            self.print_path(out, in_value)
+            disambiguator = self.parse_opt_base62('s')
+            ident = self.parse_ident()
+            if namespace.isupper():
+                kind = {'C': 'closure', 'S': 'shim'}.get(namespace, namespace)
+                out.append('::{' + kind + (':' + ident if ident else '') +
+                           '#' + str(disambiguator) + '}')
+            else:
+                out.append('::' + ident if ident else '')
+        elif c in ('M', 'X', 'Y'):
+            if c != 'Y':
+                self.parse_opt_base62('s')
+                self.print_path([], False)
+            out.append('<')
+            self.print_type(out)
+            if c != 'M':
+                out.append(' as ')
+                self.print_path(out, False)
+            out.append('>')
+        elif c == 'I':
+            self.print_path(out, in_value)
+            if in_value:
+                out.append('::')
+            out.append('<')
+            first = True
+            while not self.consume('E'):
+                if not first:
+                    out.append(', ')
+                first = False
+                self.print_generic_arg(out)
+            out.append('>')
+        elif c == 'B':
+            self.backref(out, self.print_path, in_value)
+        else:
+            raise DemangleError('unknown path')
+
+    def print_generic_arg(self, out: list):
+        if self.consume('L'):
+            self.print_lifetime(out, self.parse_base62())
+        elif self.consume('K'):
+            self.print_const(out)
+        else:
+            self.print_type(out)
+
+    def print_lifetime(self, out: list, index: int):
+        if index == 0:
+            out.append("'_")
+        elif index <= self._bound_lifetimes:
+            depth = self._bound_lifetimes - index
+            out.append("'" + (chr(ord('a') + depth) if depth < 26 else '_' + str(depth)))
+        else:
+            raise DemangleError('unbound lifetime')
+
+    def print_binder(self, out: list) -> int:
+        # G <base62>: lifetimes introduced by a for<...> binder
+        count = self.parse_opt_base62('G')
+        if count:
+            out.append('for<')
+            for i in range(count):
+                if i:
+                    out.append(', ')
+                self._bound_lifetimes += 1
+                self.print_lifetime(out, 1)
+            out.append('> ')
+        return count
+
+    def print_type(self, out: list):
+        c = self.next()
+        if c in RUST_BASIC_TYPES:
+            out.append(RUST_BASIC_TYPES[c])
+        elif c in ('R', 'Q'):
+            out.append('&')
+            if self.consume('L'):
+                lifetime = self.parse_base62()
+                if lifetime:
+                    self.print_lifetime(out, lifetime)
+                    out.append(' ')
+            if c == 'Q':
+                out.append('mut ')
+            self.print_type(out)
+        elif c in ('P', 'O'):
+            out.append('*const ' if c == 'P' else '*mut ')
+            self.print_type(out)
+        elif c == 'A':
+            out.append('[')
+            self.print_type(out)
+            out.append('; ')
+            self.print_const(out)
+            out.append(']')
+        elif c == 'S':
+            out.append('[')
+            self.print_type(out)
+            out.append(']')
+        elif c == 'T':
+            out.append('(')
+            count = 0
+            while not self.consume('E'):
+                if count:
+                    out.append(', ')
+                self.print_type(out)
+                count += 1
+            out.append(',)' if count == 1 else ')')
+        elif c == 'F':
+            bound = self._bound_lifetimes
+            self.print_binder(out)
+            if self.consume('U'):
+                out.append('unsafe ')
+            if self.consume('K'):
+                if self.consume('C'):
+                    abi = 'C'
+                else:
+                    abi = self.parse_ident().replace('_', '-')
+                out.append('extern "' + abi + '" ')
+            out.append('fn(')
+            first = True
+            while not self.consume('E'):
+                if not first:
+                    out.append(', ')
+                first = False
+                self.print_type(out)
+            out.append(')')
+            if self.peek() == 'u':
+                self._pos += 1
+            else:
+                out.append(' -> ')
+                self.print_type(out)
+            self._bound_lifetimes = bound
+        elif c == 'D':
+            out.append('dyn ')
+            bound = self._bound_lifetimes
+            self.print_binder(out)
+            first = True
+            while not self.consume('E'):
+                if not first:
+                    out.append(' + ')
+                first = False
+                self.print_dyn_trait(out)
+            self._bound_lifetimes = bound
+            self.expect_lifetime(out)
+        elif c == 'B':
+            self.backref(out, self.print_type)
+        else:
+            self._pos -= 1
+            self.print_path(out, False)
+
+    def expect_lifetime(self, out: list):
+        if not self.consume('L'):
+            raise DemangleError('expected a lifetime')
+        lifetime = self.parse_base62()
+        if lifetime:
+            out.append(' + ')
+            self.print_lifetime(out, lifetime)
+
+    def print_dyn_trait(self, out: list):
+        # the trait path, its generic arguments and associated type bindings
+        args = []
+        self.print_path_maybe_open_generics(out, args)
+        while self.consume('p'):
+            binding = [self.parse_ident(), ' = ']
+            self.print_type(binding)
+            args.append(''.join(binding))
+        if args:
+            out.append('<' + ', '.join(args) + '>')
+
+    def print_path_maybe_open_generics(self, out: list, args: list):
+        # like print_path for a type, leaving the generic arguments open so
+        # that bindings can be added to them
+        if self.peek() == 'B':
+            self._pos += 1
+            start = self._pos - 1
+            target = self.parse_base62() + 2
+            if target >= start:
+                raise DemangleError('forward back reference')
+            pos = self._pos
+            self._pos = target
+            self.print_path_maybe_open_generics(out, args)
+            self._pos = pos
+        elif self.peek() == 'I':
+            self._pos += 1
+            self.print_path(out, False)
+            while not self.consume('E'):
+                arg = []
+                self.print_generic_arg(arg)
+                args.append(''.join(arg))
+        else:
+            self.print_path(out, False)
+
+    def print_const(self, out: list):
+        c = self.next()
+        if c == 'B':
+            self.backref(out, self.print_const)
+            return
+        if c == 'p':
+            out.append('_')
+            return
+        negative = c in RUST_SIGNED and self.consume('n')
+        start = self._pos
+        while self.peek() != '_':
+            if self.peek() not in '0123456789abcdef':
+                raise DemangleError('bad constant')
+            self._pos += 1
+        value = int(self._s[start:self._pos] or '0', 16)
+        self._pos += 1
+        if c == 'b':
+            out.append('true' if value else 'false')
+        elif c == 'c':
+            out.append(repr(chr(value)))
+        elif c in RUST_BASIC_TYPES and c not in ('e', 'u', 'v', 'z', 'd', 'f'):
+            out.append(('-' if negative else '') + str(value))
+        else:
+            raise DemangleError('unsupported constant type')
+        out.append(': ' + RUST_BASIC_TYPES[c])
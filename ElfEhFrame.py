@@ -0,0 +1,497 @@
+from array import array
+from bisect import bisect_right
+from collections import OrderedDict
+from ElfDebugLine import read_cstring, read_sleb, read_uleb
+from ElfValidation import require_buffer
+import struct
+import sys
+from typing import Iterator, Optional, Tuple
+
+
+# DW_EH_PE_* pointer encodings: the low nibble is the format, the high
+# one what the value is relative to
+DW_EH_PE_absptr = 0x00
+DW_EH_PE_uleb128 = 0x01
+DW_EH_PE_udata2 = 0x02
+DW_EH_PE_udata4 = 0x03
+DW_EH_PE_udata8 = 0x04
+DW_EH_PE_sleb128 = 0x09
+DW_EH_PE_sdata2 = 0x0a
+DW_EH_PE_sdata4 = 0x0b
+DW_EH_PE_sdata8 = 0x0c
+DW_EH_PE_pcrel = 0x10
+DW_EH_PE_datarel = 0x30
+DW_EH_PE_indirect = 0x80
+DW_EH_PE_omit = 0xff
+
+# what compilers emit for the FDE pointers, decoded without read_encoded()
+PCREL_SDATA4 = struct.Struct('<iI')
+
+# the searchable (fixed size) .eh_frame_hdr table formats as array types
+TABLE_TYPECODES = {
+    DW_EH_PE_udata4: 'I',
+    DW_EH_PE_sdata4: 'i',
+    DW_EH_PE_udata8: 'Q',
+    DW_EH_PE_sdata8: 'q',
+}
+
+FIXED_FORMATS = {
+    DW_EH_PE_udata2: (2, False),
+    DW_EH_PE_udata4: (4, False),
+    DW_EH_PE_udata8: (8, False),
+    DW_EH_PE_sdata2: (2, True),
+    DW_EH_PE_sdata4: (4, True),
+    DW_EH_PE_sdata8: (8, True),
+}
+
+
+def read_encoded(buf: bytes, pos: int, encoding: int, word: int, base: int = 0, datarel: int = 0) -> tuple:
+    # One pointer of the given DW_EH_PE_* encoding at buf[pos], where base
+    # is the virtual address of buf[0] for the pc-relative ones. Indirect
+    # pointers are left as the address of the pointer.
+    fmt = encoding & 0x0f
+    if fmt == DW_EH_PE_absptr:
+        value, end = int.from_bytes(buf[pos:pos+word], 'little'), pos + word
+    elif fmt == DW_EH_PE_uleb128:
+        value, end = read_uleb(buf, pos)
+    elif fmt == DW_EH_PE_sleb128:
+        value, end = read_sleb(buf, pos)
+    elif fmt in FIXED_FORMATS:
+        size, signed = FIXED_FORMATS[fmt]
+        value, end = int.from_bytes(buf[pos:pos+size], 'little', signed=signed), pos + size
+    else:
+        raise ValueError('unknown pointer encoding 0x{:02x}'.format(encoding))
+    if end > len(buf):
+        raise ValueError('pointer at 0x{:x} runs past the end of the data'.format(pos))
+
+    relative = encoding & 0x70
+    if relative == DW_EH_PE_pcrel:
+        value += base + pos
+    elif relative == DW_EH_PE_datarel:
+        value += datarel
+    elif relative:
+        raise ValueError('unsupported pointer encoding 0x{:02x}'.format(encoding))
+    return value & ((1 << (8 * word)) - 1), end
+
+
+class Cie:
+    # Common information entry: what the FDEs referring to it share, the
+    # encoding of their pointers and the initial call frame instructions.
+
+    def __init__(self, offset: int):
+        self._offset = offset           # in the file
+        self._version = None
+        self._augmentation = None
+        self._code_alignment = None
+        self._data_alignment = None
+        self._return_register = None
+        self._fde_encoding = DW_EH_PE_absptr
+        self._lsda_encoding = DW_EH_PE_omit
+        self._personality = None        # address of the personality routine, or of its pointer
+        self._signal_frame = False
+        self._instructions = b''
+
+    def parse(self, mm: 'mmap.mmap', end: int, id_at: int, word: int, base: int):
+        pos = id_at + 4
+        self._version = mm[pos]
+        self._augmentation, pos = read_cstring(mm, pos + 1)
+        if 'eh' in self._augmentation:
+            pos += word                 # old GCC eh_data pointer
+        self._code_alignment, pos = read_uleb(mm, pos)
+        self._data_alignment, pos = read_sleb(mm, pos)
+        if self._version == 1:
+            self._return_register = mm[pos]
+            pos += 1
+        else:
+            self._return_register, pos = read_uleb(mm, pos)
+
+        if self._augmentation.startswith('z'):
+            length, pos = read_uleb(mm, pos)
+            data_end = pos + length
+            for c in self._augmentation[1:]:
+                if c == 'R':
+                    self._fde_encoding = mm[pos]
+                    pos += 1
+                elif c == 'L':
+                    self._lsda_encoding = mm[pos]
+                    pos += 1
+                elif c == 'P':
+                    self._personality, pos = read_encoded(mm, pos + 1, mm[pos], word, base)
+                elif c == 'S':
+                    self._signal_frame = True
+                elif c not in 'BG':
+                    break       # unknown, the rest of the data is skipped by its length
+            pos = data_end
+        if pos > end:
+            raise ValueError('CIE at 0x{:x} runs past its end'.format(self._offset))
+        self._instructions = mm[pos:end]
+
+    def __str__(self):
+        return 'CIE 0x{:08x} version {} "{}" code {} data {} ra {}'.format(
+            self._offset, self._version, self._augmentation, self._code_alignment,
+            self._data_alignment, self._return_register)
+
+    @property
+    def offset(self) -> int:
+        return self._offset
+
+    @property
+    def version(self) -> int:
+        return self._version
+
+    @property
+    def augmentation(self) -> str:
+        return self._augmentation
+
+    @property
+    def code_alignment(self) -> int:
+        return self._code_alignment
+
+    @property
+    def data_alignment(self) -> int:
+        return self._data_alignment
+
+    @property
+    def return_register(self) -> int:
+        return self._return_register
+
+    @property
+    def fde_encoding(self) -> int:
+        return self._fde_encoding
+
+    @property
+    def lsda_encoding(self) -> int:
+        return self._lsda_encoding
+
+    @property
+    def personality(self) -> Optional[int]:
+        return self._personality
+
+    @property
+    def signal_frame(self) -> bool:
+        return self._signal_frame
+
+    @property
+    def instructions(self) -> bytes:
+        return self._instructions
+
+
+class Fde:
+    # Frame description entry: the code range of one function, the call
+    # frame instructions for it, and its language specific data area.
+
+    def __init__(self, offset: int, cie: 'Cie'):
+        self._offset = offset           # in the file
+        self._cie = cie
+        self._pc_begin = None
+        self._pc_end = None
+        self._lsda = None
+        self._instructions = b''
+
+    def parse(self, mm: 'mmap.mmap', end: int, id_at: int, word: int, base: int):
+        cie = self._cie
+        pos = id_at + 4
+        if cie.fde_encoding == DW_EH_PE_pcrel | DW_EH_PE_sdata4 and pos + 8 <= end:
+            begin, size = PCREL_SDATA4.unpack_from(mm, pos)
+            self._pc_begin = (begin + base + pos) & ((1 << (8 * word)) - 1)
+            pos += 8
+        else:
+            self._pc_begin, pos = read_encoded(mm, pos, cie.fde_encoding, word, base)
+            size, pos = read_encoded(mm, pos, cie.fde_encoding & 0x0f, word)
+        self._pc_end = self._pc_begin + size
+        if cie.augmentation.startswith('z'):
+            length, pos = read_uleb(mm, pos)
+            data_end = pos + length
+            if cie.lsda_encoding != DW_EH_PE_omit:
+                # a null pointer, before it is made relative, for none
+                raw, _ = read_encoded(mm, pos, cie.lsda_encoding & 0x0f, word)
+                if raw:
+                    self._lsda, _ = read_encoded(mm, pos, cie.lsda_encoding, word, base)
+            pos = data_end
+        if pos > end:
+            raise ValueError('FDE at 0x{:x} runs past its end'.format(self._offset))
+        self._instructions = mm[pos:end]
+
+    def __str__(self):
+        s = 'FDE 0x{:08x} cie 0x{:08x} pc 0x{:x}..0x{:x}'.format(
+            self._offset, self._cie.offset, self._pc_begin, self._pc_end)
+        if self._lsda is not None:
+            s += ' lsda 0x{:x}'.format(self._lsda)
+        return s
+
+    def __contains__(self, pc: int) -> bool:
+        return self._pc_begin <= pc < self._pc_end
+
+    @property
+    def offset(self) -> int:
+        return self._offset
+
+    @property
+    def cie(self) -> 'Cie':
+        return self._cie
+
+    @property
+    def pc_begin(self) -> int:
+        return self._pc_begin
+
+    @property
+    def pc_end(self) -> int:
+        return self._pc_end
+
+    @property
+    def lsda(self) -> Optional[int]:
+        return self._lsda
+
+    @property
+    def instructions(self) -> bytes:
+        return self._instructions
+
+
+class ElfEhFrameHdr:
+    # The .eh_frame_hdr of PT_GNU_EH_FRAME: where .eh_frame is, and a table
+    # of (initial location, FDE address) sorted by location for binary
+    # search. Only the location column is copied out, on the first search,
+    # which is a single slice of the file; the FDE address is read from the
+    # mmap for the entry found.
+
+    def __init__(self, mm: 'mmap.mmap', offset: int, address: int, size: int, word: int):
+        self._mm = mm
+        self._offset = offset
+        self._address = address
+        self._size = size
+        self._word = word
+        self._eh_frame_address = None
+        self._fde_count = 0
+        self._table_encoding = DW_EH_PE_omit
+        self._table_offset = None
+        self._locations = None
+
+    def parse(self):
+        mm, offset = self._mm, self._offset
+        if self._size < 4 or mm[offset] != 1:
+            raise ValueError('unsupported .eh_frame_hdr version')
+        frame_encoding, count_encoding, self._table_encoding = mm[offset+1], mm[offset+2], mm[offset+3]
+        # the pointers are relative to the start of the header
+        base = self._address - offset
+        pos = offset + 4
+        if frame_encoding != DW_EH_PE_omit:
+            self._eh_frame_address, pos = read_encoded(mm, pos, frame_encoding, self._word, base, self._address)
+        if count_encoding != DW_EH_PE_omit and self._table_encoding != DW_EH_PE_omit:
+            self._fde_count, pos = read_encoded(mm, pos, count_encoding, self._word, base, self._address)
+            self._table_offset = pos
+        typecode = TABLE_TYPECODES.get(self._table_encoding & 0x0f)
+        if self._fde_count and (typecode is None or self._table_encoding & 0x70 not in (0, DW_EH_PE_datarel)):
+            raise ValueError('unsearchable .eh_frame_hdr table encoding 0x{:02x}'.format(self._table_encoding))
+        entry = 2 * array(typecode or 'I').itemsize
+        if pos + self._fde_count * entry > offset + self._size:
+            raise ValueError('.eh_frame_hdr table runs past the end of the header')
+
+    def _load(self):
+        typecode = TABLE_TYPECODES[self._table_encoding & 0x0f]
+        table = array(typecode)
+        table.frombytes(self._mm[self._table_offset:self._table_offset + self._fde_count * 2 * table.itemsize])
+        if sys.byteorder != 'little':
+            table.byteswap()
+        self._locations = table[0::2]
+
+    def find(self, pc: int) -> Optional[int]:
+        # address of the FDE of the last location at or below pc
+        if not self._fde_count:
+            return None
+        if self._locations is None:
+            self._load()
+        relative = self._address if self._table_encoding & 0x70 == DW_EH_PE_datarel else 0
+        i = bisect_right(self._locations, pc - relative) - 1
+        if i < 0:
+            return None
+        size = self._locations.itemsize
+        at = self._table_offset + (2 * i + 1) * size
+        signed = self._locations.typecode in 'iq'
+        return (int.from_bytes(self._mm[at:at+size], 'little', signed=signed) + relative) & ((1 << (8 * self._word)) - 1)
+
+    @property
+    def offset(self) -> int:
+        return self._offset
+
+    @property
+    def eh_frame_address(self) -> Optional[int]:
+        return self._eh_frame_address
+
+    @property
+    def fde_count(self) -> int:
+        return self._fde_count
+
+
+class ElfEhFrame:
+    # The call frame information of .eh_frame, read in place from the
+    # mapped file. Each FDE (frame description entry) covers the code of
+    # one function, which makes the FDEs a source of function boundaries
+    # that even stripped binaries keep, and the information to unwind a
+    # frame of it.
+    #
+    # Looking up the FDE of an address goes through the sorted table of
+    # .eh_frame_hdr when there is one, and then decodes that FDE only,
+    # plus its CIE the first time. Without the table, the FDE ranges are
+    # indexed by a single pass over .eh_frame on the first lookup. Both
+    # are also found from PT_GNU_EH_FRAME when the section headers are
+    # missing. The FDEs last looked up are kept in a small LRU, as the
+    # samples of a profile keep hitting the same hot functions.
+
+    def __init__(self, elf: 'ELF', section: 'ElfSection' = None, max_fdes: int = 4096):
+        self._max_fdes = max_fdes
+        require_buffer(elf.mm, 'the unwind table')
+        self._mm = elf.mm
+        self._word = 8 if elf.header.get_class() == 'ELF64' else 4
+        self._hdr = self._find_hdr(elf)
+        if section is None:
+            section = elf.sections.get('.eh_frame')
+        if section is not None and section.type != 'NOBITS':
+            self._start = section.offset
+            self._end = min(section.offset + section.size, elf.size)
+            self._base = section.address - section.offset   # virtual address of mm[0]
+        elif self._hdr is not None and self._hdr.eh_frame_address is not None:
+            # the LOAD segment holding it bounds it
+            address = self._hdr.eh_frame_address
+            for segment in elf.segments:
+                vaddr = segment.get_vaddr()
+                if segment.get_type() == 'LOAD' and vaddr <= address < vaddr + segment.get_filesz():
+                    self._base = vaddr - segment.get_offset()
+                    self._start = address - self._base
+                    self._end = min(segment.get_offset() + segment.get_filesz(), elf.size)
+                    break
+            else:
+                raise ValueError('.eh_frame at 0x{:x} is not in the file'.format(address))
+        else:
+            raise ValueError('no .eh_frame section')
+        self._cies = {}         # offset -> Cie
+        self._fdes = OrderedDict()  # offset -> Fde, least recently used first
+        self._starts = None     # without .eh_frame_hdr, sorted FDE starts
+        self._offsets = None    # and the offsets of those FDEs
+
+    def _find_hdr(self, elf: 'ELF') -> Optional['ElfEhFrameHdr']:
+        hdr = None
+        section = elf.sections.get('.eh_frame_hdr')
+        if section is not None and section.type != 'NOBITS':
+            hdr = ElfEhFrameHdr(elf.mm, section.offset, section.address,
+                                min(section.size, elf.size - section.offset), self._word)
+        else:
+            for segment in elf.segments:
+                if segment.get_type() == 'GNU_EH_FRAME':
+                    hdr = ElfEhFrameHdr(elf.mm, segment.get_offset(), segment.get_vaddr(),
+                                        min(segment.get_filesz(), elf.size - segment.get_offset()), self._word)
+                    break
+        if hdr is not None:
+            try:
+                hdr.parse()
+            except (ValueError, IndexError) as e:
+                elf.issues.add('.eh_frame_hdr', str(e), hdr.offset)
+                hdr = None
+        return hdr
+
+    def _records(self) -> Iterator[Tuple[int, int, int, int]]:
+        # (offset, end, id field offset, id) of each record, up to the zero
+        # terminator
+        pos = self._start
+        while pos + 4 <= self._end:
+            record = self._record(pos)
+            if record is None:
+                return
+            yield (pos,) + record
+            pos = record[0]
+
+    def _record(self, offset: int) -> Optional[Tuple[int, int, int]]:
+        # (end, id field offset, id) of the record at offset, None for the
+        # terminator
+        mm = self._mm
+        length = int.from_bytes(mm[offset:offset+4], 'little')
+        if length == 0:
+            return None
+        id_at = offset + 4
+        if length == 0xffffffff:
+            length = int.from_bytes(mm[offset+4:offset+12], 'little')
+            id_at = offset + 12
+        end = id_at + length
+        if end > self._end or length < 4 or offset < self._start:
+            raise ValueError('record at 0x{:x} runs past the end of .eh_frame'.format(offset))
+        return end, id_at, int.from_bytes(mm[id_at:id_at+4], 'little')
+
+    def get_cie(self, offset: int) -> 'Cie':
+        cie = self._cies.get(offset)
+        if cie is None:
+            record = self._record(offset)
+            if record is None or record[2] != 0:
+                raise ValueError('no CIE at 0x{:x}'.format(offset))
+            end, id_at, _ = record
+            cie = Cie(offset)
+            cie.parse(self._mm, end, id_at, self._word, self._base)
+            self._cies[offset] = cie
+        return cie
+
+    def get_fde(self, offset: int) -> 'Fde':
+        fde = self._fdes.get(offset)
+        if fde is not None:
+            self._fdes.move_to_end(offset)
+            return fde
+        record = self._record(offset)
+        if record is None or record[2] == 0:
+            raise ValueError('no FDE at 0x{:x}'.format(offset))
+        end, id_at, cie_id = record
+        fde = Fde(offset, self.get_cie(id_at - cie_id))
+        fde.parse(self._mm, end, id_at, self._word, self._base)
+        self._fdes[offset] = fde
+        if len(self._fdes) > self._max_fdes:
+            self._fdes.popitem(last=False)
+        return fde
+
+    def get_fdes(self) -> Iterator['Fde']:
+        for offset, end, id_at, cie_id in self._records():
+            if cie_id != 0:
+                fde = Fde(offset, self.get_cie(id_at - cie_id))
+                fde.parse(self._mm, end, id_at, self._word, self._base)
+                yield fde
+
+    def get_fde_ranges(self) -> Iterator[Tuple[int, int]]:
+        # (start, end) address of the code covered by each FDE
+        for _, start, end in self._get_fde_ranges():
+            if start != end:
+                yield start, end
+
+    def _get_fde_ranges(self) -> Iterator[Tuple[int, int, int]]:
+        # (offset, start, end) of each FDE, without building the Fde
+        mm = self._mm
+        for offset, end, id_at, cie_id in self._records():
+            if cie_id == 0:
+                continue
+            encoding = self.get_cie(id_at - cie_id).fde_encoding
+            if encoding == DW_EH_PE_pcrel | DW_EH_PE_sdata4 and id_at + 12 <= end:
+                start, size = PCREL_SDATA4.unpack_from(mm, id_at + 4)
+                start = (start + self._base + id_at + 4) & ((1 << (8 * self._word)) - 1)
+            else:
+                start, pos = read_encoded(mm, id_at + 4, encoding, self._word, self._base)
+                size, _ = read_encoded(mm, pos, encoding & 0x0f, self._word)
+            yield offset, start, start + size
+
+    def lookup(self, pc: int) -> Optional['Fde']:
+        # the FDE covering pc
+        if self._hdr is not None and self._hdr.fde_count:
+            address = self._hdr.find(pc)
+            if address is None:
+                return None
+            fde = self.get_fde(address - self._base)
+        else:
+            if self._starts is None:
+                self._build_index()
+            i = bisect_right(self._starts, pc) - 1
+            if i < 0:
+                return None
+            fde = self.get_fde(self._offsets[i])
+        return fde if pc in fde else None
+
+    def _build_index(self):
+        index = sorted((start, offset) for offset, start, end in self._get_fde_ranges() if start != end)
+        self._starts = [start for start, _ in index]
+        self._offsets = [offset for _, offset in index]
+
+    @property
+    def hdr(self) -> Optional['ElfEhFrameHdr']:
+        return self._hdr
@@ -0,0 +1,324 @@
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from ElfValidation import require_buffer
+import math
+import mmap
+import re
+import time
+from typing import Dict, Iterator, List, NamedTuple, Tuple
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+# a byte other than zero, to find where a run of zeros ends
+NONZERO = re.compile(rb'[^\x00]')
+NUMPY_BLOCK = 1 << 16
+# Without numpy a block is split by value, 16 values to a group, with
+# translate() deleting the other 240, and each group counted with
+# bytes.count(): 32 passes in C over the block instead of 256 with count()
+# alone. That is about 20 MB/s, against 14 MB/s for Counter and some
+# 400 MB/s for numpy.
+COUNT_BLOCK = 1 << 20
+GROUPS = [(first, bytes(range(256)).translate(None, bytes(range(first, first + 16))))
+          for first in range(0, 256, 16)]
+
+
+class ByteStats(NamedTuple):
+    name: str
+    offset: int
+    size: int
+    entropy: float          # bits per byte, 0 to 8
+    histogram: Tuple[int, ...]
+    zero_runs: int          # runs of at least min_run zero bytes
+    longest_zero_run: int
+    zero_run_bytes: int     # in those runs
+
+
+def histogram(buf, start: int, end: int) -> List[int]:
+    # number of bytes of each value in buf[start:end], counted in place:
+    # numpy's bincount when numpy is there, without copying the bytes out
+    # of buf (which may be an mmap), translate() and count() otherwise
+    if start >= end:
+        return [0] * 256
+    if NONZERO.search(buf, start, end) is None:
+        # padding, holes, zero-filled data: found at the speed of memory
+        return [end - start] + [0] * 255
+    if numpy is not None:
+        # bincount widens its input to intp, so it is given blocks that
+        # stay in the cache once widened
+        values = numpy.frombuffer(buf, dtype=numpy.uint8, count=end - start, offset=start)
+        counts = numpy.zeros(256, dtype=numpy.int64)
+        for i in range(0, end - start, NUMPY_BLOCK):
+            counts += numpy.bincount(values[i:i + NUMPY_BLOCK], minlength=256)
+        return counts.tolist()
+    counts = [0] * 256
+    with memoryview(buf) as view:
+        for pos in range(start, end, COUNT_BLOCK):
+            block = view[pos:min(pos + COUNT_BLOCK, end)].tobytes()
+            for first, others in GROUPS:
+                group = block.translate(None, others)
+                rest = len(group)
+                value = first
+                # the last value of the group is what the others leave
+                while rest:
+                    n = group.count(value) if value < first + 15 else rest
+                    counts[value] += n
+                    rest -= n
+                    value += 1
+    return counts
+
+
+def entropy(counts: List[int]) -> float:
+    # Shannon entropy of a histogram, in bits per byte
+    total = sum(counts)
+    if not total:
+        return 0.0
+    # summed as positive terms, so constant data gives 0.0 and not -0.0
+    return sum(n / total * math.log2(total / n) for n in counts if n)
+
+
+def zero_runs(buf, start: int, end: int, limit: int, min_run: int,
+              owned: bool = True) -> Tuple[int, int, int]:
+    # (count, longest, total bytes) of the runs of at least min_run zeros
+    # starting in [start, end), which may go on up to limit. A run already
+    # going on at start is the previous chunk's, unless owned
+    zeros = bytes(min_run)
+    pos = start
+    if not owned and pos > 0 and buf[pos - 1] == 0 and pos < limit and buf[pos] == 0:
+        match = NONZERO.search(buf, pos, limit)
+        pos = match.start() if match else limit
+    count = longest = total = 0
+    while pos < end:
+        run = buf.find(zeros, pos, limit)
+        if run < 0 or run >= end:
+            break
+        match = NONZERO.search(buf, run + min_run, limit)
+        pos = match.start() if match else limit
+        count += 1
+        longest = max(longest, pos - run)
+        total += pos - run
+    return count, longest, total
+
+
+def _count_chunk(buf, start: int, end: int, limit: int, min_run: int, owned: bool) -> tuple:
+    return (histogram(buf, start, end),) + zero_runs(buf, start, end, limit, min_run, owned)
+
+
+def _count_chunk_file(filename: str, start: int, end: int, limit: int, min_run: int, owned: bool) -> tuple:
+    # runs in a worker process, which maps the file on its own
+    with open(filename, 'rb') as f:
+        mm = mmap.mmap(f.fileno(), 0, flags=mmap.MAP_PRIVATE, prot=mmap.PROT_READ)
+        try:
+            return _count_chunk(mm, start, end, limit, min_run, owned)
+        finally:
+            mm.close()
+
+
+class ElfEntropy:
+    # Per-section byte statistics for spotting packed or encrypted
+    # content: the Shannon entropy, the histogram of byte values and the
+    # runs of zeros. The sections are counted in place in the mmap, in
+    # chunks of chunk_size, with numpy when it is installed and C-level
+    # counting otherwise, never byte by byte in Python. With jobs > 1, and
+    # a file the workers can map again, the chunks are spread over worker
+    # processes; each chunk owns the zero runs starting in it, and follows
+    # them past its end.
+
+    def __init__(self, elf: 'ELF', sections: List[str] = None, min_run: int = 16,
+                 chunk_size: int = 1 << 24, jobs: int = 1):
+        self._elf = elf
+        self._names = sections
+        self._min_run = min_run
+        self._chunk_size = chunk_size
+        self._jobs = jobs
+        self._stats = None
+
+    def get_sections(self) -> List['ElfSection']:
+        return [section for section in self._elf.sections
+                if section.type != 'NOBITS' and section.size and section.offset < self._elf.size
+                and (self._names is None or section.name in self._names)]
+
+    def get_chunks(self) -> List[Tuple['ElfSection', int, int, int]]:
+        chunks = []
+        for section in self.get_sections():
+            limit = min(section.offset + section.size, self._elf.size)
+            for start in range(section.offset, limit, self._chunk_size):
+                chunks.append((section, start, min(start + self._chunk_size, limit), limit))
+        return chunks
+
+    def get_stats(self) -> List['ByteStats']:
+        if self._stats is None:
+            self._stats = self._count()
+        return self._stats
+
+    def _count(self) -> List['ByteStats']:
+        chunks = self.get_chunks()
+        args = [(start, end, limit, self._min_run, start == section.offset)
+                for section, start, end, limit in chunks]
+        if self._jobs > 1 and len(chunks) > 1 and self._elf.has_file:
+            filename = self._elf.filename
+            with ProcessPoolExecutor(max_workers=self._jobs) as executor:
+                futures = [executor.submit(_count_chunk_file, filename, *arg) for arg in args]
+                results = [future.result() for future in futures]
+        else:
+            require_buffer(self._elf.mm, 'the entropy')
+            results = [_count_chunk(self._elf.mm, *arg) for arg in args]
+
+        # the chunks of a section are consecutive
+        merged = {}     # section index -> [section, histogram, runs, longest, total]
+        for (section, _, _, _), (counts, runs, longest, total) in zip(chunks, results):
+            entry = merged.get(section.index)
+            if entry is None:
+                merged[section.index] = [section, counts, runs, longest, total]
+            else:
+                entry[1] = [a + b for a, b in zip(entry[1], counts)]
+                entry[2] += runs
+                entry[3] = max(entry[3], longest)
+                entry[4] += total
+
+        stats = []
+        for section, counts, runs, longest, total in merged.values():
+            stats.append(ByteStats(section.name, section.offset, sum(counts), entropy(counts),
+                                   tuple(counts), runs, longest, total))
+        return stats
+
+    def get(self, name: str) -> 'ByteStats':
+        for stats in self.get_stats():
+            if stats.name == name:
+                return stats
+        raise KeyError(name)
+
+    def to_dict(self) -> List[Dict[str, object]]:
+        return [stats._asdict() for stats in self.get_stats()]
+
+    def __str__(self):
+        s  = '{:<24s} {:>10s} {:>12s} {:>8s} {:>7s} {:>10s} {:>10s}\n'.format(
+            'Section', 'Offset', 'Size', 'Entropy', 'Zeros', 'Zero runs', 'Longest')
+        s += '---\n'
+        for stats in self.get_stats():
+            zeros = stats.histogram[0] / stats.size if stats.size else 0.0
+            s += '{:<24s} 0x{:08x} {:>12d} {:>8.3f} {:>6.1%} {:>10d} {:>10d}\n'.format(
+                stats.name, stats.offset, stats.size, stats.entropy, zeros,
+                stats.zero_runs, stats.longest_zero_run)
+        return s
+
+
+class EntropyWindow(NamedTuple):
+    offset: int
+    size: int
+    entropy: float
+    zeros: float            # fraction of zero bytes
+    text: float             # printable ASCII, tab, newline and carriage return
+    high: float             # bytes with the top bit set
+    components: Tuple[str, ...]     # names of the layout ranges the window touches
+
+
+class EntropyRegion(NamedTuple):
+    start: int
+    end: int
+    max_entropy: float
+    components: Tuple[str, ...]
+
+
+# printable ASCII plus tab, newline and carriage return
+TEXT_BYTES = [0x09, 0x0a, 0x0d] + list(range(0x20, 0x7f))
+
+
+class ElfEntropyMap:
+    # The entropy and byte classes of a window sliding over the whole
+    # file, each window annotated with the parts of the file layout
+    # (header, tables, sections, padding, trailing data) it touches, to
+    # find compressed or encrypted payloads hidden inside a section or
+    # after the end of the ELF data. The file is read once, in blocks of
+    # stride bytes counted in place in the mmap; the window's histogram is
+    # the sum of those of its last window / stride blocks, kept up to date
+    # by adding the new block and taking out the oldest one, so memory
+    # stays the same whatever the size of the file and a block is counted
+    # only once however much the windows overlap.
+
+    def __init__(self, elf: 'ELF', window: int = 1 << 16, stride: int = None):
+        stride = stride or window
+        if window <= 0 or stride <= 0 or window % stride:
+            raise ValueError('the window has to be a multiple of the stride')
+        self._elf = elf
+        self._window = window
+        self._stride = stride
+        self._bytes = 0         # read by the last pass
+        self._seconds = 0.0
+
+    def __iter__(self) -> Iterator['EntropyWindow']:
+        mm, size, stride = self._elf.mm, self._elf.size, self._stride
+        require_buffer(mm, 'the entropy map')
+        blocks = deque()
+        counts = [0] * 256
+        ranges = self._elf.get_layout().ranges
+        first = 0       # the first layout range that may touch the window
+        self._bytes = 0
+        self._seconds = 0.0
+        started = time.perf_counter()
+        for block in range(0, size, stride):
+            added = histogram(mm, block, min(block + stride, size))
+            blocks.append(added)
+            counts = [a + b for a, b in zip(counts, added)]
+            if len(blocks) > self._window // stride:
+                counts = [a - b for a, b in zip(counts, blocks.popleft())]
+            elif block + stride < size and len(blocks) < self._window // stride:
+                continue    # the first window is not full yet
+            self._bytes = min(block + stride, size)
+
+            start = max(0, block + stride - self._window)
+            end = min(block + stride, size)
+            while first < len(ranges) and ranges[first].end <= start:
+                first += 1
+            components = []
+            for r in ranges[first:]:
+                if r.start >= end:
+                    break
+                if r.end > start:
+                    components.append(r.name)
+
+            total = end - start
+            text = sum(counts[value] for value in TEXT_BYTES)
+            window = EntropyWindow(start, total, entropy(counts), counts[0] / total, text / total,
+                                   sum(counts[0x80:]) / total, tuple(components))
+            # the time spent by the consumer between windows is not ours
+            self._seconds += time.perf_counter() - started
+            yield window
+            started = time.perf_counter()
+
+    def find_regions(self, threshold: float = 7.2, min_size: int = 0) -> List['EntropyRegion']:
+        # the union of the windows of at least threshold bits per byte, in
+        # stretches, with what they overlap
+        regions = []
+        current = None      # [start, end, max entropy, names]
+        for window in self:
+            if window.entropy < threshold:
+                continue
+            end = window.offset + window.size
+            if current is not None and window.offset <= current[1]:
+                current[1] = max(current[1], end)
+                current[2] = max(current[2], window.entropy)
+                current[3] += [name for name in window.components if name not in current[3]]
+                continue
+            if current is not None:
+                regions.append(current)
+            current = [window.offset, end, window.entropy, list(window.components)]
+        if current is not None:
+            regions.append(current)
+        return [EntropyRegion(start, end, top, tuple(names)) for start, end, top, names in regions
+                if end - start >= min_size]
+
+    @property
+    def window(self) -> int:
+        return self._window
+
+    @property
+    def stride(self) -> int:
+        return self._stride
+
+    @property
+    def throughput(self) -> float:
+        # bytes per second of the last pass, so far
+        return self._bytes / self._seconds if self._seconds else 0.0
@@ -0,0 +1,256 @@
+from array import array
+from bisect import bisect_left, bisect_right
+from ElfEhFrame import ElfEhFrame
+from ElfValidation import require_buffer
+from itertools import accumulate, compress, count, groupby, repeat
+from operator import add, and_, eq, itemgetter, mul, sub
+import re
+import sys
+from typing import Dict, Iterator, List, NamedTuple, Optional, Tuple
+
+EM_386 = 3
+EM_X86_64 = 62
+EM_AARCH64 = 183
+
+STT_FUNC = 2
+STT_GNU_IFUNC = 10
+
+# x86 call rel32 capturing the displacement, and AArch64 BL capturing the
+# instruction word (little-endian, the top byte is 0b100101 then the two
+# high bits of imm26)
+CALL_REL32 = re.compile(b'\xe8(?=(....))', re.DOTALL)
+BL = re.compile(b'(?<=(...))([\x94-\x97])', re.DOTALL)
+# the top byte of a BL to the sign extension of its imm26
+BL_SIGN = bytes.maketrans(b'\x94\x95\x96\x97', b'\x00\x01\xfe\xff')
+
+PLT_SECTIONS = ('.plt', '.plt.sec', '.plt.got', '.iplt')
+SCAN_CHUNK = 1 << 22
+
+
+def scan_opcodes(mm: 'mmap.mmap', start: int, end: int, opcodes: bytes,
+                 regex: 're.Pattern') -> Iterator[Tuple['array', list]]:
+    # Chunk by chunk, the offsets of the bytes in opcodes and what regex
+    # captured around each of them, without a Python step per byte: the
+    # offsets come from the lengths of the pieces between the opcodes, and
+    # the captures from findall, in the same order. The regex must match at
+    # each opcode, which it may look past the chunk for; only at the end of
+    # the range can it miss, and those last opcodes are dropped.
+    marker = opcodes[:1]
+    table = bytes.maketrans(opcodes, marker * len(opcodes)) if len(opcodes) > 1 else None
+    pos = start
+    while pos < end:
+        stop = min(pos + SCAN_CHUNK, end)
+        chunk = mm[pos:stop]
+        if table is not None:
+            chunk = chunk.translate(table)
+        pieces = chunk.split(marker)
+        pieces.pop()
+        offsets = array('q', map(add, accumulate(map(len, pieces)), count(pos)))
+        found = regex.findall(mm, pos, min(stop + 16, end))[:len(offsets)]
+        del offsets[len(found):]
+        yield offsets, found
+        pos = stop
+
+
+class Function(NamedTuple):
+    start: int
+    end: int
+    name: str       # '' when only known from .eh_frame
+    section: str
+
+
+class CallEdge(NamedTuple):
+    caller: Optional[int]   # start of the calling function, None outside any
+    site: int               # address of the call instruction
+    target: int
+
+
+class ElfFunctions:
+    # Function boundaries and direct calls of the executable sections,
+    # without disassembling them. The functions are the FUNC symbols,
+    # completed with the ranges of the .eh_frame FDEs for stripped code;
+    # symbols without a size end where the next function starts.
+    #
+    # The calls are found by scanning for the opcode byte with a regex,
+    # which the regex engine does in C, and then decoding the displacements
+    # of a batch of candidates at once through arrays. A candidate byte may
+    # well be in the middle of another instruction, so only the candidates
+    # landing on a function start or a PLT entry are kept: a false one
+    # hitting one of those out of the 4 GiB of possible targets is rare.
+    #
+    # Relocatable objects have no addresses yet: their functions start at
+    # offsets within their section, and as the displacements are only
+    # filled in by the relocations, they get no calls.
+
+    def __init__(self, elf: 'ELF'):
+        self._elf = elf
+        self._machine = int.from_bytes(elf.header.e_machine, 'little')
+        self._relocatable = elf.header.get_type().startswith('REL')
+        self._code = [section for section in elf.sections
+                      if 'X' in section.flags and section.type != 'NOBITS' and section.size]
+        self._functions = None
+        self._starts = None
+        self._calls = None
+
+    def get_functions(self) -> List['Function']:
+        if self._functions is None:
+            self._functions = self._find_functions()
+            self._starts = [function.start for function in self._functions]
+        return self._functions
+
+    def _find_functions(self) -> List['Function']:
+        # Functions are keyed by (section index, start): in relocatable
+        # objects every section starts at 0 and the starts are offsets
+        # within the section, so the functions are ordered by section first
+        elf = self._elf
+        code = {section.index: section for section in self._code}
+        found = {}      # (section index, start) -> [end, name], end == start when unknown
+        for symtab in elf.get_symbol_tables():
+            info, shndx, values, sizes = symtab.info, symtab.shndx, symtab.values, symtab.sizes
+            for i in range(len(symtab)):
+                if info[i] & 0xf not in (STT_FUNC, STT_GNU_IFUNC) or shndx[i] not in code:
+                    continue
+                key = (shndx[i], values[i])
+                entry = found.get(key)
+                if entry is None:
+                    found[key] = [values[i] + sizes[i], symtab.get_name(i)]
+                elif entry[0] == values[i]:
+                    entry[0] = values[i] + sizes[i]
+
+        bounds = sorted((section.address, section.index) for section in self._code)
+        section_starts = [address for address, _ in bounds]
+        if not self._relocatable and '.eh_frame' in elf.sections:
+            # hand-written code may have several FDEs in one symbol, and
+            # only the first of them starts a function
+            sized = sorted((key, entry[0]) for key, entry in found.items() if entry[0] > key[1])
+            sized_keys = [key for key, _ in sized]
+            for start, end in self._get_fde_ranges():
+                j = bisect_right(section_starts, start) - 1
+                if j < 0 or start >= section_starts[j] + code[bounds[j][1]].size:
+                    continue
+                key = (bounds[j][1], start)
+                entry = found.get(key)
+                if entry is None:
+                    k = bisect_right(sized_keys, key) - 1
+                    if k >= 0 and sized_keys[k][0] == key[0] and start < sized[k][1]:
+                        continue
+                    found[key] = [end, '']
+                elif entry[0] == start:
+                    entry[0] = end
+
+        if self._relocatable:
+            keys = sorted(found)
+        else:
+            keys = sorted(found, key=lambda key: (key[1], key[0]))
+        functions = []
+        for i, (index, start) in enumerate(keys):
+            end, name = found[(index, start)]
+            section = code[index]
+            limit = section.address + section.size if not self._relocatable else section.size
+            if end == start:
+                following = keys[i + 1] if i + 1 < len(keys) else None
+                end = following[1] if following is not None and following[0] == index else limit
+                end = max(start, min(end, limit))
+            functions.append(Function(start, end, name, section.name))
+        return functions
+
+    def _get_fde_ranges(self) -> List[Tuple[int, int]]:
+        try:
+            return list(ElfEhFrame(self._elf).get_fde_ranges())
+        except (ValueError, IndexError) as e:
+            self._elf.issues.add('.eh_frame', str(e))
+            return []
+
+    def get_function(self, address: int) -> Optional['Function']:
+        # the function containing the address
+        functions = self.get_functions()
+        i = bisect_right(self._starts, address) - 1
+        if i >= 0 and address < functions[i].end:
+            return functions[i]
+        return None
+
+    def get_call_sites(self) -> Tuple['array', 'array']:
+        # (sites, targets) of the direct calls, sorted by site
+        if self._calls is None:
+            self._calls = self._scan_calls()
+        return self._calls
+
+    def _scan_calls(self) -> Tuple['array', 'array']:
+        sites, targets = array('Q'), array('Q')
+        if self._relocatable:
+            return sites, targets
+        if self._machine in (EM_386, EM_X86_64):
+            opcodes, regex, decode = b'\xe8', CALL_REL32, ElfFunctions._decode_x86
+        elif self._machine == EM_AARCH64:
+            opcodes, regex, decode = b'\x94\x95\x96\x97', BL, ElfFunctions._decode_aarch64
+        else:
+            return sites, targets
+
+        valid = set(function.start for function in self.get_functions())
+        for section in self._elf.sections:
+            if section.name in PLT_SECTIONS and section.type != 'NOBITS':
+                valid.update(range(section.address, section.address + section.size, section.entsize or 16))
+
+        require_buffer(self._elf.mm, 'the call scan')
+        for section in sorted(self._code, key=lambda s: s.address):
+            start = section.offset
+            end = min(section.offset + section.size, self._elf.size)
+            base = section.address - section.offset
+            for offsets, found in scan_opcodes(self._elf.mm, start, end, opcodes, regex):
+                offsets, found = decode(offsets, found, start, base)
+                keep = list(map(valid.__contains__, found))
+                sites.extend(map(add, compress(offsets, keep), repeat(base)))
+                targets.extend(compress(found, keep))
+        return sites, targets
+
+    @staticmethod
+    def _decode_x86(offsets: 'array', found: list, start: int, base: int) -> tuple:
+        # call rel32: the displacement is from the next instruction
+        rel = array('i')
+        rel.frombytes(b''.join(found))
+        if sys.byteorder != 'little':
+            rel.byteswap()
+        return offsets, list(map(add, map(add, offsets, rel), repeat(base + 5)))
+
+    @staticmethod
+    def _decode_aarch64(offsets: 'array', found: list, start: int, base: int) -> tuple:
+        # bl imm26: the opcode byte must be the top one of an instruction
+        # word, the displacement is in words from the instruction itself
+        aligned = list(map(eq, map(and_, map(sub, offsets, repeat(start)), repeat(3)), repeat(3)))
+        offsets = list(map(sub, compress(offsets, aligned), repeat(3)))
+        raw = bytearray(b''.join(map(b''.join, compress(found, aligned))))
+        raw[3::4] = raw[3::4].translate(BL_SIGN)
+        imm = array('i')
+        imm.frombytes(raw)
+        if sys.byteorder != 'little':
+            imm.byteswap()
+        return offsets, list(map(add, map(add, offsets, map(mul, imm, repeat(4))), repeat(base)))
+
+    def _get_callers(self, sites: 'array') -> List[Optional[int]]:
+        # the start of the function containing each site; as the sites are
+        # sorted, those of a function are the ones between the positions
+        # of its start and of its end among them
+        functions = self.get_functions()
+        firsts = map(bisect_left, repeat(sites), self._starts)
+        lasts = map(bisect_left, repeat(sites), [function.end for function in functions])
+        callers = [None] * len(sites)
+        for start, first, last in zip(self._starts, firsts, lasts):
+            if first < last:
+                callers[first:last] = [start] * (last - first)
+        return callers
+
+    def get_calls(self) -> List['CallEdge']:
+        sites, targets = self.get_call_sites()
+        return list(map(CallEdge, self._get_callers(sites), sites, targets))
+
+    def get_call_graph(self) -> Dict[Optional[int], List[int]]:
+        # caller start -> the distinct functions it calls; the calls of a
+        # caller are next to each other, except those outside of functions
+        sites, targets = self.get_call_sites()
+        graph = {}
+        for caller, calls in groupby(zip(self._get_callers(sites), targets), itemgetter(0)):
+            callees = set(map(itemgetter(1), calls))
+            if caller in graph:
+                callees.update(graph[caller])
+            graph[caller] = sorted(callees)
+        return graph
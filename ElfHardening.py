@@ -0,0 +1,273 @@
+from array import array
+from collections import Counter
+from ElfHdr import ElfHdr
+from ElfSegmentTable import ElfSegmentTable, ElfSegment
+from ElfValidation import ElfIssues
+from ElfVersions import DT_NEEDED, DT_NULL
+import batch
+import mmap
+import struct
+import sys
+from typing import Dict, Iterable, Iterator, List, NamedTuple, Optional
+
+DT_HASH = 4
+DT_STRTAB = 5
+DT_SYMTAB = 6
+DT_STRSZ = 10
+DT_SYMENT = 11
+DT_RPATH = 15
+DT_BIND_NOW = 24
+DT_RUNPATH = 29
+DT_FLAGS = 30
+DT_FLAGS_1 = 0x6ffffffb
+DT_GNU_HASH = 0x6ffffef5
+
+DF_BIND_NOW = 0x8
+DF_1_NOW = 0x1
+DF_1_PIE = 0x08000000
+
+PF_X = 1
+
+# as found in the dynamic string table, where a name may also be the tail
+# of a longer one, e.g. __sprintf_chk of __vsprintf_chk
+CANARY_NAMES = (b'__stack_chk_fail\x00', b'__stack_chk_guard\x00', b'__intel_security_cookie\x00')
+FORTIFIED_END = b'_chk\x00'
+
+
+class Hardening(NamedTuple):
+    pie: str                    # 'yes', 'no', 'DSO' for libraries, or the type of other files
+    nx: bool                    # a GNU_STACK segment without the execute flag
+    relro: str                  # 'full' (with immediate binding), 'partial' or 'no'
+    canary: Optional[bool]      # __stack_chk_fail imported; None when nothing is imported, e.g. static
+    fortified: Optional[int]    # distinct __*_chk functions imported
+    rpath: Optional[str]
+    runpath: Optional[str]
+
+
+def count_symbols(mm: 'mmap.mmap', dynamic: Dict[int, int], to_offset, elf64: bool) -> Optional[int]:
+    # the number of dynamic symbols, which the dynamic section does not
+    # give: nchain of the SysV hash table, or the last symbol of the GNU
+    # hash table's chains, or failing both the symbols up to the string
+    # table, which the linkers put right after them. The GNU hash table
+    # only holds the defined symbols, after the undefined ones, so it
+    # says nothing of how many of those there are when it is empty. Read
+    # with slices, so that mm may also be a view or a stream buffer.
+    size = len(mm)
+    offset = to_offset(dynamic.get(DT_HASH))
+    if offset is not None and offset + 8 <= size:
+        return struct.unpack('<I', mm[offset + 4:offset + 8])[0]
+    symoffset = None
+    offset = to_offset(dynamic.get(DT_GNU_HASH))
+    if offset is not None and offset + 16 <= size:
+        nbuckets, symoffset, bloom_size, _ = struct.unpack('<IIII', mm[offset:offset + 16])
+        buckets = offset + 16 + bloom_size * (8 if elf64 else 4)
+        if buckets + 4 * nbuckets > size:
+            return None
+        last = max(struct.unpack('<{}I'.format(nbuckets), mm[buckets:buckets + 4 * nbuckets]), default=0)
+        if last >= symoffset:
+            # the chain of the last bucket ends with the last symbol
+            chain = buckets + 4 * nbuckets + 4 * (last - symoffset)
+            while chain + 4 <= size:
+                if mm[chain] & 1:
+                    return last + 1
+                last += 1
+                chain += 4
+            return None
+    symtab, strtab = dynamic.get(DT_SYMTAB), dynamic.get(DT_STRTAB)
+    if symtab is not None and strtab is not None and strtab > symtab:
+        return (strtab - symtab) // (dynamic.get(DT_SYMENT) or (24 if elf64 else 16))
+    return symoffset
+
+
+def find_all(mm: 'mmap.mmap', needle: bytes, start: int, end: int) -> Iterator[int]:
+    offset = mm.find(needle, start, end)
+    while offset >= 0:
+        yield offset
+        offset = mm.find(needle, offset + 1, end)
+
+
+def get_names(mm: 'mmap.mmap', start: int, end: int, entsize: int) -> 'array':
+    # the st_name column of the symbols in [start, end), the first word of
+    # every entry; the few lookups in it are faster than building a set
+    if entsize % 4 == 0:
+        column = array('I', mm[start:end])
+        if sys.byteorder != 'little':
+            column.byteswap()
+        return column[::entsize // 4]
+    return array('I', (int.from_bytes(mm[i:i + 4], 'little') for i in range(start, end, entsize)))
+
+
+def get_hardening(header: 'ElfHdr', segments: List[tuple], mm: 'mmap.mmap') -> 'Hardening':
+    # out of the ELF header, the program headers, as decoded by
+    # ElfSegmentTable.get_entries(), and the dynamic segment with the
+    # symbol and string tables it points to, read in place in mm
+    types = {}
+    loads = []
+    for row in segments:
+        ptype = ElfSegment.parse_type(row[0])
+        types.setdefault(ptype, row)
+        if ptype == 'LOAD':
+            loads.append(row)
+
+    def to_offset(address: Optional[int]) -> Optional[int]:
+        # of an address in the file, through the LOAD segments
+        if address is not None:
+            for row in loads:
+                if row[3] <= address < row[3] + row[5]:
+                    return row[2] + address - row[3]
+        return None
+
+    size = len(mm)
+    elf64 = header.get_class() == 'ELF64'
+    dynamic = {}        # tag -> first value
+    dynamic_row = types.get('DYNAMIC')
+    if dynamic_row is not None and dynamic_row[2] < size:
+        fmt = struct.Struct('<qQ' if elf64 else '<iI')
+        end = min(dynamic_row[2] + dynamic_row[5], size)
+        end -= (end - dynamic_row[2]) % fmt.size
+        for tag, value in fmt.iter_unpack(mm[dynamic_row[2]:end]):
+            if tag == DT_NULL:
+                break
+            dynamic.setdefault(tag, value)
+
+    strtab = None
+    start = to_offset(dynamic.get(DT_STRTAB))
+    if start is not None and start < size:
+        strtab = start, min(start + dynamic.get(DT_STRSZ, 0), size)
+
+    def read(tag: int) -> Optional[str]:
+        offset = dynamic.get(tag)
+        if offset is None or strtab is None or strtab[0] + offset >= strtab[1]:
+            return None
+        end = mm.find(b'\x00', strtab[0] + offset, strtab[1])
+        return mm[strtab[0] + offset:end if end >= 0 else strtab[1]].decode('utf-8', 'replace')
+
+    flags_1 = dynamic.get(DT_FLAGS_1, 0)
+    etype = header.get_type().split()[0]
+    if etype == 'EXEC':
+        pie = 'no'
+    elif etype == 'DYN':
+        pie = 'yes' if flags_1 & DF_1_PIE or 'INTERP' in types else 'DSO'
+    else:
+        pie = etype
+
+    stack = types.get('GNU_STACK')
+    nx = stack is not None and not stack[1] & PF_X
+
+    if 'GNU_RELRO' not in types:
+        relro = 'no'
+    elif DT_BIND_NOW in dynamic or dynamic.get(DT_FLAGS, 0) & DF_BIND_NOW or flags_1 & DF_1_NOW:
+        relro = 'full'
+    else:
+        relro = 'partial'
+
+    # the names of the dynamic symbols, as offsets in the string table;
+    # without libraries to import from, the stack protector and fortified
+    # functions are linked in and do not show
+    canary = fortified = None
+    symtab = to_offset(dynamic.get(DT_SYMTAB))
+    count = None
+    if symtab is not None and DT_NEEDED in dynamic:
+        count = count_symbols(mm, dynamic, to_offset, elf64)
+    if strtab is not None and count is not None:
+        # the candidates first, with plain searches through the string
+        # table, then the symbol names, only when there is one to check
+        canaries = [offset for name in CANARY_NAMES for offset in find_all(mm, name, *strtab)]
+        fortified = {}      # start of a possible name -> its end
+        for end in find_all(mm, FORTIFIED_END, *strtab):
+            # the names ending there start between the previous NUL and it
+            first = mm.rfind(b'\x00', strtab[0], end) + 1 or strtab[0]
+            for offset in find_all(mm, b'__', first, end):
+                fortified[offset] = end + len(FORTIFIED_END) - 1
+        names = ()
+        if canaries or fortified:
+            entsize = dynamic.get(DT_SYMENT) or (24 if elf64 else 16)
+            end = min(symtab + count * entsize, size)
+            end -= (end - symtab) % entsize
+            names = get_names(mm, symtab, end, entsize)
+        canary = any(offset - strtab[0] in names for offset in canaries)
+        fortified = len({mm[offset:end] for offset, end in fortified.items() if offset - strtab[0] in names})
+
+    return Hardening(pie, nx, relro, canary, fortified, read(DT_RPATH), read(DT_RUNPATH))
+
+
+def check_elf(elf: 'ELF') -> 'Hardening':
+    table = elf.segment_table
+    return get_hardening(elf.header, list(table.get_entries()) if table.content is not None else [], elf.mm)
+
+
+def check_file(filename: str) -> 'Hardening':
+    # only the header, the program headers and the dynamic data are read:
+    # no ELF object, which would copy the section header table and build
+    # the segments, and no section content
+    with open(filename, 'rb') as f:
+        mm = mmap.mmap(f.fileno(), 0, flags=mmap.MAP_PRIVATE, prot=mmap.PROT_READ)
+    try:
+        header = ElfHdr()
+        header.parse(mm)
+        table = ElfSegmentTable(header)
+        segments = []
+        minentsize = 32 if header.get_class() == 'ELF32' else 56
+        if table and ElfIssues().check_table('segment table', table.offset, table.num, table.entsize,
+                                             minentsize, len(mm)):
+            table.parse(mm)
+            segments = list(table.get_entries())
+        return get_hardening(header, segments, mm)
+    finally:
+        mm.close()
+
+
+def check_files(paths: Iterable[str], jobs: int = None):
+    # every ELF file given or below the given directories, spread over a
+    # pool of worker processes, yields (filename, hardening, error)
+    return batch.run(check_file, batch.find_elf_files(paths), (), jobs)
+
+
+class HardeningSummary:
+    # The reports of many files added up: how many files have each value
+    # of each property, with yes/no for the canary, the fortified
+    # functions and the search paths.
+
+    PROPERTIES = ('pie', 'nx', 'relro', 'canary', 'fortify', 'rpath', 'runpath')
+
+    def __init__(self):
+        self._files = 0
+        self._errors = 0
+        self._counts = {name: Counter() for name in HardeningSummary.PROPERTIES}
+
+    def add(self, hardening: 'Hardening'):
+        self._files += 1
+        values = {
+            'pie': hardening.pie,
+            'nx': 'yes' if hardening.nx else 'no',
+            'relro': hardening.relro,
+            'canary': 'unknown' if hardening.canary is None else 'yes' if hardening.canary else 'no',
+            'fortify': 'unknown' if hardening.fortified is None else 'yes' if hardening.fortified else 'no',
+            'rpath': 'yes' if hardening.rpath is not None else 'no',
+            'runpath': 'yes' if hardening.runpath is not None else 'no',
+        }
+        for name, value in values.items():
+            self._counts[name][value] += 1
+
+    def add_error(self):
+        self._errors += 1
+
+    def get_counts(self) -> Dict[str, Dict[str, int]]:
+        return {name: dict(counts.most_common()) for name, counts in self._counts.items()}
+
+    def __str__(self):
+        s  = 'Hardening of {} files ({} errors)\n'.format(self._files, self._errors)
+        s += '---\n'
+        for name, counts in self._counts.items():
+            s += '{:<8s} '.format(name) + '  '.join(
+                '{} {} ({:.1%})'.format(value, count, count / self._files)
+                for value, count in counts.most_common()) + '\n'
+        return s
+
+    @property
+    def files(self) -> int:
+        return self._files
+
+    @property
+    def errors(self) -> int:
+        return self._errors
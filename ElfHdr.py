@@ -1,9 +1,13 @@
+from ElfValidation import ElfFormatError
 import mmap
 import util
 
 class ElfHdr:
     ELFMAGIC = bytes([0x7f, ord('E'), ord('L'), ord('F')])
 
+    SHN_XINDEX = 0xffff     # e_shstrndx escape
+    PN_XNUM = 0xffff        # e_phnum escape
+
     def __init__(self):
         self.e_ident = None         # magic number and other info
         self.e_type = None          # object file type
@@ -20,12 +24,19 @@ class ElfHdr:
         self.e_shnum = None         # section header table entry count
         self.e_shstrndx = None      # section header string table index
 
+        # counts with extended numbering resolved, see parse_extended()
+        self._phnum = None
+        self._shnum = None
+        self._shstrndx = None
+
     def parse(self, mm: 'mmap.mmap'):
         mm.seek(0)
 
         self.e_ident = mm.read(16)
-        if self.get_magic_number() != ElfHdr.ELFMAGIC:
-            raise ValueError('not an ELF file')
+        if len(self.e_ident) < 16 or self.get_magic_number() != ElfHdr.ELFMAGIC:
+            raise ElfFormatError('not an ELF file')
+        if len(mm) < (52 if self.get_class() == 'ELF32' else 64):
+            raise ElfFormatError('truncated ELF header')
 
         self.e_type = mm.read(2)
         self.e_machine = mm.read(2)
@@ -40,7 +51,7 @@ class ElfHdr:
             self.e_phoff = mm.read(8)
             self.e_shoff = mm.read(8)
         else:
-            raise ValueError('invalid class')
+            raise ElfFormatError('invalid class')
 
         self.e_flags = mm.read(4)
         self.e_ehsize = mm.read(2)
@@ -49,6 +60,39 @@ class ElfHdr:
         self.e_shentsize = mm.read(2)
         self.e_shnum = mm.read(2)
         self.e_shstrndx = mm.read(2)
+        self.parse_extended(mm)
+
+    def parse_extended(self, mm: 'mmap.mmap'):
+        # Objects with too many sections (or segments) for the 16-bit
+        # header fields keep the real values in the first section header:
+        # e_shnum 0 means sh_size, e_shstrndx SHN_XINDEX means sh_link and
+        # e_phnum PN_XNUM means sh_info.
+        self._phnum = int.from_bytes(self.e_phnum, 'little')
+        self._shnum = int.from_bytes(self.e_shnum, 'little')
+        self._shstrndx = int.from_bytes(self.e_shstrndx, 'little')
+
+        shoff = self.get_shoff()
+        escaped = self._shnum == 0 or self._shstrndx == ElfHdr.SHN_XINDEX or self._phnum == ElfHdr.PN_XNUM
+        if not shoff or not escaped:
+            return
+        if self.get_class() == 'ELF32':
+            size_at, word, entsize = 20, 4, 40
+        else:
+            size_at, word, entsize = 32, 8, 64
+        if self.get_shentsize() < entsize or shoff + entsize > len(mm):
+            # left to the validation of the section table
+            return
+
+        mm.seek(shoff + size_at)
+        sh_size = int.from_bytes(mm.read(word), 'little')
+        sh_link = int.from_bytes(mm.read(4), 'little')
+        sh_info = int.from_bytes(mm.read(4), 'little')
+        if self._shnum == 0:
+            self._shnum = sh_size
+        if self._shstrndx == ElfHdr.SHN_XINDEX:
+            self._shstrndx = sh_link
+        if self._phnum == ElfHdr.PN_XNUM:
+            self._phnum = sh_info
 
     def get_magic_number(self) -> bytes:
         return self.e_ident[:4]
@@ -524,7 +568,7 @@ class ElfHdr:
         return int.from_bytes(self.e_phoff, 'little')
 
     def get_phnum(self) -> int:
-        return int.from_bytes(self.e_phnum, 'little')
+        return self._phnum
 
     def get_phentsize(self) -> int:
         return int.from_bytes(self.e_phentsize, 'little')
@@ -533,13 +577,13 @@ class ElfHdr:
         return int.from_bytes(self.e_shoff, 'little')
 
     def get_shnum(self) -> int:
-        return int.from_bytes(self.e_shnum, 'little')
+        return self._shnum
 
     def get_shentsize(self) -> int:
         return int.from_bytes(self.e_shentsize, 'little')
 
     def get_shstrndx(self) -> int:
-        return int.from_bytes(self.e_shstrndx, 'little')
+        return self._shstrndx
 
     def __str__(self):
         s  = 'ELF Header\n'
@@ -567,4 +611,8 @@ class ElfHdr:
 
     @property
     def offset(self):
-        return 0
\ No newline at end of file
+        return 0
+
+    @property
+    def size(self):
+        return self.get_size()
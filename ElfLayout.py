@@ -0,0 +1,143 @@
+from typing import Dict, List
+
+
+class LayoutRange:
+
+    def __init__(self, kind: str, start: int, end: int, name: str = '', component=None):
+        self._kind = kind            # header, segment table, section table, section,
+        self._start = start          # padding, gap, overlap or trailing
+        self._end = end
+        self._name = name
+        self._component = component  # the ELF component behind the range, if any
+
+    def __repr__(self):
+        return '<{} {} 0x{:x}-0x{:x}>'.format(self.kind, self.name, self.start, self.end)
+
+    @property
+    def kind(self) -> str:
+        return self._kind
+
+    @property
+    def start(self) -> int:
+        return self._start
+
+    @property
+    def end(self) -> int:
+        return self._end
+
+    @property
+    def size(self) -> int:
+        return self._end - self._start
+
+    @property
+    def name(self) -> str:
+        return self._name
+
+    @property
+    def component(self):
+        return self._component
+
+
+class ElfLayout:
+    # Byte range coverage of the file, computed from the header, the
+    # segment and section tables and the section headers only. The
+    # section contents are never read.
+
+    def __init__(self, elf: 'ELF'):
+        self._filesize = elf.size
+        self._ranges = []
+        self._build(elf)
+
+    def _build(self, elf: 'ELF'):
+        components = []
+        components.append(LayoutRange('header', 0, elf.header.size, 'ELF header', elf.header))
+        for table, kind in ((elf.segment_table, 'segment table'), (elf.section_table, 'section table')):
+            if table:
+                components.append(LayoutRange(kind, table.offset, table.offset + table.size, kind, table))
+        for section in elf.sections:
+            # NOBITS sections take up no space in the file
+            if section.type != 'NOBITS' and section.size:
+                end = section.offset + section.size
+                components.append(LayoutRange('section', section.offset, end, section.name, section))
+        components.sort(key=lambda r: (r.start, -r.end))
+
+        # loadable segments start on page boundaries, and so leave padding
+        # in front of the first section they hold
+        self._load_offsets = {seg.get_offset() for seg in elf.segments if seg.get_type() == 'LOAD'}
+        self._table_align = 4 if elf.header.get_class() == 'ELF32' else 8
+
+        ranges = []
+        covered = 0  # end of the bytes covered so far
+        last = None  # component reaching furthest so far
+        for comp in components:
+            if comp.start > covered:
+                ranges.append(self._classify_gap(covered, comp))
+            elif comp.start < covered:
+                end = min(covered, comp.end)
+                ranges.append(LayoutRange('overlap', comp.start, end, last.name + ' / ' + comp.name))
+            ranges.append(comp)
+            if comp.end > covered:
+                covered = comp.end
+                last = comp
+
+        if covered < self._filesize:
+            ranges.append(LayoutRange('trailing', covered, self._filesize, 'trailing data'))
+        self._ranges = ranges
+
+    def _classify_gap(self, start: int, following: 'LayoutRange') -> 'LayoutRange':
+        # a gap is padding if the following component was merely aligned up
+        if following.start in self._load_offsets:
+            return LayoutRange('padding', start, following.start, 'segment alignment')
+        if following.kind == 'section':
+            align = following.component.addralign
+        else:
+            align = self._table_align
+        if align > 1 and following.start == -(-start // align) * align:
+            return LayoutRange('padding', start, following.start, 'alignment of ' + following.name)
+        return LayoutRange('gap', start, following.start, 'unaccounted')
+
+    def __iter__(self):
+        return iter(self._ranges)
+
+    def __len__(self):
+        return len(self._ranges)
+
+    def __str__(self):
+        s  = 'File layout\n'
+        s += '---\n'
+        for r in self._ranges:
+            s += '0x{:08x}-0x{:08x} {:>10d} {:<14s} {}\n'.format(r.start, r.end, r.size, r.kind, r.name)
+        s += '---\n'
+        for kind, size in self.get_stats().items():
+            s += '{:<16s} {} (bytes)\n'.format(kind + ':', size)
+        return s
+
+    @property
+    def ranges(self) -> List['LayoutRange']:
+        return self._ranges
+
+    @property
+    def filesize(self) -> int:
+        return self._filesize
+
+    def get_gaps(self) -> List['LayoutRange']:
+        return [r for r in self._ranges if r.kind in ('padding', 'gap', 'trailing')]
+
+    def get_overlaps(self) -> List['LayoutRange']:
+        return [r for r in self._ranges if r.kind == 'overlap']
+
+    def get_stats(self) -> Dict[str, int]:
+        stats = {
+            'file size': self._filesize,
+            'header': 0,
+            'segment table': 0,
+            'section table': 0,
+            'section': 0,
+            'padding': 0,
+            'gap': 0,
+            'overlap': 0,
+            'trailing': 0,
+        }
+        for r in self._ranges:
+            stats[r.kind] += r.size
+        return stats
@@ -0,0 +1,88 @@
+from typing import Iterator
+
+
+class ElfNote:
+
+    def __init__(self, name: str, ntype: int, desc: bytes, offset: int):
+        self._name = name
+        self._type = ntype
+        self._desc = desc
+        self._offset = offset
+
+    def __repr__(self):
+        return '<NOTE {} {} ({} bytes)>'.format(self.name, self.get_type(), len(self.desc))
+
+    def get_type(self) -> str:
+        NT_PRSTATUS = 1
+        NT_FPREGSET = 2
+        NT_PRPSINFO = 3
+        NT_TASKSTRUCT = 4
+        NT_AUXV = 6
+        NT_SIGINFO = 0x53494749
+        NT_FILE = 0x46494c45
+        NT_PRXFPREG = 0x46e62b7f
+        NT_X86_XSTATE = 0x202
+
+        NT_GNU_ABI_TAG = 1
+        NT_GNU_HWCAP = 2
+        NT_GNU_BUILD_ID = 3
+        NT_GNU_GOLD_VERSION = 4
+        NT_GNU_PROPERTY_TYPE_0 = 5
+
+        if self._name == 'GNU':
+            return {
+                NT_GNU_ABI_TAG: 'GNU_ABI_TAG',
+                NT_GNU_HWCAP: 'GNU_HWCAP',
+                NT_GNU_BUILD_ID: 'GNU_BUILD_ID',
+                NT_GNU_GOLD_VERSION: 'GNU_GOLD_VERSION',
+                NT_GNU_PROPERTY_TYPE_0: 'GNU_PROPERTY_TYPE_0',
+            }.get(self._type, 'Other')
+
+        return {
+            NT_PRSTATUS: 'PRSTATUS',
+            NT_FPREGSET: 'FPREGSET',
+            NT_PRPSINFO: 'PRPSINFO',
+            NT_TASKSTRUCT: 'TASKSTRUCT',
+            NT_AUXV: 'AUXV',
+            NT_SIGINFO: 'SIGINFO',
+            NT_FILE: 'FILE',
+            NT_PRXFPREG: 'PRXFPREG',
+            NT_X86_XSTATE: 'X86_XSTATE',
+        }.get(self._type, 'Other')
+
+    @property
+    def name(self) -> str:
+        return self._name
+
+    @property
+    def type(self) -> int:
+        return self._type
+
+    @property
+    def desc(self) -> bytes:
+        return self._desc
+
+    @property
+    def offset(self) -> int:
+        return self._offset
+
+
+def parse_notes(content: bytes, offset: int = 0, align: int = 4) -> Iterator['ElfNote']:
+    # The entries of a NOTE segment or section: namesz, descsz and type
+    # words followed by the name and the descriptor, each padded to the
+    # alignment (4, or 8 for some notes of 64-bit objects).
+    align = 8 if align == 8 else 4
+    pos = 0
+    while pos + 12 <= len(content):
+        namesz = int.from_bytes(content[pos:pos+4], 'little')
+        descsz = int.from_bytes(content[pos+4:pos+8], 'little')
+        ntype = int.from_bytes(content[pos+8:pos+12], 'little')
+        name_start = pos + 12
+        desc_start = -(-(name_start + namesz) // align) * align
+        desc_end = desc_start + descsz
+        if desc_end > len(content):
+            raise ValueError('note at 0x{:x} runs past the end of its segment'.format(offset + pos))
+
+        name = content[name_start:name_start+namesz].rstrip(b'\x00').decode('ascii', 'replace')
+        yield ElfNote(name, ntype, content[desc_start:desc_end], offset + pos)
+        pos = -(-desc_end // align) * align
@@ -0,0 +1,185 @@
+from collections import OrderedDict
+from ELF import ELF
+import mmap
+import os
+from typing import Dict
+
+
+class PoolEntry:
+    # one open file of the pool: its mapping and the ELF object over it
+
+    def __init__(self, key: str, mm: 'mmap.mmap', elf: 'ELF'):
+        self.key = key
+        self.mm = mm
+        self.elf = elf
+        self.pins = 0       # leases not yet released
+
+    @property
+    def size(self) -> int:
+        return len(self.mm)
+
+
+class ElfLease:
+    # what ElfPool.open returns: the ELF object of the file for the
+    # duration of a with block, during which the pool keeps it mapped
+
+    def __init__(self, pool: 'ElfPool', filename: str):
+        self._pool = pool
+        self._filename = filename
+        self._elf = None
+
+    def __enter__(self) -> 'ELF':
+        self._elf = self._pool.acquire(self._filename)
+        return self._elf
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self._pool.release(self._filename)
+
+
+class ElfPool:
+    # ELF objects of many files kept open across uses, for the tools that
+    # keep going back to the same libraries. At most max_files files are
+    # mapped at a time, and at most max_bytes bytes when given; beyond
+    # that the least recently used file is unmapped, and parsed again when
+    # asked for once more. Each mapping holds one file descriptor (mmap
+    # keeps its own duplicate, the file itself is closed right away), so
+    # max_files is also the descriptor budget. Files are known by their
+    # real path, so symlinks to a library share its entry.
+    #
+    # An ELF object from acquire() stays valid until the matching
+    # release(); open() pairs the two in a with block. Files in use are
+    # never evicted, even if that means going over budget for a while.
+
+    def __init__(self, max_files: int = 64, max_bytes: int = None, strict: bool = False,
+                 stats: 'ElfStats' = None):
+        if max_files < 1:
+            raise ValueError('the pool needs room for at least one file')
+        self._max_files = max_files
+        self._max_bytes = max_bytes
+        self._strict = strict
+        self._stats = stats
+
+        self._entries = OrderedDict()   # real path -> PoolEntry, least recently used first
+        self._keys = {}                 # file name as given -> real path
+        self._seen = set()              # real paths opened at least once
+        self._mapped = 0                # bytes mapped by the entries
+
+        self._hits = 0
+        self._misses = 0
+        self._reopens = 0               # misses of files that had been evicted
+        self._evictions = 0
+
+    def _key(self, filename: str) -> str:
+        key = self._keys.get(filename)
+        if key is None:
+            key = self._keys[filename] = os.path.realpath(filename)
+        return key
+
+    def _open(self, key: str) -> 'PoolEntry':
+        with open(key, 'rb') as f:
+            mm = mmap.mmap(f.fileno(), 0, flags=mmap.MAP_PRIVATE, prot=mmap.PROT_READ)
+        try:
+            elf = ELF(key, mm, self._strict, self._stats)
+        except Exception:
+            mm.close()
+            raise
+        return PoolEntry(key, mm, elf)
+
+    def acquire(self, filename: str) -> 'ELF':
+        key = self._key(filename)
+        entry = self._entries.get(key)
+        if entry is not None:
+            self._hits += 1
+            self._entries.move_to_end(key)
+        else:
+            self._misses += 1
+            if key in self._seen:
+                self._reopens += 1
+            entry = self._open(key)
+            self._seen.add(key)
+            self._entries[key] = entry
+            self._mapped += entry.size
+        entry.pins += 1
+        self._evict()
+        return entry.elf
+
+    def release(self, filename: str):
+        entry = self._entries.get(self._key(filename))
+        if entry is None or not entry.pins:
+            raise ValueError('{} is not in use'.format(filename))
+        entry.pins -= 1
+        if not entry.pins:
+            self._evict()
+
+    def open(self, filename: str) -> 'ElfLease':
+        return ElfLease(self, filename)
+
+    def _over_budget(self) -> bool:
+        return len(self._entries) > self._max_files or (
+            self._max_bytes is not None and self._mapped > self._max_bytes)
+
+    def _evict(self):
+        while self._over_budget():
+            key = next((key for key, entry in self._entries.items() if not entry.pins), None)
+            if key is None:
+                break
+            self._close(key)
+            self._evictions += 1
+
+    def _close(self, key: str):
+        entry = self._entries.pop(key)
+        self._mapped -= entry.size
+        entry.mm.close()
+
+    def close(self):
+        for key in list(self._entries):
+            self._close(key)
+
+    def __contains__(self, filename: str) -> bool:
+        return self._key(filename) in self._entries
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def get_metrics(self) -> Dict[str, int]:
+        return {
+            'hits': self._hits,
+            'misses': self._misses,
+            'reopens': self._reopens,
+            'evictions': self._evictions,
+            'open files': len(self._entries),
+            'mapped bytes': self._mapped,
+        }
+
+    def __str__(self):
+        s  = 'ELF pool\n'
+        s += '---\n'
+        for name, value in self.get_metrics().items():
+            s += '{:<16s} {}\n'.format(name + ':', value)
+        return s
+
+    @property
+    def hits(self) -> int:
+        return self._hits
+
+    @property
+    def misses(self) -> int:
+        return self._misses
+
+    @property
+    def reopens(self) -> int:
+        return self._reopens
+
+    @property
+    def evictions(self) -> int:
+        return self._evictions
+
+    @property
+    def mapped(self) -> int:
+        return self._mapped
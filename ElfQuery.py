@@ -0,0 +1,362 @@
+from ELF import ELF
+from ElfHdr import ElfHdr
+from ElfSectionTable import ElfSection
+from ElfSegmentTable import ElfSegment
+import batch
+from fnmatch import fnmatchcase
+from functools import lru_cache
+import mmap
+import re
+from typing import Callable, Iterable, List, NamedTuple, Optional
+
+
+class QueryMatch(NamedTuple):
+    kind: str       # 'header', 'section' or 'segment'
+    index: int      # in its table, 0 for the header
+    name: str       # of the section, the type of the segment or of the file
+    offset: int
+    size: int       # sh_size, p_filesz or the size of the file
+
+
+# field -> (Python expression over the header h, or over the table row r
+# and its index i, type of the value). The values of the header fields are
+# worked out once per file, into the dict H the tests read them from.
+HEADER_FIELDS = {
+    'class': ('h.get_class()', str),
+    'type': ('h.get_type().split()[0]', str),
+    'machine': ('h.get_machine()', str),
+    'abi': ('h.get_ABI()', str),
+    'entry': ('h.get_entry_point()', int),
+    'flags': ('h.get_flags()', int),
+    'phnum': ('h.get_phnum()', int),
+    'shnum': ('h.get_shnum()', int),
+}
+# over the rows of ElfSectionTable.get_entries()
+SECTION_FIELDS = {
+    'index': ('i', int),
+    'name': ('NAME(r[0])', str),
+    'type': ('SHT(r[1])', str),
+    'flags': ('SHF(r[2])', str),
+    'address': ('r[3]', int),
+    'offset': ('r[4]', int),
+    'size': ('r[5]', int),
+    'link': ('r[6]', int),
+    'info': ('r[7]', int),
+    'addralign': ('r[8]', int),
+    'entsize': ('r[9]', int),
+}
+# over the rows of ElfSegmentTable.get_entries()
+SEGMENT_FIELDS = {
+    'index': ('i', int),
+    'type': ('PT(r[0])', str),
+    'flags': ('PF(r[1])', str),
+    'offset': ('r[2]', int),
+    'vaddr': ('r[3]', int),
+    'paddr': ('r[4]', int),
+    'filesz': ('r[5]', int),
+    'memsz': ('r[6]', int),
+    'align': ('r[7]', int),
+}
+FIELDS = {'header': HEADER_FIELDS, 'section': SECTION_FIELDS, 'segment': SEGMENT_FIELDS}
+
+UNITS = {'k': 1 << 10, 'm': 1 << 20, 'g': 1 << 30}
+KEYWORDS = ('and', 'or', 'not', 'has', 'like')
+
+TOKEN = re.compile(r'''\s*(?:
+    (?P<number>0[xX][0-9a-fA-F]+|[0-9]+)(?:(?P<unit>[kKmMgG])i?[bB]?)?(?![\w.])
+  | (?P<string>"[^"]*"|'[^']*')
+  | (?P<op>==|!=|<=|>=|<|>|\(|\))
+  | (?P<word>[A-Za-z_.][\w.\-]*)
+)''', re.VERBOSE)
+
+
+@lru_cache(maxsize=256)
+def _segment_flags(flags: int) -> str:
+    # 'RE' rather than the 'R E' of the listings
+    return ElfSegment.parse_flags(flags).replace(' ', '')
+
+
+def _has(value: str, letters: str) -> bool:
+    return all(letter in value for letter in letters)
+
+
+# what the compiled filters see besides their arguments
+NAMESPACE = {
+    'SHT': ElfSection.parse_type,
+    'SHF': ElfSection.parse_flags,
+    'PT': ElfSegment.parse_type,
+    'PF': _segment_flags,
+    'HAS': _has,
+    'LIKE': fnmatchcase,
+}
+
+
+def tokenize(expression: str) -> List[tuple]:
+    # (kind, value): ('number', int), ('string', str), ('op', str),
+    # ('keyword', str), ('field', (scope, name)) or ('word', str), the
+    # last for the bare words standing for strings, like LOAD or .text
+    tokens = []
+    pos = 0
+    expression = expression.rstrip()
+    while pos < len(expression):
+        match = TOKEN.match(expression, pos)
+        if match is None:
+            raise ValueError('unexpected {!r} in filter at {}'.format(expression[pos:pos + 10].strip(), pos))
+        pos = match.end()
+        if match.group('number'):
+            value = int(match.group('number'), 0)
+            if match.group('unit'):
+                value *= UNITS[match.group('unit').lower()]
+            tokens.append(('number', value))
+        elif match.group('string'):
+            tokens.append(('string', match.group('string')[1:-1]))
+        elif match.group('op'):
+            tokens.append(('op', match.group('op')))
+        else:
+            word = match.group('word')
+            scope, _, name = word.partition('.')
+            if word.lower() in KEYWORDS:
+                tokens.append(('keyword', word.lower()))
+            elif scope in FIELDS and name:
+                if name not in FIELDS[scope]:
+                    raise ValueError('unknown field {} (the {} fields are {})'.format(
+                        word, scope, ', '.join(FIELDS[scope])))
+                tokens.append(('field', (scope, name)))
+            else:
+                tokens.append(('word', word))
+    return tokens
+
+
+class FilterParser:
+    # Recursive descent over the tokens, into a tree of ('and', [nodes]),
+    # ('or', [nodes]), ('not', node) and ('test', source, scopes), where
+    # source is the Python expression of one comparison and scopes the
+    # set of 'header', 'section' and 'segment' fields it reads.
+    #
+    #   filter     := or
+    #   or         := and ('or' and)*
+    #   and        := not ('and' not)*
+    #   not        := 'not' not | '(' or ')' | comparison
+    #   comparison := operand ('==' | '!=' | '<' | '<=' | '>' | '>=' | 'has' | 'like') operand
+    #   operand    := field | number | string | word
+
+    def __init__(self, expression: str):
+        self._tokens = tokenize(expression)
+        self._pos = 0
+        self.header_fields = []     # named by the expression, in order
+
+    def parse(self) -> tuple:
+        if not self._tokens:
+            raise ValueError('empty filter')
+        node = self._or()
+        if self._pos < len(self._tokens):
+            raise ValueError('unexpected {!r} in filter'.format(self._tokens[self._pos][1]))
+        return node
+
+    def _peek(self) -> Optional[tuple]:
+        return self._tokens[self._pos] if self._pos < len(self._tokens) else None
+
+    def _next(self) -> tuple:
+        token = self._peek()
+        if token is None:
+            raise ValueError('filter ends too early')
+        self._pos += 1
+        return token
+
+    def _or(self) -> tuple:
+        nodes = [self._and()]
+        while self._peek() == ('keyword', 'or'):
+            self._pos += 1
+            nodes.append(self._and())
+        return nodes[0] if len(nodes) == 1 else ('or', nodes)
+
+    def _and(self) -> tuple:
+        nodes = [self._not()]
+        while self._peek() == ('keyword', 'and'):
+            self._pos += 1
+            nodes.append(self._not())
+        return nodes[0] if len(nodes) == 1 else ('and', nodes)
+
+    def _not(self) -> tuple:
+        token = self._peek()
+        if token == ('keyword', 'not'):
+            self._pos += 1
+            return 'not', self._not()
+        if token == ('op', '('):
+            self._pos += 1
+            node = self._or()
+            if self._next() != ('op', ')'):
+                raise ValueError('missing ) in filter')
+            return node
+        return self._comparison()
+
+    def _operand(self) -> tuple:
+        # (source, type, scope or None, text for the messages)
+        kind, value = self._next()
+        if kind == 'field':
+            scope, name = value
+            source, type_ = FIELDS[scope][name]
+            if scope == 'header':
+                if name not in self.header_fields:
+                    self.header_fields.append(name)
+                source = 'H[{!r}]'.format(name)
+            return source, type_, scope, scope + '.' + name
+        if kind == 'number':
+            return str(value), int, None, str(value)
+        if kind in ('string', 'word'):
+            return repr(value), str, None, repr(value)
+        raise ValueError('expected a field or a value in filter, not {!r}'.format(value))
+
+    def _comparison(self) -> tuple:
+        left, left_type, left_scope, left_text = self._operand()
+        kind, op = self._next()
+        if kind not in ('op', 'keyword') or op in ('(', ')', 'and', 'or', 'not'):
+            raise ValueError('expected a comparison after {}, not {!r}'.format(left_text, op))
+        right, right_type, right_scope, right_text = self._operand()
+
+        if op in ('has', 'like'):
+            if left_type is not str or right_type is not str:
+                raise ValueError('{} compares strings: {} {} {}'.format(op, left_text, op, right_text))
+            source = '{}({}, {})'.format('HAS' if op == 'has' else 'LIKE', left, right)
+        else:
+            if left_type is not right_type:
+                raise ValueError('{} and {} cannot be compared, one is a number and the other '
+                                 'a string'.format(left_text, right_text))
+            source = '{} {} {}'.format(left, op, right)
+        scopes = frozenset(scope for scope in (left_scope, right_scope) if scope)
+        return 'test', source, scopes
+
+
+def get_source(node: tuple) -> str:
+    if node[0] == 'test':
+        return node[1]
+    if node[0] == 'not':
+        return 'not ({})'.format(get_source(node[1]))
+    return '(' + ' {} '.format(node[0]).join(get_source(child) for child in node[1]) + ')'
+
+
+def get_scopes(node: tuple) -> frozenset:
+    if node[0] == 'test':
+        return node[2]
+    if node[0] == 'not':
+        return get_scopes(node[1])
+    return frozenset().union(*(get_scopes(child) for child in node[1]))
+
+
+def compile_filter(nodes: List[tuple], args: str) -> Optional[Callable]:
+    # the conjunction of the nodes as a Python function of args, None for
+    # an empty conjunction, which holds for everything
+    if not nodes:
+        return None
+    source = 'lambda {}: {}'.format(args, ' and '.join(get_source(node) for node in nodes))
+    return eval(source, dict(NAMESPACE))
+
+
+class ElfQuery:
+    # A filter expression over the fields of the ELF header, the section
+    # headers or the program headers, which selects the sections or the
+    # segments it is about (or the files, when only the header is named):
+    #
+    #   segment.type == LOAD and segment.flags has WE
+    #   section.flags has A and section.size > 1M
+    #   header.type == DYN and section.name like ".debug*"
+    #
+    # Fields are written scope.name, see FIELDS; bare words are strings,
+    # numbers take a K, M or G suffix. The expression is compiled once into
+    # Python functions that run on the table rows as decoded by struct,
+    # get_entries() of the section and segment tables, so no section or
+    # segment object is built and the names are only read for the rows
+    # they are asked of.
+    #
+    # The top level conjuncts that only name header fields are pushed down
+    # into a filter of their own, run on the ELF header alone: a file it
+    # turns down is neither parsed any further nor paged in beyond its
+    # first page.
+
+    def __init__(self, expression: str, pushdown: bool = True):
+        self._expression = expression
+        self._pushdown = pushdown
+        parser = FilterParser(expression)
+        tree = parser.parse()
+        conjuncts = tree[1] if tree[0] == 'and' else [tree]
+
+        scopes = get_scopes(tree) - {'header'}
+        if len(scopes) > 1:
+            raise ValueError('a filter selects sections or segments, not both')
+        self._kind = min(scopes) if scopes else 'header'
+
+        self._header_values = eval('lambda h: {' + ', '.join(
+            '{!r}: {}'.format(name, HEADER_FIELDS[name][0]) for name in parser.header_fields) + '}')
+        pushed = [node for node in conjuncts if pushdown and get_scopes(node) <= {'header'}]
+        self._header_filter = compile_filter(pushed, 'H')
+        self._row_filter = compile_filter([node for node in conjuncts if node not in pushed], 'H, r, i, NAME')
+
+    def __reduce__(self):
+        # the compiled functions do not pickle, so the workers of a batch
+        # compile the expression again
+        return ElfQuery, (self._expression, self._pushdown)
+
+    def match_header(self, header: 'ElfHdr') -> bool:
+        return self._header_filter is None or self._header_filter(self._header_values(header))
+
+    def select(self, elf: 'ELF') -> List['QueryMatch']:
+        header = elf.header
+        values = self._header_values(header)
+        if self._header_filter is not None and not self._header_filter(values):
+            return []
+        test = self._row_filter
+        if self._kind == 'header':
+            if test is None or test(values, None, 0, None):
+                return [QueryMatch('header', 0, header.get_type().split()[0], 0, elf.size)]
+            return []
+
+        matches = []
+        if self._kind == 'section':
+            if not elf.sections.num:
+                return matches
+            names = elf.sections.get_name
+            for i, r in enumerate(elf.section_table.get_entries()):
+                if r[1] and (test is None or test(values, r, i, names)):
+                    matches.append(QueryMatch('section', i, names(r[0]), r[4], r[5]))
+        else:
+            if elf.segment_table.content is None:
+                return matches
+            for i, r in enumerate(elf.segment_table.get_entries()):
+                if r[0] and (test is None or test(values, r, i, None)):
+                    matches.append(QueryMatch('segment', i, ElfSegment.parse_type(r[0]), r[2], r[5]))
+        return matches
+
+    def query_file(self, filename: str) -> List['QueryMatch']:
+        with open(filename, 'rb') as f:
+            mm = mmap.mmap(f.fileno(), 0, flags=mmap.MAP_PRIVATE, prot=mmap.PROT_READ)
+        try:
+            if self._header_filter is not None:
+                header = ElfHdr()
+                header.parse(mm)
+                if not self.match_header(header):
+                    return []
+            with ELF(filename, mm) as elf:
+                return self.select(elf)
+        finally:
+            mm.close()
+
+    def query_files(self, paths: Iterable[str], jobs: int = None):
+        # every ELF file given or below the given directories, spread over
+        # a pool of worker processes, yields (filename, matches, error)
+        return batch.run(_query_file, batch.find_elf_files(paths), (self,), jobs)
+
+    @property
+    def expression(self) -> str:
+        return self._expression
+
+    @property
+    def kind(self) -> str:
+        return self._kind
+
+    @property
+    def pushdown(self) -> bool:
+        return self._header_filter is not None
+
+
+def _query_file(filename: str, query: 'ElfQuery') -> List['QueryMatch']:
+    return query.query_file(filename)
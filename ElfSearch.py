@@ -0,0 +1,126 @@
+from ELF import ELF
+from ElfValidation import require_buffer
+import batch
+import re
+from typing import Dict, Iterable, Iterator, List, NamedTuple, Union
+
+
+class SearchHit(NamedTuple):
+    pattern: str
+    section: str
+    offset: int      # file offset
+    address: int     # virtual address, when the section is loaded
+
+
+def compile_signature(signature: str) -> List[bytes]:
+    # Hex signature to regex atoms, one per byte: '48 8b ?? e8 ?? ?? ?? ??'
+    # with '??' matching any byte and 'a?' or '?a' any byte with that one
+    # nibble. Whitespace between the bytes is optional.
+    digits = ''.join(signature.split())
+    if len(digits) % 2:
+        raise ValueError('odd number of hex digits in signature ' + repr(signature))
+
+    atoms = []
+    for i in range(0, len(digits), 2):
+        hi, lo = digits[i], digits[i + 1]
+        if hi == '?' and lo == '?':
+            atoms.append(b'.')
+        elif hi == '?':
+            atoms.append(b'[' + b''.join(re.escape(bytes([(n << 4) | int(lo, 16)])) for n in range(16)) + b']')
+        elif lo == '?':
+            atoms.append(b'[' + re.escape(bytes([int(hi, 16) << 4])) + b'-'
+                         + re.escape(bytes([(int(hi, 16) << 4) | 0xf])) + b']')
+        else:
+            atoms.append(re.escape(bytes([int(hi + lo, 16)])))
+    if not atoms:
+        raise ValueError('empty signature')
+    return atoms
+
+
+def compile_signatures(signatures: List[List[bytes]]) -> 're.Pattern':
+    # One regex for all signatures, with one group per signature telling
+    # which one matched. The signatures are matched in a lookahead, so a
+    # match only takes up its first byte (or nothing) and hits starting
+    # inside an earlier one are found too. A plain alternation makes the
+    # regex engine try every branch at every offset, so when no signature
+    # starts with a wildcard the regex starts with the set of possible
+    # first bytes instead, which it scans for quickly, and a lookbehind on
+    # that first byte selects the branches to try.
+    if any(atoms[0] == b'.' for atoms in signatures):
+        return re.compile(b'(?=' + b'|'.join(b'(' + b''.join(atoms) + b')' for atoms in signatures) + b')',
+                          re.DOTALL)
+
+    first = b''.join(atoms[0][1:-1] if atoms[0].startswith(b'[') else atoms[0] for atoms in signatures)
+    branches = b'|'.join(b'(?<=' + atoms[0] + b')(' + b''.join(atoms[1:]) + b')' for atoms in signatures)
+    return re.compile(b'[' + first + b'](?=' + branches + b')', re.DOTALL)
+
+
+class ElfSearch:
+    # Search for many byte signatures at once. All of them are compiled
+    # into a single regex, see compile_signatures(), which runs over the
+    # mmap buffer of the executable sections by default, so
+    # each byte of the scanned sections is looked at once regardless of the
+    # number of signatures. Signatures are hex strings with wildcards, see
+    # compile_signature(), or bytes matched literally.
+
+    def __init__(self, signatures: Union[Dict[str, Union[str, bytes]], Iterable[Union[str, bytes]]],
+                 flags: str = 'X', sections: List[str] = None):
+        if not isinstance(signatures, dict):
+            signatures = {str(s): s for s in signatures}
+        if not signatures:
+            raise ValueError('no signatures to search for')
+
+        self._names = list(signatures)
+        patterns = []
+        for signature in signatures.values():
+            if isinstance(signature, bytes):
+                patterns.append([re.escape(bytes([b])) for b in signature])
+            else:
+                patterns.append(compile_signature(signature))
+
+        self._regex = compile_signatures(patterns)
+        # to find the other signatures matching where the first one did
+        self._singles = [re.compile(b''.join(atoms), re.DOTALL) for atoms in patterns]
+        self._flags = flags
+        self._sections = sections
+
+    def get_sections(self, elf: 'ELF') -> List['ElfSection']:
+        selected = []
+        for section in elf.sections:
+            if section.type == 'NOBITS' or not section.size:
+                continue
+            if self._sections is not None:
+                if section.name in self._sections:
+                    selected.append(section)
+            elif all(flag in section.flags for flag in self._flags):
+                selected.append(section)
+        return selected
+
+    def search(self, elf: 'ELF') -> Iterator['SearchHit']:
+        mm = elf.mm
+        require_buffer(mm, 'the search')
+        for section in self.get_sections(elf):
+            start = section.offset
+            end = min(section.offset + section.size, elf.size)
+            base = section.address - section.offset if 'A' in section.flags else None
+            for match in self._regex.finditer(mm, start, end):
+                offset = match.start()
+                address = base + offset if base is not None else None
+                first = match.lastindex - 1
+                yield SearchHit(self._names[first], section.name, offset, address)
+                for i in range(first + 1, len(self._singles)):
+                    if self._singles[i].match(mm, offset, end):
+                        yield SearchHit(self._names[i], section.name, offset, address)
+
+    def search_file(self, filename: str) -> List['SearchHit']:
+        with ELF(filename) as elf:
+            return list(self.search(elf))
+
+    def search_files(self, paths: Iterable[str], jobs: int = None):
+        # every ELF file given or below the given directories, spread over
+        # a pool of worker processes, yields (filename, hits, error)
+        return batch.run(_search_file, batch.find_elf_files(paths), (self,), jobs)
+
+
+def _search_file(filename: str, search: 'ElfSearch') -> List['SearchHit']:
+    return search.search_file(filename)
@@ -1,7 +1,20 @@
 import ElfHdr
+from ElfStats import phase
+from functools import lru_cache
 import mmap
+import struct
+import sys
+from typing import Iterator, List
 from util import hexdump
 
+# sh_name, sh_type, sh_flags, sh_addr, sh_offset, sh_size, sh_link,
+# sh_info, sh_addralign, sh_entsize
+SHDR_FORMATS = {
+    'ELF32': '<IIIIIIIIII',
+    'ELF64': '<IIQQQQIIQQ',
+}
+
+
 class ElfSectionTable:
 
     def __init__(self, ehdr: 'ElfHdr'):
@@ -17,6 +30,14 @@ class ElfSectionTable:
     def parse(self, mm: 'mmap.mmap'):
         self._content = mm[self.offset:self.offset+self.size]
 
+    def get_entries(self) -> Iterator[tuple]:
+        # all the section headers decoded in one go, as tuples of fields
+        fmt = SHDR_FORMATS[self._class]
+        padding = self._entsize - struct.calcsize(fmt)
+        if padding > 0:
+            fmt += str(padding) + 'x'
+        return struct.Struct(fmt).iter_unpack(self._content)
+
     #def __bool__(self):
     #    return bool(self._sections)
     def __bool__(self):
@@ -52,15 +73,155 @@ class ElfSectionTable:
     def strndx(self):
         return self._strndx
 
+    @property
+    def content(self) -> bytes:
+        return self._content
+
     #@property
     #def sections(self):
     #    return self._sections
 
 
+class ElfSectionList:
+    # The sections by section header table index or by name. Entries are
+    # decoded from the raw table on first access and kept; the map of names
+    # is built on the first lookup by name from a single pass over the
+    # sh_name column, so finding one section does not decode the others.
+    # Iterating yields the sections that are not NULL, in file offset
+    # order (table order for equal offsets), and len() counts them; num is
+    # the number of entries of the table, indexes go up to it.
+
+    def __init__(self, table: 'ElfSectionTable', mm: 'mmap.mmap', issues: 'ElfIssues', filesize: int,
+                 stats: 'ElfStats' = None):
+        self._table = table  # None when there is no usable section table
+        self._mm = mm
+        self._issues = issues
+        self._filesize = filesize
+        self._stats = stats
+        self._num = table.num if table is not None else 0
+        if table is not None:
+            self._fmt = struct.Struct(SHDR_FORMATS[table.elfclass])
+
+        self._sections = {}     # index -> ElfSection, as decoded
+        self._names = None      # content of the section name string table
+        self._by_name = None    # name -> index of the first section with it
+        self._ordered = None    # the sections iterated over, by offset
+
+    def _get_names(self) -> bytes:
+        if self._names is None:
+            self._names = b''
+            strndx = self._table.strndx
+            if strndx >= self._num:
+                self._issues.add('section table', 'string table index {} out of range'.format(strndx))
+            else:
+                strtab = self._decode(strndx, b'')
+                if self._issues.check_range('section ' + str(strndx), strtab.offset, strtab.size, self._filesize):
+                    self._names = strtab.content
+        return self._names
+
+    def _decode(self, index: int, names: bytes, fields: tuple = None) -> 'ElfSection':
+        if fields is None:
+            fields = self._fmt.unpack_from(self._table.content, index * self._table.entsize)
+        section = ElfSection(self._table.elfclass, index, self._stats)
+        section.parse_entry(fields, self._mm, names)
+        if section.type != 'NULL':
+            component = 'section ' + str(index)
+            if section.shname >= len(names) and names:
+                self._issues.add(component, 'name offset 0x{:x} out of the string table'.format(section.shname))
+            if section.type != 'NOBITS':
+                if not self._issues.check_range(component, section.offset, section.size, self._filesize):
+                    section.discard_content()
+        return section
+
+    def get_name(self, shname: int) -> str:
+        # the name at offset shname of the section name string table, cut
+        # like those of the sections
+        names = self._get_names() if self._table is not None else b''
+        if shname >= len(names):
+            return ''
+        end = names.find(b'\x00', shname)
+        return names[shname:end if end >= 0 else len(names)].decode('utf-8', 'replace')
+
+    def get_index(self, name: str) -> int:
+        if self._table is None:
+            raise KeyError(name)
+        if self._by_name is None:
+            names = self._get_names()
+            with phase(self._stats, 'section name map', objects=self._num):
+                self._by_name = self._map_names(names)
+        return self._by_name[name.encode('utf-8')]
+
+    def _map_names(self, names: bytes) -> dict:
+        # sh_name is the first word of every entry
+        entsize = self._table.entsize
+        content = self._table.content
+        if entsize % 4 == 0 and sys.byteorder == 'little':
+            shnames = memoryview(content).cast('I')[::entsize // 4]
+        else:
+            shnames = [int.from_bytes(content[i:i+4], 'little') for i in range(0, len(content), entsize)]
+        by_name = {}
+        for index in range(self._num - 1, 0, -1):
+            offset = shnames[index]
+            if offset < len(names):
+                end = names.find(b'\x00', offset)
+                by_name[names[offset:end if end >= 0 else len(names)]] = index
+        return by_name
+
+    def get(self, name: str, default=None):
+        try:
+            return self[name]
+        except KeyError:
+            return default
+
+    def __getitem__(self, key) -> 'ElfSection':
+        if isinstance(key, str):
+            index = self.get_index(key)
+        else:
+            index = key + self._num if key < 0 else key
+            if not 0 <= index < self._num:
+                raise IndexError('section index out of range')
+        section = self._sections.get(index)
+        if section is None:
+            names = self._get_names()
+            with phase(self._stats, 'section headers', self._table.entsize, 1):
+                section = self._decode(index, names)
+            self._sections[index] = section
+        return section
+
+    def __contains__(self, name: str) -> bool:
+        return self.get(name) is not None
+
+    def _get_ordered(self) -> List['ElfSection']:
+        if self._ordered is None:
+            if self._num and len(self._sections) < self._num:
+                # going through all of them, decode the missing ones in one pass
+                names = self._get_names()
+                with phase(self._stats, 'section headers', self._table.size, self._num - len(self._sections)):
+                    for index, fields in enumerate(self._table.get_entries()):
+                        if index not in self._sections:
+                            self._sections[index] = self._decode(index, names, fields)
+            sections = [self._sections[index] for index in range(self._num)]
+            self._ordered = sorted((section for section in sections if section.type != 'NULL'),
+                                   key=lambda section: section.offset)
+        return self._ordered
+
+    def __len__(self):
+        return len(self._get_ordered())
+
+    def __iter__(self) -> Iterator['ElfSection']:
+        return iter(self._get_ordered())
+
+    @property
+    def num(self) -> int:
+        return self._num
+
+
 class ElfSection:
 
-    def __init__(self, elfclass: str):
+    def __init__(self, elfclass: str, index: int = 0, stats: 'ElfStats' = None):
         self._class = elfclass
+        self._index = index  # position in the section header table
+        self._stats = stats
 
         self._name = ''      # at section creation, the name cannot be known
         self._shname = None  # since the sh_name field first needs to be parsed
@@ -74,55 +235,46 @@ class ElfSection:
         self._addralign = None
         self._entsize = None
         self._content = None
+        self._mm = None
 
     def parse(self, mm: 'mmap.mmap', offset: int, names: bytes = None):
+        fmt = struct.Struct(SHDR_FORMATS[self._class])
         mm.seek(offset)
-        sh_name = mm.read(4)
-        sh_type = mm.read(4)
-        if self._class == 'ELF32':
-            sh_flags = mm.read(4)
-            sh_addr = mm.read(4)
-            sh_offset = mm.read(4)
-            sh_size = mm.read(4)
-            sh_link = mm.read(4)
-            sh_info = mm.read(4)
-            sh_addralign = mm.read(4)
-            sh_entsize = mm.read(4)
-        else:
-            sh_flags = mm.read(8)
-            sh_addr = mm.read(8)
-            sh_offset = mm.read(8)
-            sh_size = mm.read(8)
-            sh_link = mm.read(4)
-            sh_info = mm.read(4)
-            sh_addralign = mm.read(8)
-            sh_entsize = mm.read(8)
-
-        self._shname = int.from_bytes(sh_name, 'little')
+        self.parse_entry(fmt.unpack(mm.read(fmt.size)), mm, names)
+
+    def parse_entry(self, fields: tuple, mm: 'mmap.mmap', names: bytes = None):
+        # fields as decoded by ElfSectionTable.get_entries()
+        (sh_name, sh_type, sh_flags, sh_addr, sh_offset, sh_size,
+         sh_link, sh_info, sh_addralign, sh_entsize) = fields
+
+        self._shname = sh_name
         if names:
             self._name = self.parse_name(names, self._shname)
-        self._type = ElfSection.parse_type(int.from_bytes(sh_type, 'little'))
-        self._flags = ElfSection.parse_flags(int.from_bytes(sh_flags, 'little'))
-        self._address = int.from_bytes(sh_addr, 'little')
-        self._offset = int.from_bytes(sh_offset, 'little')
-        self._size = int.from_bytes(sh_size, 'little')
-        self._link = sh_link  # ?
-        self._info = sh_info  # ?
-        self._addralign = int.from_bytes(sh_addralign, 'little')
-        self._entsize = int.from_bytes(sh_entsize, 'little')
-        self._content = mm[self._offset:self._offset+self._size]
+        self._type = ElfSection.parse_type(sh_type)
+        self._flags = ElfSection.parse_flags(sh_flags)
+        self._address = sh_addr
+        self._offset = sh_offset
+        self._size = sh_size
+        self._link = sh_link
+        self._info = sh_info
+        self._addralign = sh_addralign
+        self._entsize = sh_entsize
+        # the content is only sliced out of the file when first asked for,
+        # so that header-only queries never touch the section data
+        self._mm = mm
+
+    def discard_content(self):
+        # for sections whose data lies outside of the file
+        self._content = b''
 
     def parse_name(self, section_names: bytes, offset: int) -> str:
-        name =''
-        i = 0
-        while True:
-            ch = section_names[offset + i]
-            if ch == 0x00:
-                break
-            else:
-                name += chr(ch)
-                i += 1
-        return name
+        # names out of the string table, or not terminated in it, are cut
+        if offset >= len(section_names):
+            return ''
+        end = section_names.find(b'\x00', offset)
+        if end < 0:
+            end = len(section_names)
+        return section_names[offset:end].decode('utf-8', 'replace')
 
     def __str__(self):
         s  = 'Section ' + self.name + '\n'
@@ -134,6 +286,14 @@ class ElfSection:
         s += 'Content:\n' + hexdump(self.content, self.offset) + '\n'
         return s
 
+    @property
+    def index(self) -> int:
+        return self._index
+
+    @property
+    def shname(self) -> int:
+        return self._shname
+
     @property
     def name(self) -> str:
         return self._name
@@ -163,7 +323,7 @@ class ElfSection:
         return self._link
 
     @property
-    def info(self):
+    def info(self) -> int:
         return self._info
 
     @property
@@ -176,9 +336,13 @@ class ElfSection:
 
     @property
     def content(self) -> bytes:
+        if self._content is None:
+            with phase(self._stats, 'section content', self._size, 1):
+                self._content = self._mm[self._offset:self._offset+self._size]
         return self._content
 
     @staticmethod
+    @lru_cache(maxsize=1024)
     def parse_flags(flags: int) -> str:
         SHF_WRITE = (1 << 0)
         SHF_ALLOC = (1 << 1)
@@ -214,6 +378,7 @@ class ElfSection:
         return s
 
     @staticmethod
+    @lru_cache(maxsize=1024)
     def parse_type(code: int) -> str:
         SHT_LOPROC = 0x70000000
         SHT_HIPROC = 0x7fffffff
@@ -252,7 +417,7 @@ class ElfSection:
                 SHT_SUNW_COMDAT: 'SUNW_COMDAT',
                 SHT_SUNW_syminfo: 'SUNW_SYMINFO',
                 SHT_GNU_verdef: 'GNU_VERDEF',
-                SHT_GNU_verneed: 'GNU_VERNEEd',
+                SHT_GNU_verneed: 'GNU_VERNEED',
                 SHT_GNU_versym: 'GNU_VERSYM',
             }.get(code, 'Sun-specific')
 
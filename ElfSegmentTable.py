@@ -1,5 +1,15 @@
 import ElfHdr
+from functools import lru_cache
 import mmap
+import struct
+from typing import Iterator
+
+# p_type, p_offset, p_vaddr, p_paddr, p_filesz, p_memsz, p_flags, p_align
+# for ELF32; ELF64 moves p_flags up to second place
+PHDR_FORMATS = {
+    'ELF32': '<IIIIIIII',
+    'ELF64': '<IIQQQQQQ',
+}
 
 class ElfSegmentTable:
 
@@ -14,6 +24,20 @@ class ElfSegmentTable:
     def parse(self, mm: 'mmap.mmap'):
         self._content = mm[self.offset:self.offset+self.size]
 
+    def get_entries(self) -> Iterator[tuple]:
+        # all the program headers decoded in one go, as tuples of fields in
+        # the ELF64 order (p_type, p_flags, p_offset, p_vaddr, p_paddr,
+        # p_filesz, p_memsz, p_align) whatever the class
+        fmt = PHDR_FORMATS[self._class]
+        padding = self._entsize - struct.calcsize(fmt)
+        if padding > 0:
+            fmt += str(padding) + 'x'
+        entries = struct.Struct(fmt).iter_unpack(self._content)
+        if self._class == 'ELF32':
+            return ((p_type, p_flags, p_offset, p_vaddr, p_paddr, p_filesz, p_memsz, p_align)
+                    for p_type, p_offset, p_vaddr, p_paddr, p_filesz, p_memsz, p_flags, p_align in entries)
+        return entries
+
     def __bool__(self):
         return bool(self.size)
         #return bool(self._segments)
@@ -51,8 +75,9 @@ class ElfSegmentTable:
 
 class ElfSegment:
 
-    def __init__(self, elfclass: str):
+    def __init__(self, elfclass: str, index: int = 0):
         self._class = elfclass
+        self._index = index  # position in the program header table
 
         self.p_type = None      # segment type
         self.p_offset = None    # segment file offset
@@ -85,6 +110,11 @@ class ElfSegment:
             self.p_align = mm.read(8)
 
     def get_type(self) -> str:
+        return ElfSegment.parse_type(int.from_bytes(self.p_type, 'little'))
+
+    @staticmethod
+    @lru_cache(maxsize=256)
+    def parse_type(code: int) -> str:
         PT_NULL = 0
         PT_LOAD = 1
         PT_DYNAMIC = 2
@@ -127,7 +157,11 @@ class ElfSegment:
             PT_HIOS: 'HIOS',                    # "End of OS-specific",
             PT_LOPROC: 'LOPROC',                # "Start of processor-specific",
             PT_HIPROC: 'HIPROC',                # "End of processor-specific"
-        }.get(int.from_bytes(self.p_type, 'little'), 'Other')
+        }.get(code, 'Other')
+
+    @property
+    def index(self) -> int:
+        return self._index
 
     @property
     def offset(self) -> int:
@@ -149,13 +183,17 @@ class ElfSegment:
         return int.from_bytes(self.p_memsz, 'little')
 
     def get_flags(self) -> str:
+        return ElfSegment.parse_flags(int.from_bytes(self.p_flags, 'little'))
+
+    @staticmethod
+    @lru_cache(maxsize=256)
+    def parse_flags(flags: int) -> str:
         PF_X = 1
         PF_W = 2
         PF_R = 4
         PF_MASKOS = 0x0ff00000
         PF_MASKPROC = 0xf0000000
 
-        flags = int.from_bytes(self.p_flags, 'little')
         s = ''
         s = s + 'R' if flags & PF_R else s + ' '
         s = s + 'W' if flags & PF_W else s + ' '
@@ -165,6 +203,56 @@ class ElfSegment:
     def get_align(self) -> int:
         return int.from_bytes(self.p_align, 'little')
 
+    def contains(self, section: 'ElfSection') -> bool:
+        # Same rules as ELF_SECTION_IN_SEGMENT in binutils (strict, checking
+        # virtual addresses), which is what readelf uses for its mapping
+        ptype = self.get_type()
+        tls = 'T' in section.flags
+        alloc = 'A' in section.flags
+        nobits = section.type == 'NOBITS'
+
+        # only TLS, RELRO and LOAD segments contain TLS sections, while
+        # a TLS segment contains nothing else and PHDR no sections at all
+        if tls and ptype not in ('TLS', 'GNU_RELRO', 'LOAD'):
+            return False
+        if not tls and ptype in ('TLS', 'PHDR'):
+            return False
+        if not alloc and ptype in ('LOAD', 'DYNAMIC', 'GNU_EH_FRAME', 'GNU_STACK', 'GNU_RELRO'):
+            return False
+
+        # .tbss takes up no space outside of the TLS segment, and readelf
+        # does not list it there either
+        if tls and nobits and ptype != 'TLS':
+            return False
+        size = section.size
+
+        # binutils subtracts on unsigned values, where filesz - 1 and
+        # memsz - 1 wrap around for a size of 0 and let any offset through;
+        # the size checks after them then only keep an empty section at
+        # the start of the segment
+        offset, filesz = self.get_offset(), self.get_filesz()
+        if not nobits:
+            if section.offset < offset or (filesz and section.offset - offset > filesz - 1):
+                return False
+            if section.offset - offset + size > filesz:
+                return False
+
+        vaddr, memsz = self.get_vaddr(), self.get_memsz()
+        if alloc:
+            if section.address < vaddr or (memsz and section.address - vaddr > memsz - 1):
+                return False
+            if section.address - vaddr + size > memsz:
+                return False
+
+        # no empty sections at the edges of DYNAMIC and NOTE segments
+        if ptype in ('DYNAMIC', 'NOTE') and section.size == 0 and memsz != 0:
+            if not nobits and not offset < section.offset < offset + filesz:
+                return False
+            if alloc and not vaddr < section.address < vaddr + memsz:
+                return False
+
+        return True
+
     def __str__(self):
         s  = 'Program header\n'
         s += '---\n'
@@ -0,0 +1,155 @@
+import heapq
+from typing import List
+
+
+class SizeEntry:
+
+    def __init__(self, name: str, filesize: int, vmsize: int):
+        self._name = name
+        self._filesize = filesize
+        self._vmsize = vmsize
+        self._children = []
+
+    def __repr__(self):
+        return '<{} file={} vm={}>'.format(self.name, self.filesize, self.vmsize)
+
+    @property
+    def name(self) -> str:
+        return self._name
+
+    @property
+    def filesize(self) -> int:
+        return self._filesize
+
+    @property
+    def vmsize(self) -> int:
+        return self._vmsize
+
+    @property
+    def children(self) -> List['SizeEntry']:
+        return self._children
+
+
+class ElfSizeReport:
+    # Attribution of the file size and the memory image size (from the
+    # loadable segments) to sections and, when the file has symbols, to the
+    # symbols inside each section. Symbols are aggregated on the columns of
+    # the symbol table; names are only decoded for the entries reported.
+
+    SYMBOL_TYPES = (0, 1, 2, 6, 10)  # NOTYPE, OBJECT, FUNC, TLS, GNU_IFUNC
+
+    def __init__(self, elf: 'ELF', symbols: bool = True, top: int = 10):
+        self._top = top
+        self._filesize = elf.size
+        self._vmsize = sum(seg.get_memsz() for seg in elf.segments if seg.get_type() == 'LOAD')
+        self._entries = []
+        self._build(elf, symbols)
+
+    def _build(self, elf: 'ELF', symbols: bool):
+        entries = {}
+        for section in elf.sections:
+            filesize = section.size if section.type != 'NOBITS' else 0
+            vmsize = section.size if 'A' in section.flags else 0
+            if filesize or vmsize:
+                entries[section.index] = SizeEntry(section.name, filesize, vmsize)
+
+        if symbols:
+            self._attribute_symbols(elf, entries)
+
+        # relocatable objects have no segments, their image is the sections
+        if not self._vmsize:
+            self._vmsize = sum(entry.vmsize for entry in entries.values())
+
+        layout = elf.get_layout().get_stats()
+        headers = layout['header'] + layout['segment table'] + layout['section table']
+        others = [
+            SizeEntry('[ELF headers]', headers, 0),
+            SizeEntry('[padding]', layout['padding'] + layout['gap'], 0),
+            SizeEntry('[trailing data]', layout['trailing'], 0),
+        ]
+        # whatever the loadable segments map beyond the sections
+        unmapped = self._vmsize - sum(entry.vmsize for entry in entries.values())
+        if unmapped > 0:
+            others.append(SizeEntry('[other VM]', 0, unmapped))
+
+        self._entries = list(entries.values()) + [e for e in others if e.filesize or e.vmsize]
+        self._entries.sort(key=lambda entry: (entry.filesize, entry.vmsize), reverse=True)
+
+    def _attribute_symbols(self, elf: 'ELF', entries: dict):
+        symtabs = elf.get_symbol_tables()
+        # .symtab is a superset of .dynsym, counting both would count twice
+        full = [t for t in symtabs if t.section.type == 'SYMTAB']
+        for symtab in full or symtabs:
+            # aliases share an address, keep the largest symbol for each one
+            best = {}
+            for i, (ndx, value, size, info) in enumerate(zip(symtab.shndx, symtab.values,
+                                                               symtab.sizes, symtab.info)):
+                if not size or ndx not in entries or info & 0xf not in self.SYMBOL_TYPES:
+                    continue
+                key = (ndx, value)
+                prev = best.get(key)
+                if prev is None or symtab.sizes[prev] < size:
+                    best[key] = i
+
+            by_section = {}
+            for (ndx, _), i in best.items():
+                by_section.setdefault(ndx, []).append(i)
+
+            sizes = symtab.sizes
+            for ndx, indexes in by_section.items():
+                entry = entries[ndx]
+                infile = bool(entry.filesize)
+                inmem = bool(entry.vmsize)
+                attributed = sum(sizes[i] for i in indexes)
+                for i in heapq.nlargest(self._top, indexes, key=sizes.__getitem__):
+                    size = sizes[i]
+                    entry.children.append(SizeEntry(symtab.get_name(i) or '[unnamed]',
+                                                    size * infile, size * inmem))
+                rest = len(indexes) - min(len(indexes), self._top)
+                if rest:
+                    size = attributed - sum(max(c.filesize, c.vmsize) for c in entry.children)
+                    entry.children.append(SizeEntry('[{} other symbols]'.format(rest),
+                                                    size * infile, size * inmem))
+                remaining = max(entry.filesize, entry.vmsize) - attributed
+                if remaining > 0:
+                    entry.children.append(SizeEntry('[section data]',
+                                                    remaining * infile, remaining * inmem))
+
+    def __str__(self):
+        return self.format()
+
+    def format(self, top: int = None) -> str:
+        top = self._top if top is None else top
+
+        def fmt(entry: 'SizeEntry', indent: str) -> str:
+            return '{:6.1%} {:>10d} {:6.1%} {:>10d}  {}{}\n'.format(
+                entry.filesize / (self._filesize or 1), entry.filesize,
+                entry.vmsize / (self._vmsize or 1), entry.vmsize, indent, entry.name)
+
+        s  = '    FILE SIZE          VM SIZE\n'
+        s += '---\n'
+        shown = self._entries[:top]
+        for entry in shown:
+            s += fmt(entry, '')
+            for child in entry.children:
+                s += fmt(child, '    ')
+        if len(self._entries) > top:
+            rest = SizeEntry('[{} others]'.format(len(self._entries) - top),
+                             sum(e.filesize for e in self._entries[top:]),
+                             sum(e.vmsize for e in self._entries[top:]))
+            s += fmt(rest, '')
+        s += '---\n'
+        s += fmt(SizeEntry('TOTAL', self._filesize, self._vmsize), '')
+        return s
+
+    @property
+    def entries(self) -> List['SizeEntry']:
+        return self._entries
+
+    @property
+    def filesize(self) -> int:
+        return self._filesize
+
+    @property
+    def vmsize(self) -> int:
+        return self._vmsize
@@ -0,0 +1,151 @@
+import json
+import os
+import threading
+import time
+from typing import Dict, List
+
+
+class PhaseStats:
+    # what one phase of the parse added up to over all of its runs
+
+    def __init__(self, name: str):
+        self._name = name
+        self._calls = 0
+        self._seconds = 0.0
+        self._bytes = 0         # of the file read or copied
+        self._objects = 0       # decoded: sections, segments, names, symbols
+
+    def add(self, seconds: float, size: int, objects: int):
+        self._calls += 1
+        self._seconds += seconds
+        self._bytes += size
+        self._objects += objects
+
+    def __str__(self):
+        return '{:<24s} {:>8d} {:>10.3f} {:>12d} {:>10d}'.format(
+            self._name, self._calls, self._seconds * 1e3, self._bytes, self._objects)
+
+    @property
+    def name(self) -> str:
+        return self._name
+
+    @property
+    def calls(self) -> int:
+        return self._calls
+
+    @property
+    def seconds(self) -> float:
+        return self._seconds
+
+    @property
+    def bytes(self) -> int:
+        return self._bytes
+
+    @property
+    def objects(self) -> int:
+        return self._objects
+
+
+class Phase:
+    # times one run of a phase; the byte and object counts may be set
+    # while it runs, when they are only known at the end
+
+    def __init__(self, stats: 'ElfStats', name: str, size: int, objects: int):
+        self._stats = stats
+        self._name = name
+        self.bytes = size
+        self.objects = objects
+        self._start = None
+
+    def __enter__(self) -> 'Phase':
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self._stats.add(self._name, self._start, time.perf_counter(), self.bytes, self.objects)
+
+
+class NullPhase:
+    # what the hooks get when instrumentation is off: entering and leaving
+    # it does nothing, and the counts set on it are dropped
+
+    bytes = 0
+    objects = 0
+
+    def __enter__(self) -> 'NullPhase':
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        pass
+
+    def __setattr__(self, name, value):
+        pass
+
+
+NULL_PHASE = NullPhase()
+
+
+def phase(stats: 'ElfStats', name: str, size: int = 0, objects: int = 0):
+    # the hook of the parse pipeline: with stats None, as it is unless
+    # asked for, this costs one comparison and no allocation
+    if stats is None:
+        return NULL_PHASE
+    return Phase(stats, name, size, objects)
+
+
+class ElfStats:
+    # Opt-in instrumentation of the parse: per phase, the wall time, the
+    # bytes of the file touched and the objects decoded, optionally with a
+    # trace event per run in the Chrome trace format (chrome://tracing,
+    # Perfetto). One instance can be shared by many ELF objects to add up
+    # a batch.
+
+    def __init__(self, trace: bool = False):
+        self._phases = {}       # name -> PhaseStats, in order of first run
+        self._trace = trace
+        self._events = []
+        self._origin = time.perf_counter()
+
+    def add(self, name: str, start: float, end: float, size: int = 0, objects: int = 0):
+        stats = self._phases.get(name)
+        if stats is None:
+            stats = self._phases[name] = PhaseStats(name)
+        stats.add(end - start, size, objects)
+        if self._trace:
+            self._events.append({
+                'name': name,
+                'ph': 'X',
+                'ts': (start - self._origin) * 1e6,
+                'dur': (end - start) * 1e6,
+                'pid': os.getpid(),
+                'tid': threading.get_ident(),
+                'args': {'bytes': size, 'objects': objects},
+            })
+
+    def get_phases(self) -> List['PhaseStats']:
+        return list(self._phases.values())
+
+    def get(self, name: str) -> 'PhaseStats':
+        return self._phases.get(name)
+
+    def get_trace(self) -> Dict[str, object]:
+        return {'traceEvents': self._events, 'displayTimeUnit': 'ms'}
+
+    def write_trace(self, filename: str):
+        with open(filename, 'w') as f:
+            json.dump(self.get_trace(), f)
+
+    def __str__(self):
+        s  = '{:<24s} {:>8s} {:>10s} {:>12s} {:>10s}\n'.format('Phase', 'Calls', 'Time (ms)', 'Bytes', 'Objects')
+        s += '---\n'
+        for stats in self._phases.values():
+            s += str(stats) + '\n'
+        return s
+
+    @property
+    def trace(self) -> bool:
+        return self._trace
+
+    @property
+    def events(self) -> List[dict]:
+        return self._events
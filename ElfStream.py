@@ -0,0 +1,367 @@
+from collections import deque
+from ELF import ELF
+from ElfArchive import MemberView
+from ElfHdr import ElfHdr
+from ElfSegmentTable import ElfSegmentTable, ElfSegment
+from ElfValidation import ElfFormatError, StreamError
+import batch
+import mmap
+import tarfile
+from typing import Callable, Iterator, Optional, Tuple
+
+CHUNK = 1 << 20
+DEFAULT_LIMIT = 1 << 26
+# segments kept whole when a file does not fit in the buffer: small, read
+# after the section header table at the end of the file, and needed by
+# notes, the dynamic section and the interpreter
+KEEP_SEGMENTS = ('INTERP', 'DYNAMIC', 'NOTE')
+
+
+def read_into(stream, mm: 'mmap.mmap', start: int, end: int) -> int:
+    # fill mm[start:end] from the stream, up to its end; the number of
+    # bytes read
+    pos = start
+    with memoryview(mm) as view:
+        while pos < end:
+            with view[pos:end] as part:
+                if hasattr(stream, 'readinto'):
+                    n = stream.readinto(part)
+                else:
+                    data = stream.read(end - pos)
+                    n = len(data)
+                    part[:n] = data
+            if not n:
+                break
+            pos += n
+    return pos - start
+
+
+class StreamBuffer:
+    # The mmap methods the parsers use, like MemberView, over a stream that
+    # can only be read forward. The last limit bytes read stay in a window
+    # of chunks, and the ranges given to keep() are copied out as they go
+    # by and kept for good, up to limit bytes of them. Reading past the
+    # window reads on through the stream; bytes that have gone by without
+    # being kept raise StreamError. When the size is not given, asking for
+    # it reads the stream to its end.
+
+    def __init__(self, stream, size: int = None, limit: int = DEFAULT_LIMIT, data=b''):
+        # data: what was read from the stream already, from its start
+        self._stream = stream
+        self._size = size
+        self._limit = limit
+        self._chunks = deque()      # (offset, bytes), consecutive, the window
+        self._start = 0             # offset of the window
+        self._end = 0               # offset of the next byte of the stream
+        self._kept = {}             # offset -> bytes of the ranges kept
+        self._kept_bytes = 0
+        self._pending = []          # (start, end) to keep once read, by end
+        self._pos = 0
+        for i in range(0, len(data), CHUNK):
+            self._append(data[i:i + CHUNK])
+
+    def _append(self, chunk: bytes):
+        self._chunks.append((self._end, chunk))
+        self._end += len(chunk)
+        while self._pending and self._pending[0][1] <= self._end:
+            start, end = self._pending.pop(0)
+            self._kept[start] = self._from_window(start, end)
+        # whole chunks go, as long as limit bytes remain
+        while self._end - self._chunks[0][0] - len(self._chunks[0][1]) >= self._limit:
+            offset, chunk = self._chunks.popleft()
+            self._start = offset + len(chunk)
+
+    def _advance(self, end: int):
+        # read on up to end, stopping at the ends of the ranges to keep so
+        # that they are still in the window then
+        while self._end < end:
+            n = min(CHUNK, end - self._end)
+            if self._pending:
+                n = min(n, self._pending[0][1] - self._end)
+            chunk = self._stream.read(n)
+            if not chunk:
+                if self._size is None:
+                    self._size = self._end
+                break
+            self._append(chunk)
+
+    def _from_window(self, start: int, end: int) -> bytes:
+        pieces = []
+        for offset, chunk in self._chunks:
+            if offset + len(chunk) <= start:
+                continue
+            if offset >= end:
+                break
+            pieces.append(chunk[max(start - offset, 0):end - offset])
+        return pieces[0] if len(pieces) == 1 else b''.join(pieces)
+
+    def keep(self, start: int, end: int):
+        if self._size is not None:
+            end = min(end, self._size)
+        if end <= start:
+            return
+        if self._kept_bytes + end - start > self._limit:
+            raise StreamError('keeping 0x{:x}-0x{:x} goes over the buffer of {} bytes'.format(
+                start, end, self._limit))
+        if start < self._start:
+            raise StreamError('bytes 0x{:x}-0x{:x} have gone by'.format(start, end))
+        self._kept_bytes += end - start
+        if end <= self._end:
+            self._kept[start] = self._from_window(start, end)
+        else:
+            self._pending.append((start, end))
+            self._pending.sort(key=lambda pending: pending[1])
+
+    def get(self, start: int, end: int) -> bytes:
+        if self._size is not None:
+            end = min(end, self._size)
+        if end <= start:
+            return b''
+        for offset, data in self._kept.items():
+            if offset <= start and end <= offset + len(data):
+                return data[start - offset:end - offset]
+        if start >= self._start and end - start > self._limit:
+            raise StreamError('bytes 0x{:x}-0x{:x} do not fit in the buffer of {} bytes'.format(
+                start, end, self._limit))
+        if end > self._end:
+            self._advance(end)
+            end = min(end, self._end)
+        if start < self._start:
+            raise StreamError('bytes 0x{:x}-0x{:x} have gone by, only the last {} bytes read are '
+                              'kept'.format(start, end, self._limit))
+        return self._from_window(start, end)
+
+    def seek(self, pos: int):
+        self._pos = pos
+
+    def tell(self) -> int:
+        return self._pos
+
+    def read(self, n: int) -> bytes:
+        data = self.get(self._pos, self._pos + n)
+        self._pos += n
+        return data
+
+    def find(self, sub: bytes, start: int = 0, end: int = None) -> int:
+        end = len(self) if end is None else end
+        found = self.get(start, end).find(sub)
+        return found + start if found >= 0 else -1
+
+    def rfind(self, sub: bytes, start: int = 0, end: int = None) -> int:
+        end = len(self) if end is None else end
+        found = self.get(start, end).rfind(sub)
+        return found + start if found >= 0 else -1
+
+    def __getitem__(self, item):
+        if isinstance(item, slice):
+            if item.step not in (None, 1):
+                raise ValueError('slices of a stream go forward one byte at a time')
+            start, stop = item.start or 0, item.stop
+            if start < 0 or stop is None or stop < 0:
+                start, stop, _ = item.indices(len(self))
+            return self.get(start, stop)
+        if item < 0:
+            item += len(self)
+        data = self.get(item, item + 1)
+        if not data:
+            raise IndexError('index out of range')
+        return data[0]
+
+    def __len__(self):
+        if self._size is None:
+            self._advance(float('inf'))
+        return self._size
+
+    def close(self):
+        self._chunks.clear()
+        self._kept.clear()
+
+    @property
+    def limit(self) -> int:
+        return self._limit
+
+    @property
+    def position(self) -> int:
+        # bytes read from the stream so far
+        return self._end
+
+    @property
+    def kept(self) -> int:
+        return self._kept_bytes
+
+
+class ElfStream:
+    # An ELF file read from a stream that can only be read once and
+    # forward: standard input, a pipe, a member of a tar stream. Up to
+    # limit bytes are read into anonymous memory, and a file that fits is
+    # parsed from there like a mapped file, with nothing missing. A bigger
+    # one is parsed over a StreamBuffer, spooled in the order the parse
+    # needs it: the header first, which tells where the program and
+    # section header tables are, then those tables, the segments of the
+    # types in keep and the start of the first LOAD segment, which are
+    # kept as they go by, up to limit bytes of them, while of the rest only
+    # the last limit bytes read are at hand. Content asked for in offset
+    # order is there as long as it fits in the buffer, content gone by
+    # raises StreamError.
+    #
+    # With an ElfStream in a with block, as with ElfLease, the block gets
+    # the ELF object.
+
+    def __init__(self, stream, name: str = '-', size: int = None, limit: int = DEFAULT_LIMIT,
+                 keep: Tuple[str, ...] = KEEP_SEGMENTS, prefix: bytes = b'', strict: bool = False,
+                 stats: 'ElfStats' = None):
+        # prefix: the bytes already read from the stream, e.g. to check the
+        # magic number
+        self._name = name
+        self._strict = strict
+        self._stats = stats
+        self._elf = None
+        self._mm = None
+
+        want = limit + 1 if size is None else min(size, limit + 1)
+        if want <= len(prefix):
+            raise ValueError('the buffer has to hold more than the prefix')
+        mm = mmap.mmap(-1, want)
+        try:
+            mm[:len(prefix)] = prefix
+            read = len(prefix) + read_into(stream, mm, len(prefix), want)
+            if read <= limit:
+                if not read:
+                    raise ElfFormatError('empty input')
+                if read < want:
+                    mm = self._shrink(mm, read)
+                self._mm = self._buffer = mm
+                return
+            self._buffer = StreamBuffer(stream, size, limit, mm)
+        except Exception:
+            mm.close()
+            raise
+
+        try:
+            self._keep(MemberView(mm, 0, min(read, CHUNK)), keep)
+        except Exception:
+            self._buffer.close()
+            raise
+        finally:
+            mm.close()
+
+    @staticmethod
+    def _shrink(mm: 'mmap.mmap', size: int) -> 'mmap.mmap':
+        try:
+            mm.resize(size)
+            return mm
+        except (OSError, SystemError, ValueError):
+            # anonymous maps do not resize everywhere
+            smaller = mmap.mmap(-1, size)
+            smaller[:] = mm[:size]
+            mm.close()
+            return smaller
+
+    def _keep(self, head: 'MemberView', keep: Tuple[str, ...]):
+        # The header, out of the first bytes, and the tables it leads to,
+        # then the segments of the types in keep that fit, then as much as
+        # fits of the first LOAD segment: it starts with the symbol, string
+        # and hash tables the dynamic section points to, which comes after
+        # them. Files counting their sections or segments in the first
+        # section header are left to the parse, which finds the tables in
+        # the window when they are read in order.
+        header = ElfHdr()
+        header.parse(head)
+        self._buffer.keep(0, header.get_size())
+        table = ElfSegmentTable(header)
+        escaped = header.get_phnum() == ElfHdr.PN_XNUM
+        if not escaped:
+            self._buffer.keep(table.offset, table.offset + table.size)
+        if header.get_shnum():
+            shoff = header.get_shoff()
+            self._buffer.keep(shoff, shoff + header.get_shnum() * header.get_shentsize())
+
+        if escaped or not table or table.entsize < (32 if header.get_class() == 'ELF32' else 56):
+            return
+        table.parse(self._buffer)
+        rows = []
+        loads = []
+        for row in table.get_entries():
+            ptype = ElfSegment.parse_type(row[0])
+            if ptype in keep:
+                rows.append(row)
+            elif ptype == 'LOAD':
+                loads.append(row)
+        for row in rows:
+            try:
+                self._buffer.keep(row[2], row[2] + row[5])
+            except StreamError:
+                pass
+        first = min(loads, key=lambda row: row[2], default=None)
+        if first is not None:
+            room = self._buffer.limit - self._buffer.kept
+            self._buffer.keep(first[2], first[2] + min(first[5], room))
+
+    def open(self) -> 'ELF':
+        if self._elf is None:
+            self._elf = ELF(self._name, self._buffer, self._strict, self._stats)
+        return self._elf
+
+    def close(self):
+        if self._mm is not None:
+            self._mm.close()
+        else:
+            self._buffer.close()
+
+    def __enter__(self) -> 'ELF':
+        try:
+            return self.open()
+        except Exception:
+            self.close()
+            raise
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    @property
+    def name(self) -> str:
+        return self._name
+
+    @property
+    def buffer(self):
+        # the anonymous map of the whole file, or the StreamBuffer
+        return self._buffer
+
+    @property
+    def streamed(self) -> bool:
+        # whether the file was bigger than the buffer
+        return self._mm is None
+
+
+def _read(stream, n: int) -> bytes:
+    data = b''
+    while len(data) < n:
+        chunk = stream.read(n - len(data))
+        if not chunk:
+            break
+        data += chunk
+    return data
+
+
+def scan_tar(fileobj, func: Callable, args: tuple = (), limit: int = DEFAULT_LIMIT,
+             keep: Tuple[str, ...] = KEEP_SEGMENTS) -> Iterator[Tuple[str, object, Optional[str]]]:
+    # func(elf, *args) on every ELF member of a tar stream, compressed or
+    # not, as it goes by, yielding (member name, result, error) in stream
+    # order like ElfArchive.map(). Nothing is written to disk, and each
+    # member is read through an ElfStream, so at most limit bytes of it
+    # (plus what it keeps) are in memory; the other members are skipped
+    # after their first four bytes.
+    with tarfile.open(fileobj=fileobj, mode='r|*') as tar:
+        for member in tar:
+            if not member.isreg() or member.size < len(batch.ELFMAGIC):
+                continue
+            f = tar.extractfile(member)
+            magic = _read(f, len(batch.ELFMAGIC))
+            if magic != batch.ELFMAGIC:
+                continue
+            try:
+                with ElfStream(f, member.name, member.size, limit, keep, magic) as elf:
+                    result, error = func(elf, *args), None
+            except Exception as e:
+                result, error = None, '{}: {}'.format(type(e).__name__, e)
+            yield member.name, result, error
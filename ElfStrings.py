@@ -0,0 +1,135 @@
+from concurrent.futures import ProcessPoolExecutor
+from ElfValidation import require_buffer
+from functools import lru_cache
+import mmap
+import re
+from typing import Iterator, List, NamedTuple, Tuple
+
+# printable ASCII plus tab, like strings(1)
+PRINTABLE = rb'[\x20-\x7e\t]'
+
+ENCODINGS = {
+    'ascii': PRINTABLE,
+    'utf-16le': PRINTABLE + rb'\x00',
+}
+
+
+class StringMatch(NamedTuple):
+    offset: int      # file offset of the first byte
+    section: str
+    encoding: str
+    value: str
+
+
+def compile_pattern(encoding: str, min_length: int) -> 're.Pattern':
+    # The lookbehind only lets a match begin where a run of printable
+    # characters begins, even when the scan starts in the middle of it. A
+    # chunk therefore owns exactly the strings starting inside of it, and
+    # runs crossing the end of a chunk are read on into the next one.
+    char = ENCODINGS[encoding]
+    return re.compile(b'(?<!' + char + b')(?:' + char + b'){' + str(min_length).encode() + b',}')
+
+
+@lru_cache(maxsize=16)
+def _without_lookbehind(source: bytes) -> 're.Pattern':
+    # a pattern of compile_pattern() minus its lookbehind, the part up to
+    # the first closing parenthesis
+    return re.compile(source[source.index(b')') + 1:])
+
+
+def scan(buf, start: int, end: int, limit: int, pattern: 're.Pattern',
+         owned: bool = True) -> Iterator['re.Match']:
+    # matches starting in [start, end), which may extend up to limit. When
+    # owned, start is where the scanned bytes begin, e.g. the start of a
+    # section, and a run of printable characters going on from the bytes
+    # before it still begins there
+    if owned and start < end:
+        match = _without_lookbehind(pattern.pattern).match(buf, start, limit)
+        if match is not None:
+            yield match
+            start = match.end()
+    for match in pattern.finditer(buf, start, limit):
+        if match.start() >= end:
+            break
+        yield match
+
+
+def _scan_chunk(filename: str, start: int, end: int, limit: int,
+                encoding: str, min_length: int, owned: bool) -> List[Tuple[int, bytes]]:
+    # runs in a worker process, which maps the file on its own
+    pattern = compile_pattern(encoding, min_length)
+    with open(filename, 'rb') as f:
+        mm = mmap.mmap(f.fileno(), 0, flags=mmap.MAP_PRIVATE, prot=mmap.PROT_READ)
+        try:
+            return [(m.start(), m.group()) for m in scan(mm, start, end, limit, pattern, owned)]
+        finally:
+            mm.close()
+
+
+class ElfStrings:
+    # strings(1) over the content of selected sections, scanned in place
+    # in the mmap with a compiled regex. By default the sections scanned
+    # are the ones loaded in memory that have content in the file.
+
+    def __init__(self, elf: 'ELF', min_length: int = 4, encodings: Tuple[str, ...] = ('ascii',),
+                 sections: List[str] = None, flags: str = 'A',
+                 chunk_size: int = 1 << 24, jobs: int = 1):
+        for encoding in encodings:
+            if encoding not in ENCODINGS:
+                raise ValueError('unsupported encoding ' + encoding)
+        self._elf = elf
+        self._min_length = min_length
+        self._encodings = encodings
+        self._names = sections
+        self._flags = flags
+        self._chunk_size = chunk_size
+        self._jobs = jobs
+
+    def get_sections(self) -> List['ElfSection']:
+        selected = []
+        for section in self._elf.sections:
+            if section.type == 'NOBITS' or not section.size:
+                continue
+            if self._names is not None:
+                if section.name in self._names:
+                    selected.append(section)
+            elif all(flag in section.flags for flag in self._flags):
+                selected.append(section)
+        return selected
+
+    def get_chunks(self) -> List[Tuple['ElfSection', str, int, int, int]]:
+        chunks = []
+        limit_file = self._elf.size
+        for section in self.get_sections():
+            limit = min(section.offset + section.size, limit_file)
+            for encoding in self._encodings:
+                for start in range(section.offset, limit, self._chunk_size):
+                    end = min(start + self._chunk_size, limit)
+                    chunks.append((section, encoding, start, end, limit))
+        return chunks
+
+    def __iter__(self) -> Iterator['StringMatch']:
+        chunks = self.get_chunks()
+        if self._jobs > 1 and len(chunks) > 1 and self._elf.has_file:
+            yield from self._scan_parallel(chunks)
+            return
+
+        # the regex runs on the mmap buffer itself, only matches are copied
+        mm = self._elf.mm
+        require_buffer(mm, 'the string scan')
+        for section, encoding, start, end, limit in chunks:
+            pattern = compile_pattern(encoding, self._min_length)
+            for match in scan(mm, start, end, limit, pattern, start == section.offset):
+                yield StringMatch(match.start(), section.name, encoding,
+                                  match.group().decode(encoding))
+
+    def _scan_parallel(self, chunks) -> Iterator['StringMatch']:
+        filename = self._elf.filename
+        with ProcessPoolExecutor(max_workers=self._jobs) as executor:
+            futures = [executor.submit(_scan_chunk, filename, start, end, limit,
+                                       encoding, self._min_length, start == section.offset)
+                       for section, encoding, start, end, limit in chunks]
+            # results are handed out chunk by chunk, in the order of the chunks
+            for (section, encoding, _, _, _), future in zip(chunks, futures):
+                for offset, value in future.result():
+                    yield StringMatch(offset, section.name, encoding, value.decode(encoding))
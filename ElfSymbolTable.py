@@ -0,0 +1,223 @@
+from array import array
+from ElfDemangle import demangle
+import sys
+
+
+class ElfSymbolTable:
+    # Symbols are decoded column-wise straight out of the section bytes:
+    # each field becomes one array, sliced out of a memoryview with a stride
+    # of one entry, so no per-symbol Python object is ever created.
+
+    SHN_UNDEF = 0
+    SHN_LORESERVE = 0xff00
+    SHN_ABS = 0xfff1
+    SHN_COMMON = 0xfff2
+    SHN_XINDEX = 0xffff
+
+    def __init__(self, elfclass: str, section: 'ElfSection', strtab: 'ElfSection',
+                 xindex: 'ElfSection' = None):
+        self._class = elfclass
+        self._section = section
+        self._strtab = strtab
+        self._xindex = xindex   # SYMTAB_SHNDX section holding the large st_shndx values
+
+        self._names = None      # st_name, offsets into the string table
+        self._values = None     # st_value
+        self._sizes = None      # st_size
+        self._info = None       # st_info, binding and type
+        self._other = None      # st_other, visibility
+        self._shndx = None      # st_shndx, index of the related section
+
+    def parse(self):
+        content = self._section.content
+        if self._class == 'ELF32':
+            entsize, word = 16, 'I'
+        else:
+            entsize, word = 24, 'Q'
+        if self._section.entsize not in (0, entsize):
+            raise ValueError('unexpected symbol entry size ' + str(self._section.entsize))
+
+        num = len(content) // entsize
+        mv = memoryview(content)[:num * entsize]
+        u32 = mv.cast('I')
+        u16 = mv.cast('H')
+        u8 = mv.cast('B')
+
+        if self._class == 'ELF32':
+            # name, value, size, info, other, shndx
+            self._names = ElfSymbolTable._column('I', u32[0::4])
+            self._values = ElfSymbolTable._column('I', u32[1::4])
+            self._sizes = ElfSymbolTable._column('I', u32[2::4])
+            self._info = ElfSymbolTable._column('B', u8[12::16])
+            self._other = ElfSymbolTable._column('B', u8[13::16])
+            self._shndx = ElfSymbolTable._column('H', u16[7::8])
+        else:
+            # name, info, other, shndx, value, size
+            u64 = mv.cast(word)
+            self._names = ElfSymbolTable._column('I', u32[0::6])
+            self._info = ElfSymbolTable._column('B', u8[4::24])
+            self._other = ElfSymbolTable._column('B', u8[5::24])
+            self._shndx = ElfSymbolTable._column('H', u16[3::12])
+            self._values = ElfSymbolTable._column('Q', u64[1::3])
+            self._sizes = ElfSymbolTable._column('Q', u64[2::3])
+
+        if self._xindex is not None:
+            self.parse_xindex()
+
+    def parse_xindex(self):
+        # Section indexes beyond SHN_LORESERVE do not fit in st_shndx, which
+        # is then SHN_XINDEX and the index is in the parallel SYMTAB_SHNDX
+        # table. The column is widened to 32 bits for those.
+        escaped = [i for i, ndx in enumerate(self._shndx) if ndx == ElfSymbolTable.SHN_XINDEX]
+        if not escaped:
+            return
+        content = self._xindex.content
+        num = min(len(content) // 4, len(self._shndx))
+        xindex = ElfSymbolTable._column('I', memoryview(content)[:num * 4].cast('I'))
+        self._shndx = array('I', self._shndx)
+        for i in escaped:
+            if i < num:
+                self._shndx[i] = xindex[i]
+
+    @staticmethod
+    def _column(typecode: str, view: 'memoryview') -> 'array':
+        column = array(typecode)
+        column.frombytes(view.tobytes())
+        if sys.byteorder != 'little':
+            column.byteswap()
+        return column
+
+    def __len__(self):
+        return len(self._names)
+
+    def __getitem__(self, i: int) -> 'ElfSymbol':
+        if not -len(self) <= i < len(self):
+            raise IndexError('symbol index out of range')
+        return ElfSymbol(self, i % len(self))
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield ElfSymbol(self, i)
+
+    def __repr__(self):
+        return '<SYMBOL TABLE ' + self._section.name + '>'
+
+    def get_name(self, i: int) -> str:
+        names = self._strtab.content
+        start = self._names[i]
+        end = names.find(b'\x00', start)
+        if end < 0:
+            end = len(names)
+        return names[start:end].decode('utf-8', 'replace')
+
+    def get_demangled_name(self, i: int) -> str:
+        return demangle(self.get_name(i))
+
+    def get_type(self, i: int) -> str:
+        return {
+            0: 'NOTYPE',
+            1: 'OBJECT',
+            2: 'FUNC',
+            3: 'SECTION',
+            4: 'FILE',
+            5: 'COMMON',
+            6: 'TLS',
+            10: 'GNU_IFUNC',
+        }.get(self._info[i] & 0xf, 'Other')
+
+    def get_bind(self, i: int) -> str:
+        return {
+            0: 'LOCAL',
+            1: 'GLOBAL',
+            2: 'WEAK',
+            10: 'GNU_UNIQUE',
+        }.get(self._info[i] >> 4, 'Other')
+
+    def get_visibility(self, i: int) -> str:
+        return {
+            0: 'DEFAULT',
+            1: 'INTERNAL',
+            2: 'HIDDEN',
+            3: 'PROTECTED',
+        }[self._other[i] & 0x3]
+
+    @property
+    def section(self) -> 'ElfSection':
+        return self._section
+
+    @property
+    def strtab(self) -> 'ElfSection':
+        return self._strtab
+
+    @property
+    def names(self) -> 'array':
+        return self._names
+
+    @property
+    def values(self) -> 'array':
+        return self._values
+
+    @property
+    def sizes(self) -> 'array':
+        return self._sizes
+
+    @property
+    def info(self) -> 'array':
+        return self._info
+
+    @property
+    def other(self) -> 'array':
+        return self._other
+
+    @property
+    def shndx(self) -> 'array':
+        return self._shndx
+
+
+class ElfSymbol:
+    # A view of a single entry of an ElfSymbolTable, for convenience when
+    # only a handful of symbols are looked at.
+
+    def __init__(self, symtab: 'ElfSymbolTable', index: int):
+        self._symtab = symtab
+        self._index = index
+
+    def __str__(self):
+        return '0x{:016x} {:>8d} {:<8s} {:<8s} {}'.format(
+            self.value, self.size, self.type, self.bind, self.name)
+
+    @property
+    def index(self) -> int:
+        return self._index
+
+    @property
+    def name(self) -> str:
+        return self._symtab.get_name(self._index)
+
+    @property
+    def demangled_name(self) -> str:
+        return self._symtab.get_demangled_name(self._index)
+
+    @property
+    def value(self) -> int:
+        return self._symtab.values[self._index]
+
+    @property
+    def size(self) -> int:
+        return self._symtab.sizes[self._index]
+
+    @property
+    def type(self) -> str:
+        return self._symtab.get_type(self._index)
+
+    @property
+    def bind(self) -> str:
+        return self._symtab.get_bind(self._index)
+
+    @property
+    def visibility(self) -> str:
+        return self._symtab.get_visibility(self._index)
+
+    @property
+    def shndx(self) -> int:
+        return self._symtab.shndx[self._index]
@@ -0,0 +1,177 @@
+from array import array
+from bisect import bisect_right
+from ELF import ELF
+from ElfFunctions import ElfFunctions
+import batch
+import mmap
+import os
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+
+class Mapping(NamedTuple):
+    # one line of /proc/PID/maps
+    start: int
+    end: int
+    perms: str
+    offset: int     # in the file, of the first byte of the mapping
+    inode: int
+    path: str       # '' for anonymous memory, '[stack]', '[vdso]' and the like
+
+
+class Frame(NamedTuple):
+    address: int
+    file: Optional[str]     # the path of the mapping, None when nothing is mapped there
+    vaddr: Optional[int]    # the address in the file's own address space
+    name: Optional[str]     # of the function, '' when it has no symbol, None when there is none
+    offset: int             # from the start of the function
+
+
+class FileIndex(NamedTuple):
+    # what symbolizing needs of one file
+    loads: List[Tuple[int, int, int]]     # (p_offset, p_vaddr, p_filesz) of the LOAD segments
+    starts: 'array'                       # of the functions, sorted; arrays to
+    ends: 'array'                         # pass between processes, lists once kept
+    names: List[str]
+
+
+def parse_maps(text: str) -> List['Mapping']:
+    # start-end perms offset dev inode path, the path possibly with spaces
+    mappings = []
+    for line in text.splitlines():
+        fields = line.split(None, 5)
+        if len(fields) < 5:
+            continue
+        start, _, end = fields[0].partition('-')
+        path = fields[5] if len(fields) > 5 else ''
+        mappings.append(Mapping(int(start, 16), int(end, 16), fields[1], int(fields[2], 16),
+                                int(fields[4]), path))
+    return mappings
+
+
+def read_maps(pid: int) -> List['Mapping']:
+    with open('/proc/{}/maps'.format(pid)) as f:
+        return parse_maps(f.read())
+
+
+def index_file(filename: str) -> 'FileIndex':
+    with ELF(filename) as elf:
+        loads = [(segment.get_offset(), segment.get_vaddr(), segment.get_filesz())
+                 for segment in elf.segments if segment.get_type() == 'LOAD']
+        functions = ElfFunctions(elf).get_functions()
+        return FileIndex(loads, array('Q', (function.start for function in functions)),
+                         array('Q', (function.end for function in functions)),
+                         [function.name for function in functions])
+
+
+class ElfSymbolizer:
+    # Raw addresses of running processes to the functions holding them.
+    # Each address goes to the mapping of /proc/PID/maps that holds it,
+    # and from there to the file behind the mapping and to the address in
+    # that file: the mapping's file offset falls in one of the file's LOAD
+    # segments, whose p_vaddr - p_offset, added to the mapping's
+    # start - offset, is the load bias. The addresses of a batch are
+    # grouped by file, each file is indexed once (the sorted function
+    # starts and ends of ElfFunctions) and the index kept for later
+    # batches, so a lookup is one bisect.
+    #
+    # Files are opened through /proc/PID/root, which finds them in the
+    # process's own mount namespace, and checked against the inode of the
+    # mapping, so a library replaced since it was loaded is not used.
+
+    def __init__(self, jobs: int = 1):
+        self._jobs = jobs           # worker processes indexing new files
+        self._indexes = {}          # (path, inode) -> FileIndex, None when it failed
+        self._errors = {}           # path -> why it could not be indexed
+
+    def _open_path(self, pid: Optional[int], mapping: 'Mapping') -> Optional[str]:
+        # the file of the mapping as seen from here, if it is still there
+        if not mapping.path.startswith('/') or mapping.path.endswith(' (deleted)'):
+            return None
+        candidates = [mapping.path]
+        if pid is not None:
+            candidates.insert(0, '/proc/{}/root{}'.format(pid, mapping.path))
+        for filename in candidates:
+            try:
+                if os.stat(filename).st_ino == mapping.inode:
+                    return filename
+            except OSError:
+                continue
+        return None
+
+    def _index(self, files: Dict[Tuple[str, int], str]):
+        # index the files not seen yet, given by (path, inode) -> file name
+        missing = [key for key in files if key not in self._indexes]
+        results = batch.run(index_file, [files[key] for key in missing], (), self._jobs)
+        for key, (_, index, error) in zip(missing, results):
+            if index is not None:
+                # bisect is faster on lists, whose items need no boxing
+                index = index._replace(starts=index.starts.tolist(), ends=index.ends.tolist())
+            self._indexes[key] = index
+            if error:
+                self._errors[key[0]] = error
+
+    def symbolize(self, pid: int, addresses: Iterable[int]) -> List['Frame']:
+        return self.symbolize_maps(read_maps(pid), addresses, pid)
+
+    def symbolize_maps(self, mappings: List['Mapping'], addresses: Iterable[int],
+                       pid: int = None) -> List['Frame']:
+        # one frame per address, in the order given
+        addresses = list(addresses)
+        mappings = sorted(mappings)
+        starts = [mapping.start for mapping in mappings]
+
+        # the addresses by mapping, as positions in the list
+        by_mapping = {}
+        for i, address in enumerate(addresses):
+            j = bisect_right(starts, address) - 1
+            if j >= 0 and address < mappings[j].end:
+                by_mapping.setdefault(j, []).append(i)
+
+        files = {}
+        for j in by_mapping:
+            mapping = mappings[j]
+            key = (mapping.path, mapping.inode)
+            if key not in self._indexes and key not in files:
+                filename = self._open_path(pid, mapping)
+                if filename is not None:
+                    files[key] = filename
+        self._index(files)
+
+        frames = [None] * len(addresses)
+        for j, positions in by_mapping.items():
+            mapping = mappings[j]
+            index = self._indexes.get((mapping.path, mapping.inode))
+            bias = self._get_bias(mapping, index) if index is not None else None
+            if bias is None:
+                for i in positions:
+                    frames[i] = Frame(addresses[i], mapping.path, None, None, 0)
+                continue
+            fstarts, fends, names = index.starts, index.ends, index.names
+            for i in positions:
+                address = addresses[i]
+                vaddr = address - bias
+                k = bisect_right(fstarts, vaddr) - 1
+                if k >= 0 and vaddr < fends[k]:
+                    frames[i] = Frame(address, mapping.path, vaddr, names[k], vaddr - fstarts[k])
+                else:
+                    frames[i] = Frame(address, mapping.path, vaddr, None, 0)
+        for i, frame in enumerate(frames):
+            if frame is None:
+                frames[i] = Frame(addresses[i], None, None, None, 0)
+        return frames
+
+    @staticmethod
+    def _get_bias(mapping: 'Mapping', index: 'FileIndex') -> Optional[int]:
+        # the LOAD segment mapped there; its file offset is only aligned up
+        # to the page the mapping starts on
+        page = mmap.PAGESIZE
+        for offset, vaddr, filesz in index.loads:
+            if offset & -page <= mapping.offset < offset + filesz:
+                return mapping.start - mapping.offset + offset - vaddr
+        return None
+
+    def get_errors(self) -> Dict[str, str]:
+        return self._errors
+
+    def __len__(self):
+        return len(self._indexes)
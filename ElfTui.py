@@ -0,0 +1,235 @@
+from bisect import bisect_left, bisect_right
+import curses
+from typing import List, Optional, Tuple
+from util import BYTES_PER_LINE, HexdumpTiles
+
+
+class TuiDocument:
+    # Everything the viewer can show, as one virtual list of lines: the ELF
+    # header, a line per segment, a line per section and the hexdump of the
+    # whole file. Only the lines asked for are ever formatted, the section
+    # headers are decoded as they scroll into view and the hexdump renders
+    # tiles of lines straight from the mmap, so the cost of a screen does
+    # not depend on the size of the file. The indexes behind the jumps are
+    # sorted lists built on first use and searched with bisect.
+
+    def __init__(self, elf: 'ELF'):
+        self._elf = elf
+        self._header = str(elf.header).rstrip('\n').split('\n')
+        self._segments = elf.segments
+        self._num_sections = elf.sections.num
+        self._hexdump = HexdumpTiles(elf.mm, 0, elf.size)
+
+        # title and number of lines of each block, in display order
+        self._blocks = [
+            ('ELF header', len(self._header)),
+            ('Segments', len(self._segments)),
+            ('Sections', max(self._num_sections - 1, 0)),    # all but the NULL one
+            ('Hexdump', len(self._hexdump)),
+        ]
+        self._starts = []
+        line = 0
+        for _, count in self._blocks:
+            self._starts.append(line)
+            line += count
+        self._num_lines = line
+
+        self._names = None      # (name, section index), sorted
+        self._mapped = None     # (address, size, offset) of the file's memory image, sorted
+        self._ranges = None     # layout ranges and their start offsets
+
+    def __len__(self):
+        return self._num_lines
+
+    def get_block(self, line: int) -> Tuple[str, int]:
+        # title of the block holding the line and the line's position in it
+        i = bisect_right(self._starts, line) - 1
+        return self._blocks[i][0], line - self._starts[i]
+
+    def get_line(self, line: int) -> str:
+        block, i = self.get_block(line)
+        if block == 'ELF header':
+            return self._header[i]
+        if block == 'Segments':
+            segment = self._segments[i]
+            return '{:02d} {:<14s} offset 0x{:08x} vaddr 0x{:08x} filesz {:>10d} memsz {:>10d} {}'.format(
+                segment.index, segment.get_type(), segment.get_offset(), segment.get_vaddr(),
+                segment.get_filesz(), segment.get_memsz(), segment.get_flags())
+        if block == 'Sections':
+            section = self._elf.sections[i + 1]
+            return '[{:>5d}] {:<24s} {:<14s} addr 0x{:08x} offset 0x{:08x} size {:>10d} {}'.format(
+                section.index, section.name, section.type, section.address, section.offset,
+                section.size, section.flags)
+        return self._hexdump.get_line(i)
+
+    def get_offset(self, line: int) -> Optional[int]:
+        # file offset shown on a hexdump line
+        block, i = self.get_block(line)
+        return i * BYTES_PER_LINE if block == 'Hexdump' else None
+
+    def line_of_block(self, title: str) -> int:
+        for (name, _), start in zip(self._blocks, self._starts):
+            if name == title:
+                return start
+        raise KeyError(title)
+
+    def line_of_offset(self, offset: int) -> int:
+        if not 0 <= offset < self._elf.size:
+            raise ValueError('offset 0x{:x} is not in the file'.format(offset))
+        return self.line_of_block('Hexdump') + self._hexdump.line_of_offset(offset)
+
+    def line_of_address(self, address: int) -> int:
+        if self._mapped is None:
+            # the LOAD segments, or for objects without any the
+            # allocated sections with content
+            mapped = [(s.get_vaddr(), s.get_filesz(), s.get_offset())
+                      for s in self._segments if s.get_type() == 'LOAD']
+            if not mapped:
+                mapped = [(s.address, s.size, s.offset) for s in self._elf.sections
+                          if 'A' in s.flags and s.type != 'NOBITS' and s.size]
+            mapped.sort()
+            self._mapped = mapped, [address for address, _, _ in mapped]
+        mapped, addresses = self._mapped
+        i = bisect_right(addresses, address) - 1
+        if i >= 0:
+            start, size, offset = mapped[i]
+            if address < start + size:
+                return self.line_of_offset(offset + address - start)
+        raise ValueError('address 0x{:x} is not in the file'.format(address))
+
+    def find_sections(self, prefix: str) -> List[int]:
+        # indexes of the sections whose name starts with the prefix, by name
+        if self._names is None:
+            self._names = sorted((section.name, section.index) for section in self._elf.sections)
+        low = bisect_left(self._names, (prefix,))
+        high = bisect_left(self._names, (prefix + '\U0010ffff',))
+        return [index for _, index in self._names[low:high]]
+
+    def line_of_section(self, index: int) -> int:
+        # its content in the hexdump, or its entry when it has none in the file
+        section = self._elf.sections[index]
+        if section.type != 'NOBITS' and section.size and section.offset < self._elf.size:
+            return self.line_of_offset(section.offset)
+        return self.line_of_block('Sections') + index - 1
+
+    def get_component(self, offset: int) -> str:
+        # name of the innermost layout range holding the offset
+        if self._ranges is None:
+            ranges = self._elf.get_layout().ranges
+            self._ranges = ranges, [r.start for r in ranges]
+        ranges, starts = self._ranges
+        i = bisect_right(starts, offset) - 1
+        while i >= 0 and not ranges[i].start <= offset < ranges[i].end:
+            i -= 1
+        return ranges[i].name if i >= 0 else ''
+
+
+class ElfTui:
+    # The curses front end of TuiDocument: draws the window of lines from
+    # the top one down, and moves that window with the keys.
+    #
+    #   up/down, PgUp/PgDn, Home/End   scroll
+    #   h s x                          go to the header, sections, hexdump
+    #   o                              go to a hex file offset
+    #   a                              go to a hex virtual address
+    #   /                              go to the section named by a prefix
+    #   n                              next section matching the prefix
+    #   q                              quit
+
+    def __init__(self, elf: 'ELF'):
+        self._elf = elf
+        self._document = TuiDocument(elf)
+        self._top = 0
+        self._matches = []
+        self._match = 0
+        self._message = ''
+
+    def run(self):
+        curses.wrapper(self._loop)
+
+    def _loop(self, screen):
+        curses.curs_set(0)
+        while True:
+            height, width = screen.getmaxyx()
+            self._draw(screen, height, width)
+            key = screen.getch()
+            if key == ord('q'):
+                return
+            self._message = ''
+            self._handle(screen, key, height - 1)
+
+    def _draw(self, screen, height: int, width: int):
+        screen.erase()
+        rows = height - 1
+        last = min(self._top + rows, len(self._document))
+        for y, line in enumerate(range(self._top, last)):
+            screen.addnstr(y, 0, self._document.get_line(line), width - 1)
+
+        block, _ = self._document.get_block(self._top)
+        status = '{} | line {}/{}'.format(block, self._top + 1, len(self._document))
+        offset = self._document.get_offset(self._top)
+        if offset is not None:
+            status += ' | 0x{:x} {}'.format(offset, self._document.get_component(offset))
+        if self._message:
+            status += ' | ' + self._message
+        screen.addnstr(height - 1, 0, status.ljust(width - 1), width - 1, curses.A_REVERSE)
+        screen.refresh()
+
+    def _handle(self, screen, key: int, rows: int):
+        moves = {
+            curses.KEY_UP: -1, ord('k'): -1,
+            curses.KEY_DOWN: 1, ord('j'): 1,
+            curses.KEY_PPAGE: -rows, curses.KEY_NPAGE: rows, ord(' '): rows,
+        }
+        if key in moves:
+            self._go(self._top + moves[key], rows)
+        elif key == curses.KEY_HOME:
+            self._go(0, rows)
+        elif key == curses.KEY_END:
+            self._go(len(self._document), rows)
+        elif key in (ord('h'), ord('s'), ord('x')):
+            title = {ord('h'): 'ELF header', ord('s'): 'Sections', ord('x'): 'Hexdump'}[key]
+            self._go(self._document.line_of_block(title), rows)
+        elif key in (ord('o'), ord('a')):
+            value = self._prompt(screen, 'offset: 0x' if key == ord('o') else 'address: 0x')
+            try:
+                number = int(value, 16)
+                if key == ord('o'):
+                    self._go(self._document.line_of_offset(number), rows)
+                else:
+                    self._go(self._document.line_of_address(number), rows)
+            except ValueError as e:
+                self._message = str(e) if value else ''
+        elif key == ord('/'):
+            prefix = self._prompt(screen, 'section: ')
+            self._matches = self._document.find_sections(prefix) if prefix else []
+            self._match = -1
+            self._next_match(rows)
+        elif key == ord('n'):
+            self._next_match(rows)
+
+    def _next_match(self, rows: int):
+        if not self._matches:
+            self._message = 'no section found'
+            return
+        self._match = (self._match + 1) % len(self._matches)
+        index = self._matches[self._match]
+        self._go(self._document.line_of_section(index), rows)
+        self._message = '{} ({}/{})'.format(self._elf.sections[index].name, self._match + 1, len(self._matches))
+
+    def _go(self, line: int, rows: int):
+        self._top = max(0, min(line, len(self._document) - rows))
+
+    def _prompt(self, screen, text: str) -> str:
+        height, width = screen.getmaxyx()
+        screen.move(height - 1, 0)
+        screen.clrtoeol()
+        screen.addnstr(height - 1, 0, text, width - 1)
+        curses.echo()
+        curses.curs_set(1)
+        try:
+            value = screen.getstr(height - 1, len(text), 64)
+        finally:
+            curses.noecho()
+            curses.curs_set(0)
+        return value.decode('utf-8', 'replace').strip()
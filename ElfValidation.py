@@ -0,0 +1,79 @@
+from typing import List, NamedTuple
+
+
+class ElfFormatError(ValueError):
+    # the file is too broken to be parsed at all, e.g. a truncated header
+    pass
+
+
+class StreamError(Exception):
+    # bytes asked for that a stream has gone past, or that would not fit in
+    # its buffer; not a ValueError, which the parsers take for broken data
+    # and skip
+    pass
+
+
+def require_buffer(mm, what: str):
+    # the scanners that run regular expressions or struct over the whole
+    # file need it in memory, which a file streamed through a buffer
+    # smaller than it is not
+    try:
+        memoryview(mm).release()
+    except TypeError:
+        raise StreamError('{} needs the whole file in memory'.format(what)) from None
+
+
+class ElfIssue(NamedTuple):
+    component: str   # 'header', 'segment table', 'section 12', ...
+    message: str
+    offset: int      # file offset the problem was found at, if any
+
+    def __str__(self):
+        where = ' at 0x{:x}'.format(self.offset) if self.offset is not None else ''
+        return '{}: {}{}'.format(self.component, self.message, where)
+
+
+class ElfIssues:
+    # Problems found while parsing a file, collected per component instead
+    # of aborting the whole parse. In strict mode the first one is raised.
+
+    def __init__(self, strict: bool = False):
+        self._strict = strict
+        self._issues = []
+
+    def add(self, component: str, message: str, offset: int = None):
+        issue = ElfIssue(component, message, offset)
+        if self._strict:
+            raise ElfFormatError(str(issue))
+        self._issues.append(issue)
+
+    def check_range(self, component: str, offset: int, size: int, filesize: int) -> bool:
+        # whether [offset, offset + size) lies within the file
+        if offset > filesize or size > filesize - offset:
+            self.add(component, 'range 0x{:x}+0x{:x} exceeds the file size 0x{:x}'.format(
+                offset, size, filesize), offset)
+            return False
+        return True
+
+    def check_table(self, component: str, offset: int, num: int, entsize: int,
+                    minentsize: int, filesize: int) -> bool:
+        # whether a table of num entries can be read without leaving the file
+        if not num:
+            return True
+        if entsize < minentsize:
+            self.add(component, 'entry size {} is below {}'.format(entsize, minentsize), offset)
+            return False
+        return self.check_range(component, offset, num * entsize, filesize)
+
+    def __iter__(self):
+        return iter(self._issues)
+
+    def __len__(self):
+        return len(self._issues)
+
+    def __bool__(self):
+        return bool(self._issues)
+
+    @property
+    def issues(self) -> List['ElfIssue']:
+        return self._issues
@@ -0,0 +1,310 @@
+from array import array
+from ELF import ELF
+import batch
+import os
+import re
+import struct
+import sys
+from typing import Dict, Iterable, Iterator, List, NamedTuple, Optional, Tuple
+
+VER_FLG_BASE = 0x1      # the definition naming the file itself
+VER_FLG_WEAK = 0x2
+VERSYM_HIDDEN = 0x8000  # not to be bound to by unversioned references
+VERSYM_LOCAL = 0
+VERSYM_GLOBAL = 1
+
+DT_NULL = 0
+DT_NEEDED = 1
+DT_SONAME = 14
+
+VERDEF = struct.Struct('<HHHHIII')      # version, flags, ndx, cnt, hash, aux, next
+VERDAUX = struct.Struct('<II')          # name, next
+VERNEED = struct.Struct('<HHIII')       # version, cnt, file, aux, next
+VERNAUX = struct.Struct('<IHHII')       # hash, flags, other, name, next
+
+# 'GLIBC_2.2.5' to the family and the numbers
+VERSION_NAME = re.compile(r'(.+?)_(\d+(?:\.\d+)*)$')
+
+
+class VersionDefinition(NamedTuple):
+    index: int
+    name: str
+    flags: int
+    parents: Tuple[str, ...]
+
+
+class VersionRequirement(NamedTuple):
+    file: str       # the library expected to define it, as in DT_NEEDED
+    name: str
+    index: int
+    flags: int
+
+
+def parse_version(name: str) -> Optional[Tuple[str, Tuple[int, ...]]]:
+    # ('GLIBC', (2, 2, 5)) for 'GLIBC_2.2.5', None for unnumbered versions
+    # such as GLIBC_PRIVATE
+    match = VERSION_NAME.match(name)
+    if match is None:
+        return None
+    return match.group(1), tuple(int(n) for n in match.group(2).split('.'))
+
+
+def max_versions(names: Iterable[str]) -> Dict[str, str]:
+    # the highest version of each family among the names
+    highest = {}
+    for name in names:
+        parsed = parse_version(name)
+        if parsed is None:
+            continue
+        family, numbers = parsed
+        if family not in highest or numbers > highest[family][0]:
+            highest[family] = (numbers, name)
+    return {family: name for family, (_, name) in highest.items()}
+
+
+def read_string(strtab: bytes, offset: int) -> str:
+    if offset >= len(strtab):
+        raise ValueError('string offset 0x{:x} out of the string table'.format(offset))
+    end = strtab.find(b'\x00', offset)
+    if end < 0:
+        end = len(strtab)
+    return strtab[offset:end].decode('utf-8', 'replace')
+
+
+class ElfVersions:
+    # Symbol versioning of a dynamic object: the versions it defines
+    # (GNU_VERDEF), the ones it needs from each library (GNU_VERNEED) and
+    # the version index of each dynamic symbol (GNU_VERSYM), with the
+    # DT_SONAME and DT_NEEDED entries that go with them. Each section is
+    # decoded on first use; the version index column is a single array.
+
+    def __init__(self, elf: 'ELF'):
+        self._elf = elf
+        self._sections = {}
+        for section in elf.sections:
+            if section.type in ('GNU_VERSYM', 'GNU_VERDEF', 'GNU_VERNEED', 'DYNAMIC'):
+                self._sections.setdefault(section.type, section)
+
+        self._definitions = None
+        self._requirements = None
+        self._versym = None
+        self._names = None      # version index -> name
+        self._dynamic = None
+
+    def _strtab(self, section: 'ElfSection') -> bytes:
+        strtab = self._elf.get_section_by_index(section.link)
+        if strtab is None:
+            raise ValueError('{}: no string table at index {}'.format(section.name, section.link))
+        return strtab.content
+
+    def get_definitions(self) -> List['VersionDefinition']:
+        if self._definitions is None:
+            self._definitions = []
+            section = self._sections.get('GNU_VERDEF')
+            if section is not None:
+                self._definitions = self._parse_definitions(section)
+        return self._definitions
+
+    def _parse_definitions(self, section: 'ElfSection') -> List['VersionDefinition']:
+        content, strtab = section.content, self._strtab(section)
+        definitions = []
+        offset = 0
+        # sh_info is the number of entries, which also bounds a looping chain
+        for _ in range(section.info):
+            if offset + VERDEF.size > len(content):
+                raise ValueError('{}: entry at 0x{:x} out of the section'.format(section.name, offset))
+            version, flags, index, count, _, aux, following = VERDEF.unpack_from(content, offset)
+            names = []
+            at = offset + aux
+            for _ in range(count):
+                if at + VERDAUX.size > len(content):
+                    raise ValueError('{}: name at 0x{:x} out of the section'.format(section.name, at))
+                name, next_aux = VERDAUX.unpack_from(content, at)
+                names.append(read_string(strtab, name))
+                if not next_aux:
+                    break
+                at += next_aux
+            if names:
+                definitions.append(VersionDefinition(index, names[0], flags, tuple(names[1:])))
+            if not following:
+                break
+            offset += following
+        return definitions
+
+    def get_requirements(self) -> List['VersionRequirement']:
+        if self._requirements is None:
+            self._requirements = []
+            section = self._sections.get('GNU_VERNEED')
+            if section is not None:
+                self._requirements = self._parse_requirements(section)
+        return self._requirements
+
+    def _parse_requirements(self, section: 'ElfSection') -> List['VersionRequirement']:
+        content, strtab = section.content, self._strtab(section)
+        requirements = []
+        offset = 0
+        for _ in range(section.info):
+            if offset + VERNEED.size > len(content):
+                raise ValueError('{}: entry at 0x{:x} out of the section'.format(section.name, offset))
+            version, count, file, aux, following = VERNEED.unpack_from(content, offset)
+            library = read_string(strtab, file)
+            at = offset + aux
+            for _ in range(count):
+                if at + VERNAUX.size > len(content):
+                    raise ValueError('{}: version at 0x{:x} out of the section'.format(section.name, at))
+                _, flags, index, name, next_aux = VERNAUX.unpack_from(content, at)
+                requirements.append(VersionRequirement(library, read_string(strtab, name), index, flags))
+                if not next_aux:
+                    break
+                at += next_aux
+            if not following:
+                break
+            offset += following
+        return requirements
+
+    def get_versym(self) -> 'array':
+        # the version index of each dynamic symbol, hidden bit included
+        if self._versym is None:
+            self._versym = array('H')
+            section = self._sections.get('GNU_VERSYM')
+            if section is not None:
+                content = section.content
+                self._versym.frombytes(content[:len(content) & ~1])
+                if sys.byteorder != 'little':
+                    self._versym.byteswap()
+        return self._versym
+
+    def get_version_name(self, index: int) -> Optional[str]:
+        # name of a version index, None for the local and global ones
+        if self._names is None:
+            names = {definition.index: definition.name for definition in self.get_definitions()}
+            names.update((requirement.index, requirement.name) for requirement in self.get_requirements())
+            self._names = names
+        return self._names.get(index & ~VERSYM_HIDDEN)
+
+    def get_symbol_version(self, i: int) -> Optional[str]:
+        # version of the dynamic symbol at index i
+        versym = self.get_versym()
+        if i >= len(versym) or versym[i] & ~VERSYM_HIDDEN in (VERSYM_LOCAL, VERSYM_GLOBAL):
+            return None
+        return self.get_version_name(versym[i])
+
+    def is_hidden(self, i: int) -> bool:
+        versym = self.get_versym()
+        return i < len(versym) and bool(versym[i] & VERSYM_HIDDEN)
+
+    def get_dynamic(self) -> List[Tuple[int, object]]:
+        # (tag, value) of the DYNAMIC entries up to DT_NULL, with the values
+        # of DT_NEEDED and DT_SONAME as strings
+        if self._dynamic is None:
+            self._dynamic = []
+            section = self._sections.get('DYNAMIC')
+            if section is not None:
+                self._dynamic = self._parse_dynamic(section)
+        return self._dynamic
+
+    def _parse_dynamic(self, section: 'ElfSection') -> List[Tuple[int, object]]:
+        fmt = struct.Struct('<qQ' if self._elf.header.get_class() == 'ELF64' else '<iI')
+        content = section.content
+        strtab = None
+        entries = []
+        for tag, value in fmt.iter_unpack(content[:len(content) - len(content) % fmt.size]):
+            if tag == DT_NULL:
+                break
+            if tag in (DT_NEEDED, DT_SONAME):
+                if strtab is None:
+                    strtab = self._strtab(section)
+                value = read_string(strtab, value)
+            entries.append((tag, value))
+        return entries
+
+    def get_soname(self) -> Optional[str]:
+        for tag, value in self.get_dynamic():
+            if tag == DT_SONAME:
+                return value
+        return None
+
+    def get_needed(self) -> List[str]:
+        return [value for tag, value in self.get_dynamic() if tag == DT_NEEDED]
+
+    def get_max_required(self) -> Dict[str, str]:
+        # highest version of each family needed, e.g. {'GLIBC': 'GLIBC_2.34'}
+        return max_versions(requirement.name for requirement in self.get_requirements())
+
+
+class VersionInfo(NamedTuple):
+    # what the sysroot check needs to know of one file
+    soname: Optional[str]
+    definitions: Tuple[str, ...]
+    requirements: Tuple[Tuple[str, str, int], ...]    # (library, version, flags)
+
+
+class AbiReport(NamedTuple):
+    filename: str
+    max_required: Dict[str, str]            # family -> highest version needed
+    missing: List[Tuple[str, str]]          # (library, version) the library in the sysroot lacks
+    unresolved: List[str]                   # libraries with required versions not in the sysroot
+
+
+def _read_versions(filename: str) -> Optional['VersionInfo']:
+    with ELF(filename) as elf:
+        versions = ElfVersions(elf)
+        if not versions.get_definitions() and not versions.get_requirements():
+            return None
+        return VersionInfo(versions.get_soname(),
+                           tuple(definition.name for definition in versions.get_definitions()
+                                 if not definition.flags & VER_FLG_BASE),
+                           tuple((r.file, r.name, r.flags) for r in versions.get_requirements()))
+
+
+class VersionCache:
+    # The version definitions of the libraries of a sysroot, by soname and
+    # by file name, each library read once however many binaries need it.
+
+    def __init__(self):
+        self._definitions = {}      # soname or file name -> set of version names
+
+    def add(self, filename: str, info: 'VersionInfo'):
+        if info.definitions:
+            names = set(info.definitions)
+            for key in (info.soname, os.path.basename(filename)):
+                if key:
+                    self._definitions.setdefault(key, set()).update(names)
+
+    def get(self, library: str) -> Optional[set]:
+        return self._definitions.get(library)
+
+    def __len__(self):
+        return len(self._definitions)
+
+
+def check_sysroot(paths: Iterable[str], jobs: int = None,
+                  cache: 'VersionCache' = None) -> Iterator[Tuple[str, Optional['AbiReport'], Optional[str]]]:
+    # For every ELF file below the paths, the highest version of each
+    # family it requires, and the required versions that the library of
+    # that name in the sysroot does not define. The files are read once,
+    # in a pool of worker processes, which return only their version
+    # tables; the libraries' definitions then go into the cache, and the
+    # requirements are checked against it. Yields (filename, report, error)
+    # in file order, no report for files without symbol versioning.
+    cache = cache if cache is not None else VersionCache()
+    results = list(batch.run(_read_versions, batch.find_elf_files(paths), (), jobs))
+    for filename, info, error in results:
+        if info is not None:
+            cache.add(filename, info)
+
+    for filename, info, error in results:
+        if info is None:
+            yield filename, None, error
+            continue
+        missing, unresolved = [], []
+        for library, version, flags in info.requirements:
+            defined = cache.get(library)
+            if defined is None:
+                if library not in unresolved:
+                    unresolved.append(library)
+            elif version not in defined and not flags & VER_FLG_WEAK:
+                missing.append((library, version))
+        report = AbiReport(filename, max_versions(version for _, version, _ in info.requirements),
+                           missing, unresolved)
+        yield filename, report, None
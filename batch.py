@@ -0,0 +1,64 @@
+from concurrent.futures import ProcessPoolExecutor
+import os
+from typing import Callable, Iterable, Iterator, Tuple
+
+ELFMAGIC = b'\x7fELF'
+
+
+def is_elf(filename: str) -> bool:
+    try:
+        with open(filename, 'rb') as f:
+            return f.read(4) == ELFMAGIC
+    except OSError:
+        return False
+
+
+def find_elf_files(paths: Iterable[str]) -> Iterator[str]:
+    # regular files given directly or found below the given directories,
+    # without following symlinks, whose first bytes are the ELF magic
+    for path in paths:
+        if not os.path.isdir(path):
+            if is_elf(path):
+                yield path
+            continue
+        for root, _, files in os.walk(path):
+            for name in files:
+                filename = os.path.join(root, name)
+                if not os.path.islink(filename) and os.path.isfile(filename) and is_elf(filename):
+                    yield filename
+
+
+def _call(func: Callable, filename: str, args: tuple) -> Tuple[str, object, str]:
+    try:
+        return filename, func(filename, *args), None
+    except Exception as e:
+        return filename, None, '{}: {}'.format(type(e).__name__, e)
+
+
+def run(func: Callable, filenames: Iterable[str], args: tuple = (),
+        jobs: int = None, chunksize: int = 16) -> Iterator[Tuple[str, object, str]]:
+    # Call func(filename, *args) for every file, in a pool of worker
+    # processes unless jobs is 1, and yield (filename, result, error) in
+    # the order of the files. func has to be a module level function so
+    # that it can be pickled, and errors are reported rather than raised
+    # so that one broken file does not stop the batch.
+    filenames = list(filenames)
+    if jobs == 1 or len(filenames) <= 1:
+        for filename in filenames:
+            yield _call(func, filename, args)
+        return
+
+    with ProcessPoolExecutor(max_workers=jobs) as executor:
+        yield from executor.map(_call, [func] * len(filenames), filenames,
+                                [args] * len(filenames), chunksize=chunksize)
+
+
+def collect(results: Iterable[Tuple[str, object, str]]) -> Tuple[dict, dict]:
+    # split the output of run() into results and errors by file name
+    ok, failed = {}, {}
+    for filename, result, error in results:
+        if error is None:
+            ok[filename] = result
+        else:
+            failed[filename] = error
+    return ok, failed
@@ -0,0 +1,48 @@
+#!/usr/bin/env python3
+# Time of the symbol version gate over a sysroot: every ELF file below the
+# given directories (/usr/lib and /usr/bin by default) read once in a pool
+# of worker processes, the library definitions cached, and each file's
+# requirements checked against them.
+#
+#   python3 bench/abi_report.py [-j JOBS] [DIR ...]
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import batch
+from ElfVersions import VersionCache, check_sysroot
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('dirs', nargs='*')
+    parser.add_argument('-j', '--jobs', type=int, default=None,
+                        help='number of worker processes (default: one per CPU)')
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    files = list(batch.find_elf_files(args.dirs or ['/usr/lib', '/usr/bin']))
+    found = time.perf_counter()
+    cache = VersionCache()
+    reports = errors = missing = 0
+    for filename, report, error in check_sysroot(files, args.jobs, cache):
+        if error:
+            errors += 1
+        elif report is not None:
+            reports += 1
+            missing += bool(report.missing)
+    done = time.perf_counter()
+
+    print('files:           {} found in {:.2f}s'.format(len(files), found - start))
+    print('checked:         {} versioned, {} libraries cached, {} with missing versions, {} errors'.format(
+        reports, len(cache), missing, errors))
+    print('check:           {:.2f}s, {:.0f} files/s'.format(done - found, len(files) / (done - found)))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+# Function boundaries and call graph of a large .text. The input is
+# synthetic but made of real code: the .text of the given file (libLLVM
+# by default) repeated up to the requested size, with one FUNC symbol per
+# function of each copy, so the density of call opcodes and of real calls
+# is that of compiled code.
+#
+#   python3 bench/callgraph.py [--size MB] [FILE]
+
+import argparse
+import os
+import struct
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from ELF import ELF
+from ElfFunctions import ElfFunctions
+
+DEFAULT_FILES = ['/usr/lib/x86_64-linux-gnu/libLLVM-15.so.1', '/usr/lib/x86_64-linux-gnu/libLLVM-14.so.1',
+                 '/usr/lib64/libLLVM.so']
+
+SHT_PROGBITS = 1
+SHT_SYMTAB = 2
+SHT_STRTAB = 3
+SHF_ALLOC_EXEC = 0x6
+TEXT_ADDRESS = 0x400000
+
+
+def build(filename: str, size: int) -> tuple:
+    # the image, and the number of copies of the .text in it
+    with ELF(filename) as elf:
+        text = elf.sections['.text']
+        code = text.content
+        functions = [(function.start - text.address, function.end - function.start)
+                     for function in ElfFunctions(elf).get_functions()
+                     if text.address <= function.start < text.address + text.size]
+        machine = elf.header.e_machine
+
+    stride = (len(code) + 63) & ~63
+    copies = max(1, -(-size // stride))
+    body = (code + bytes(stride - len(code))) * copies
+
+    strtab = bytearray(b'\x00')
+    symtab = bytearray(bytes(24))
+    for copy in range(copies):
+        for offset, length in functions:
+            name = len(strtab)
+            strtab += b'f%d_%x\x00' % (copy, offset)
+            symtab += struct.pack('<IBBHQQ', name, 0x12, 0, 1, TEXT_ADDRESS + copy * stride + offset, length)
+    shstrtab = b'\x00.text\x00.symtab\x00.strtab\x00.shstrtab\x00'
+
+    text_at = 0x1000
+    symtab_at = text_at + len(body)
+    strtab_at = symtab_at + len(symtab)
+    shstrtab_at = strtab_at + len(strtab)
+    shoff = (shstrtab_at + len(shstrtab) + 7) & ~7
+
+    shdr = struct.Struct('<IIQQQQIIQQ')
+    headers = bytes(shdr.size)
+    headers += shdr.pack(1, SHT_PROGBITS, SHF_ALLOC_EXEC, TEXT_ADDRESS, text_at, len(body), 0, 0, 64, 0)
+    headers += shdr.pack(7, SHT_SYMTAB, 0, 0, symtab_at, len(symtab), 3, 1, 8, 24)
+    headers += shdr.pack(15, SHT_STRTAB, 0, 0, strtab_at, len(strtab), 0, 0, 1, 0)
+    headers += shdr.pack(23, SHT_STRTAB, 0, 0, shstrtab_at, len(shstrtab), 0, 0, 1, 0)
+
+    ident = b'\x7fELF' + bytes([2, 1, 1]) + bytes(9)
+    ehdr = ident + struct.pack('<H', 2) + machine + struct.pack('<IQQQIHHHHHH', 1, TEXT_ADDRESS, 0, shoff,
+                                                                 0, 64, 0, 0, 64, 5, 4)
+
+    image = bytearray(ehdr)
+    image += bytes(text_at - len(image))
+    image += body + symtab + strtab + shstrtab
+    image += bytes(shoff - len(image))
+    image += headers
+    return bytes(image), copies
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('file', nargs='?')
+    parser.add_argument('--size', type=int, default=200, help='size of the .text in MB (default 200)')
+    args = parser.parse_args()
+
+    filename = args.file or next((f for f in DEFAULT_FILES if os.path.exists(f)), None)
+    if filename is None:
+        print('ERROR: no libLLVM found, give a file with a large .text')
+        return 1
+    image, copies = build(filename, args.size << 20)
+
+    with tempfile.NamedTemporaryFile(suffix='.elf') as f:
+        f.write(image)
+        f.flush()
+
+        with ELF(f.name) as elf:
+            text_size = elf.sections['.text'].size
+            start = time.perf_counter()
+            functions = ElfFunctions(elf)
+            table = functions.get_functions()
+            found = time.perf_counter()
+            sites, _ = functions.get_call_sites()
+            scanned = time.perf_counter()
+            graph = functions.get_call_graph()
+            grouped = time.perf_counter()
+
+    print('.text:           {:.0f} MB, {} copies of {}'.format(text_size / (1 << 20), copies, filename))
+    print('functions:       {:>9d} in {:6.2f}s'.format(len(table), found - start))
+    print('call sites:      {:>9d} in {:6.2f}s, {:.0f} MB/s'.format(
+        len(sites), scanned - found, text_size / (1 << 20) / (scanned - found)))
+    print('call graph:      {:>9d} callers in {:6.2f}s'.format(len(graph), grouped - scanned))
+    print('total:           {:6.2f}s'.format(grouped - start))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
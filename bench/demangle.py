@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+# Demangling throughput in names per second. The names are the mangled
+# symbols of the given files (libstdc++ by default), first each one once
+# with an empty cache, then a larger batch where they recur the way the
+# same instantiations recur across the libraries of a system.
+#
+#   python3 bench/demangle.py [--repeat N] [FILE ...]
+
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from ELF import ELF
+from ElfDemangle import demangle, demangle_many
+
+DEFAULT_FILES = ['/usr/lib/x86_64-linux-gnu/libstdc++.so.6', '/usr/lib64/libstdc++.so.6',
+                 '/usr/lib/libstdc++.so.6']
+
+
+def load(filenames: list) -> list:
+    names = set()
+    for filename in filenames:
+        with ELF(filename) as elf:
+            for symtab in elf.get_symbol_tables():
+                for i in range(len(symtab)):
+                    name = symtab.get_name(i)
+                    if name.startswith(('_Z', '_R')):
+                        names.add(name)
+    return sorted(names)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('files', nargs='*')
+    parser.add_argument('--repeat', type=int, default=20,
+                        help='how many times each name occurs in the batch (default 20)')
+    args = parser.parse_args()
+
+    files = args.files or [f for f in DEFAULT_FILES if os.path.exists(f)][:1]
+    if not files:
+        print('ERROR: no libstdc++ found, give the files to read the symbols of')
+        return 1
+    names = load(files)
+
+    demangle.cache_clear()
+    start = time.perf_counter()
+    results = demangle_many(names)
+    cold = time.perf_counter() - start
+    failed = sum(1 for name, result in zip(names, results) if name == result)
+
+    batch = names * args.repeat
+    random.Random(0).shuffle(batch)
+    demangle.cache_clear()
+    start = time.perf_counter()
+    demangle_many(batch)
+    warm = time.perf_counter() - start
+    info = demangle.cache_info()
+
+    print('names:           {} unique, {} not demangled'.format(len(names), failed))
+    print('uncached:        {:.0f} names/s'.format(len(names) / cold))
+    print('batch:           {} names, {:.0f} names/s, {:.1%} cache hits'.format(
+        len(batch), len(batch) / warm, info.hits / max(1, info.hits + info.misses)))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+# PC to FDE lookups per second, the way a sampling profiler unwinds: many
+# random addresses over the code of a large library (libLLVM by default).
+# The time to the first lookup shows that .eh_frame is not parsed up
+# front when there is an .eh_frame_hdr; --no-hdr measures the fallback
+# that indexes .eh_frame in one pass instead. The skewed run draws most
+# addresses from a few hot functions, as real profiles do.
+#
+#   python3 bench/eh_frame.py [--count N] [--no-hdr] [FILE]
+
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from ELF import ELF
+from ElfEhFrame import ElfEhFrame
+
+DEFAULT_FILES = ['/usr/lib/x86_64-linux-gnu/libLLVM-15.so.1', '/usr/lib/x86_64-linux-gnu/libLLVM-14.so.1',
+                 '/usr/lib64/libLLVM.so', '/usr/lib/x86_64-linux-gnu/libstdc++.so.6']
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('file', nargs='?')
+    parser.add_argument('--count', type=int, default=1000000, help='number of lookups (default 1000000)')
+    parser.add_argument('--no-hdr', action='store_true', help='ignore .eh_frame_hdr')
+    args = parser.parse_args()
+
+    filename = args.file or next((f for f in DEFAULT_FILES if os.path.exists(f)), None)
+    if filename is None:
+        print('ERROR: no libLLVM found, give a file with an .eh_frame')
+        return 1
+
+    with ELF(filename) as elf:
+        text = elf.sections['.text']
+        rng = random.Random(0)
+        pcs = [rng.randrange(text.address, text.address + text.size) for _ in range(args.count)]
+
+        start = time.perf_counter()
+        eh_frame = ElfEhFrame(elf)
+        if args.no_hdr:
+            eh_frame._hdr = None
+        first = eh_frame.lookup(pcs[0])
+        opened = time.perf_counter()
+        found = sum(1 for pc in pcs if eh_frame.lookup(pc) is not None)
+        done = time.perf_counter()
+
+        hot = pcs[:max(1, args.count // 1000)]
+        skewed = [rng.choice(hot) if rng.random() < 0.9 else pc for pc in pcs]
+        skewed_start = time.perf_counter()
+        for pc in skewed:
+            eh_frame.lookup(pc)
+        skewed_done = time.perf_counter()
+
+    print('file:            {}'.format(filename))
+    print('first lookup:    {:.3f}s ({})'.format(opened - start, first))
+    print('lookups:         {} in {:.2f}s, {:.0f}/s, {:.1%} covered'.format(
+        args.count, done - opened, args.count / (done - opened), found / args.count))
+    print('skewed lookups:  {} in {:.2f}s, {:.0f}/s'.format(
+        args.count, skewed_done - skewed_start, args.count / (skewed_done - skewed_start)))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,58 @@
+#!/usr/bin/env python3
+# Throughput of the per-section byte statistics over a large file
+# (libLLVM by default): the histogram of every section counted in place
+# in the mmap, with numpy if it is installed and with the standard library
+# otherwise, against counting each byte value with bytes.count.
+#
+#   python3 bench/entropy.py [-j JOBS] [FILE]
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from ELF import ELF
+import ElfEntropy
+
+DEFAULT_FILES = ['/usr/lib/x86_64-linux-gnu/libLLVM-15.so.1', '/usr/lib/x86_64-linux-gnu/libLLVM-14.so.1',
+                 '/usr/lib64/libLLVM.so', '/usr/lib/x86_64-linux-gnu/libstdc++.so.6']
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('file', nargs='?')
+    parser.add_argument('-j', '--jobs', type=int, default=1, help='number of worker processes')
+    args = parser.parse_args()
+
+    filename = args.file or next((f for f in DEFAULT_FILES if os.path.exists(f)), None)
+    if filename is None:
+        print('ERROR: no libLLVM found, give a large file')
+        return 1
+
+    with ELF(filename) as elf:
+        entropy = ElfEntropy.ElfEntropy(elf, jobs=args.jobs)
+        size = sum(section.size for section in entropy.get_sections())
+        start = time.perf_counter()
+        stats = entropy.get_stats()
+        counted = time.perf_counter() - start
+
+        # the same on one section with 256 passes of bytes.count
+        text = max(entropy.get_sections(), key=lambda section: section.size)
+        content = text.content
+        start = time.perf_counter()
+        counts = [content.count(value) for value in range(256)]
+        passes = time.perf_counter() - start
+        assert tuple(counts) == next(s.histogram for s in stats if s.offset == text.offset)
+
+    print('file:            {}, {} sections, {:.0f} MB'.format(filename, len(stats), size / (1 << 20)))
+    print('counting:        {}'.format('numpy' if ElfEntropy.numpy is not None else 'translate and count'))
+    print('statistics:      {:.2f}s, {:.0f} MB/s'.format(counted, size / (1 << 20) / counted))
+    print('bytes.count:     {:.2f}s for {}, {:.0f} MB/s'.format(
+        passes, text.name, text.size / (1 << 20) / passes))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+# The sliding-window entropy map over a large file: a copy of an ELF file
+# grown to the given size with copies of its own content, a block of
+# random bytes (standing in for a compressed payload) in the middle and
+# zeros at the end, scanned in one streaming pass. Prints the throughput,
+# the memory of the process outside of the mapping, and the high-entropy
+# regions found, which should be the payload alone.
+#
+#   python3 bench/entropy_map.py [--size MB] [--window N] [--stride N] [FILE]
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from ELF import ELF
+import ElfEntropy
+
+PAYLOAD = 4 << 20
+
+
+def anonymous_memory() -> int:
+    # resident bytes not backed by a file, which leaves out the mmap
+    with open('/proc/self/status') as f:
+        for line in f:
+            if line.startswith('RssAnon:'):
+                return int(line.split()[1]) << 10
+    return 0
+
+
+def build(f, filename: str, size: int) -> int:
+    # the offset of the payload
+    with open(filename, 'rb') as original:
+        content = original.read()
+    f.write(content)
+    filler = content * max(1, (16 << 20) // len(content))
+    written = len(content)
+    payload_at = None
+    while written < size * 3 // 4:
+        if payload_at is None and written >= size // 2:
+            payload_at = written
+            f.write(os.urandom(PAYLOAD))
+            written += PAYLOAD
+        chunk = filler[:size * 3 // 4 - written]
+        f.write(chunk)
+        written += len(chunk)
+    f.truncate(size)
+    f.flush()
+    return payload_at
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('file', nargs='?', default='/bin/ls')
+    parser.add_argument('--size', type=int, default=4096, help='size of the file in MB (default 4096)')
+    parser.add_argument('--window', type=int, default=1 << 16, help='window in bytes (default 65536)')
+    parser.add_argument('--stride', type=int, default=1 << 14, help='stride in bytes (default 16384)')
+    args = parser.parse_args()
+
+    with tempfile.NamedTemporaryFile(suffix='.elf') as f:
+        payload_at = build(f, args.file, args.size << 20)
+        memory = anonymous_memory()
+        with ELF(f.name) as elf:
+            entropy_map = ElfEntropy.ElfEntropyMap(elf, args.window, args.stride)
+            start = time.perf_counter()
+            regions = entropy_map.find_regions(threshold=7.5)
+            elapsed = time.perf_counter() - start
+
+    print('file:            {} MB from {}, payload at 0x{:x}'.format(args.size, args.file, payload_at))
+    print('counting:        {}'.format('numpy' if ElfEntropy.numpy is not None else 'translate and count'))
+    print('scan:            {:.1f}s, {:.0f} MB/s ({:.0f} MB/s in the map itself)'.format(
+        elapsed, args.size / elapsed, entropy_map.throughput / (1 << 20)))
+    print('memory:          {:+.1f} MB anonymous during the scan'.format((anonymous_memory() - memory) / (1 << 20)))
+    for region in regions:
+        print('region:          0x{:x}-0x{:x} {:.3f} bits/byte in {}'.format(
+            region.start, region.end, region.max_entropy, ', '.join(region.components)))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+# Mutation fuzzer for the parser. Seed files are corrupted in memory (bit
+# flips, random header and table fields, truncation) and parsed through a
+# MemberView, so that no file is written. It reports the throughput, the
+# exceptions other than ElfFormatError (which is the only one a broken
+# file may raise) and the peak memory allocated while parsing one input,
+# which has to stay bounded by a small multiple of the input size (with
+# 64 KiB of slack for the fixed cost of the parser objects).
+#
+#   python3 bench/fuzz.py [-n ITERATIONS] [--seed N] [SEED_FILE ...]
+
+import argparse
+import os
+import random
+import sys
+import time
+import traceback
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from ELF import ELF
+from ElfArchive import MemberView
+from ElfValidation import ElfFormatError
+
+DEFAULT_SEEDS = ['/bin/ls', '/bin/true']
+SLACK = 64 * 1024
+
+
+def mutate(data: bytes, rng: 'random.Random') -> bytes:
+    buf = bytearray(data)
+    elf64 = len(buf) > 4 and buf[4] == 2
+    word = 8 if elf64 else 4
+
+    kind = rng.randrange(5)
+    if kind == 0:
+        # flip a few bits anywhere
+        for _ in range(rng.randint(1, 16)):
+            i = rng.randrange(len(buf))
+            buf[i] ^= 1 << rng.randrange(8)
+    elif kind == 1:
+        # random value in a field of the ELF header
+        offset = rng.choice([16, 18, 20, 24, 24 + word, 24 + 2 * word,
+                             36 + 2 * word, 38 + 2 * word, 40 + 2 * word,
+                             42 + 2 * word, 44 + 2 * word, 46 + 2 * word])
+        size = 2 if offset >= 36 + 2 * word or offset < 20 else (4 if offset == 20 else word)
+        buf[offset:offset+size] = rng.getrandbits(8 * size).to_bytes(size, 'little')
+    elif kind == 2:
+        # random words over the section or segment tables
+        table = int.from_bytes(buf[24 + word * rng.randint(1, 2):24 + word * rng.randint(1, 2) + word], 'little')
+        for _ in range(rng.randint(1, 8)):
+            i = (table + rng.randrange(4096)) % max(1, len(buf) - word)
+            buf[i:i+word] = rng.choice([0, 0xff, 0xffff, 1 << 31, (1 << 8 * word) - 1,
+                                        rng.getrandbits(8 * word)]).to_bytes(word, 'little')
+    elif kind == 3:
+        # truncate
+        del buf[rng.randrange(len(buf)):]
+    else:
+        # overwrite a random block with noise
+        i = rng.randrange(len(buf))
+        n = rng.randint(1, 256)
+        buf[i:i+n] = bytes(rng.getrandbits(8) for _ in range(min(n, len(buf) - i)))
+    return bytes(buf)
+
+
+def exercise(elf: 'ELF'):
+    # walk everything the parser exposes
+    str(elf.header)
+    for segment in elf.segments:
+        str(segment)
+    for section in elf.sections:
+        section.name
+        len(section.content)
+    for symtab in elf.get_symbol_tables():
+        for i in range(min(len(symtab), 64)):
+            symtab.get_name(i)
+    elf.get_notes()
+    elf.get_layout().get_stats()
+    elf.get_segment_mapping()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('seeds', nargs='*', default=DEFAULT_SEEDS)
+    parser.add_argument('-n', '--iterations', type=int, default=2000)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    corpus = []
+    for filename in args.seeds:
+        with open(filename, 'rb') as f:
+            corpus.append(f.read())
+
+    rejected = 0
+    with_issues = 0
+    crashes = {}
+    worst_peak = 0
+    worst_ratio = 0.0
+    total_bytes = 0
+    elapsed = 0.0
+
+    tracemalloc.start()
+    for _ in range(args.iterations):
+        data = mutate(rng.choice(corpus), rng)
+        if not data:
+            continue
+        total_bytes += len(data)
+
+        tracemalloc.reset_peak()
+        before = tracemalloc.get_traced_memory()[0]
+        start = time.perf_counter()
+        try:
+            with ELF('<fuzz>', MemberView(data, 0, len(data))) as elf:
+                exercise(elf)
+                with_issues += bool(elf.issues)
+        except ElfFormatError:
+            rejected += 1
+        except Exception as e:
+            key = '{}: {}'.format(type(e).__name__, str(e)[:60])
+            if key not in crashes:
+                crashes[key] = traceback.format_exc()
+        elapsed += time.perf_counter() - start
+        peak = tracemalloc.get_traced_memory()[1] - before
+        worst_peak = max(worst_peak, peak)
+        worst_ratio = max(worst_ratio, peak / max(len(data), SLACK))
+    tracemalloc.stop()
+
+    print('inputs:              {}'.format(args.iterations))
+    print('throughput:          {:.0f} files/s, {:.1f} MB/s'.format(
+        args.iterations / elapsed, total_bytes / elapsed / 1e6))
+    print('rejected (fatal):    {}'.format(rejected))
+    print('parsed with issues:  {}'.format(with_issues))
+    print('peak memory:         {} bytes, {:.2f}x the input'.format(worst_peak, worst_ratio))
+    print('unexpected errors:   {}'.format(len(crashes)))
+    for key, tb in crashes.items():
+        print('---')
+        print(tb)
+    return 1 if crashes else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+# Time of the hardening report over every ELF file below the given
+# directories (/usr/lib and /usr/bin by default): check_file(), which only
+# reads the header, the program headers and the dynamic data, against the
+# same report built from a full ELF object, whose results it is checked
+# against. Prints the summary of the files.
+#
+#   python3 bench/hardening.py [-j JOBS] [DIR ...]
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from ELF import ELF
+import batch
+from ElfHardening import HardeningSummary, check_elf, check_files
+
+
+def check_object(filename: str):
+    with ELF(filename) as elf:
+        return check_elf(elf)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('dirs', nargs='*')
+    parser.add_argument('-j', '--jobs', type=int, default=1,
+                        help='number of worker processes (default 1)')
+    args = parser.parse_args()
+
+    files = list(batch.find_elf_files(args.dirs or ['/usr/lib', '/usr/bin']))
+    size = sum(os.path.getsize(filename) for filename in files)
+
+    start = time.perf_counter()
+    summary = HardeningSummary()
+    reports = {}
+    for filename, hardening, error in check_files(files, args.jobs):
+        if error:
+            summary.add_error()
+        else:
+            summary.add(hardening)
+            reports[filename] = hardening
+    elapsed = time.perf_counter() - start
+
+    start = time.perf_counter()
+    wrong = 0
+    for filename, hardening, error in batch.run(check_object, files, (), args.jobs):
+        if not error and filename in reports and reports[filename] != hardening:
+            wrong += 1
+            print('MISMATCH {}: {} != {}'.format(filename, reports[filename], hardening))
+    elapsed_objects = time.perf_counter() - start
+
+    print(summary)
+    print('files:           {} ({:.0f} MB)'.format(len(files), size / (1 << 20)))
+    print('check_file:      {:.2f}s, {:.0f} files/s'.format(elapsed, len(files) / elapsed))
+    print('ELF objects:     {:.2f}s, {:.0f} files/s'.format(elapsed_objects, len(files) / elapsed_objects))
+    print('wrong:           {}'.format(wrong))
+    return 1 if wrong else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+# Cost of a page of hexdump wherever it is in a large section (the .text
+# of libLLVM by default): pages at random offsets rendered by the tiles
+# straight from the mmap, against slicing the page and formatting it with
+# hexdump(). The last run pages up and down around a few spots, as a
+# viewer does, and shows what the tile cache saves.
+#
+#   python3 bench/hexdump.py [--pages N] [--lines N] [--section NAME] [FILE]
+
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from ELF import ELF
+from util import BYTES_PER_LINE, HexdumpTiles, hexdump
+
+DEFAULT_FILES = ['/usr/lib/x86_64-linux-gnu/libLLVM-15.so.1', '/usr/lib/x86_64-linux-gnu/libLLVM-14.so.1',
+                 '/usr/lib64/libLLVM.so', '/usr/lib/x86_64-linux-gnu/libstdc++.so.6']
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('file', nargs='?')
+    parser.add_argument('--pages', type=int, default=20000, help='number of pages (default 20000)')
+    parser.add_argument('--lines', type=int, default=50, help='lines per page (default 50)')
+    parser.add_argument('--section', default='.text', help='section to page through (default .text)')
+    args = parser.parse_args()
+
+    filename = args.file or next((f for f in DEFAULT_FILES if os.path.exists(f)), None)
+    if filename is None:
+        print('ERROR: no libLLVM found, give a file with a large section')
+        return 1
+
+    with ELF(filename) as elf:
+        section = elf.sections[args.section]
+        start, end = section.offset, section.offset + section.size
+        tiles = HexdumpTiles(elf.mm, start, end)
+        rng = random.Random(0)
+        pages = [rng.randrange(len(tiles)) for _ in range(args.pages)]
+
+        began = time.perf_counter()
+        for line in pages:
+            tiles.get_lines(line, line + args.lines)
+        tiled = time.perf_counter() - began
+
+        began = time.perf_counter()
+        for line in pages:
+            offset = start + line * BYTES_PER_LINE
+            hexdump(elf.mm[offset:min(offset + args.lines * BYTES_PER_LINE, end)], offset)
+        sliced = time.perf_counter() - began
+
+        # a few spots, each paged through back and forth
+        scrolled = HexdumpTiles(elf.mm, start, end)
+        spots = pages[:max(1, args.pages // 100)]
+        began = time.perf_counter()
+        for line in (spot + rng.randrange(-5, 6) * args.lines for spot in spots for _ in range(100)):
+            scrolled.get_lines(line, line + args.lines)
+        browsed = time.perf_counter() - began
+
+    print('section:         {} of {}, {:.0f} MB, {} lines'.format(
+        args.section, filename, section.size / (1 << 20), len(tiles)))
+    print('random pages:    {:.1f} us/page tiled, {:.1f} us/page sliced'.format(
+        tiled / args.pages * 1e6, sliced / args.pages * 1e6))
+    print('browsing:        {:.1f} us/page, {} tile hits, {} misses'.format(
+        browsed / (len(spots) * 100) * 1e6, scrolled.hits, scrolled.misses))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+# Parse time of relocatable objects with a growing number of sections, as
+# produced by -ffunction-sections at scale. The objects are synthetic: one
+# one-byte PROGBITS section and one function symbol per section, which
+# beyond 65279 sections needs extended numbering (section count and string
+# table index in section 0) and a SYMTAB_SHNDX table. The time per section
+# should stay flat as the count grows, and looking up a single section by
+# index or by name should not cost a decode of the whole table.
+#
+#   python3 bench/many_sections.py [COUNT ...]
+
+import os
+import struct
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from ELF import ELF
+
+SHT_PROGBITS = 1
+SHT_SYMTAB = 2
+SHT_STRTAB = 3
+SHT_SYMTAB_SHNDX = 18
+SHF_ALLOC_EXEC = 0x6
+SHN_LORESERVE = 0xff00
+SHN_XINDEX = 0xffff
+
+
+def build(count: int) -> bytes:
+    # section layout: 0 NULL, 1..count code, then .shstrtab .symtab
+    # .strtab .symtab_shndx
+    shstrtab = bytearray(b'\x00.shstrtab\x00.symtab\x00.strtab\x00.symtab_shndx\x00')
+    strtab = bytearray(b'\x00')
+    code_names, sym_names = [], []
+    for i in range(count):
+        code_names.append(len(shstrtab))
+        shstrtab += b'.text.f%d\x00' % i
+        sym_names.append(len(strtab))
+        strtab += b'f%d\x00' % i
+
+    nsections = count + 5
+    shstrndx = count + 1
+    code = b'\xc3' * count
+    symtab = bytearray(bytes(24))
+    xindex = bytearray(bytes(4))
+    for i in range(count):
+        ndx = i + 1
+        symtab += struct.pack('<IBBHQQ', sym_names[i], 0x12, 0, ndx if ndx < SHN_LORESERVE else SHN_XINDEX, 0, 1)
+        xindex += struct.pack('<I', ndx)
+
+    code_at = 64
+    shstrtab_at = code_at + len(code)
+    symtab_at = (shstrtab_at + len(shstrtab) + 7) & ~7
+    strtab_at = symtab_at + len(symtab)
+    xindex_at = strtab_at + len(strtab)
+    shoff = (xindex_at + len(xindex) + 7) & ~7
+
+    shdr = struct.Struct('<IIQQQQIIQQ')
+    headers = bytearray(shdr.pack(0, 0, 0, 0, 0, nsections, shstrndx, 0, 0, 0))
+    for i in range(count):
+        headers += shdr.pack(code_names[i], SHT_PROGBITS, SHF_ALLOC_EXEC, 0, code_at + i, 1, 0, 0, 1, 0)
+    headers += shdr.pack(1, SHT_STRTAB, 0, 0, shstrtab_at, len(shstrtab), 0, 0, 1, 0)
+    headers += shdr.pack(11, SHT_SYMTAB, 0, 0, symtab_at, len(symtab), count + 3, 1, 8, 24)
+    headers += shdr.pack(19, SHT_STRTAB, 0, 0, strtab_at, len(strtab), 0, 0, 1, 0)
+    headers += shdr.pack(27, SHT_SYMTAB_SHNDX, 0, 0, xindex_at, len(xindex), count + 2, 0, 4, 4)
+
+    ident = b'\x7fELF' + bytes([2, 1, 1]) + bytes(9)
+    ehdr = ident + struct.pack('<HHIQQQIHHHHHH', 1, 62, 1, 0, 0, shoff, 0, 64, 0, 0, 64, 0, SHN_XINDEX)
+
+    image = bytearray(ehdr)
+    image += code
+    image += shstrtab
+    image += bytes(symtab_at - len(image))
+    image += symtab + strtab + xindex
+    image += bytes(shoff - len(image))
+    image += headers
+    return bytes(image)
+
+
+def measure(count: int):
+    with tempfile.NamedTemporaryFile(suffix='.o') as f:
+        f.write(build(count))
+        f.flush()
+
+        start = time.perf_counter()
+        with ELF(f.name) as elf:
+            by_index = elf.sections[count // 2]
+            indexed = time.perf_counter() - start
+            by_name = elf.sections['.text.f%d' % (count // 2 - 1)]
+            named = time.perf_counter() - start
+            assert by_index is by_name
+
+        start = time.perf_counter()
+        with ELF(f.name) as elf:
+            list(elf.sections)
+            parsed = time.perf_counter() - start
+            symtab = elf.get_symbol_tables()[0]
+            total = time.perf_counter() - start
+
+            # check the extended numbering came through
+            assert elf.sections.num == count + 5, elf.sections.num
+            assert elf.section_table.strndx == count + 1
+            last = count
+            assert symtab.shndx[last] == last, symtab.shndx[last]
+            assert elf.get_section_by_index(last).name == '.text.f%d' % (count - 1)
+            assert not elf.issues, list(elf.issues)[:3]
+
+    print('{:>8d} sections  one by index {:7.3f}s  by name {:7.3f}s  '
+          'all {:7.3f}s  with symbols {:7.3f}s  {:6.2f} us/section'.format(
+              count, indexed, named, parsed, total, total / count * 1e6))
+
+
+def main():
+    counts = [int(arg) for arg in sys.argv[1:]] or [62500, 125000, 250000, 500000]
+    for count in counts:
+        measure(count)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+# Cost of the parse instrumentation: the ELF files below the given
+# directories (/usr/bin by default) opened with their headers, sections
+# and symbol tables decoded, without stats, with stats and with stats and
+# a trace. The per-phase table of the instrumented runs is printed last.
+#
+#   python3 bench/parse_stats.py [--rounds N] [DIR ...]
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import batch
+from ELF import ELF
+from ElfStats import ElfStats
+
+
+def parse_all(files: list, stats: 'ElfStats') -> float:
+    start = time.perf_counter()
+    for filename in files:
+        try:
+            with ELF(filename, stats=stats) as elf:
+                for section in elf.sections:
+                    pass
+                elf.get_symbol_tables()
+        except ValueError:
+            pass
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('dirs', nargs='*')
+    parser.add_argument('--rounds', type=int, default=3, help='runs of each kind, the best one counts (default 3)')
+    args = parser.parse_args()
+
+    files = list(batch.find_elf_files(args.dirs or ['/usr/bin']))
+    if not files:
+        print('ERROR: no ELF files found')
+        return 1
+
+    parse_all(files, None)      # warm the page cache
+    disabled = min(parse_all(files, None) for _ in range(args.rounds))
+    stats = None
+    enabled = traced = float('inf')
+    for _ in range(args.rounds):
+        stats = ElfStats()
+        enabled = min(enabled, parse_all(files, stats))
+        traced = min(traced, parse_all(files, ElfStats(trace=True)))
+
+    print('files:           {}'.format(len(files)))
+    print('disabled:        {:.3f}s'.format(disabled))
+    print('stats:           {:.3f}s ({:+.1%})'.format(enabled, enabled / disabled - 1))
+    print('stats and trace: {:.3f}s ({:+.1%})'.format(traced, traced / disabled - 1))
+    print()
+    print(stats, end='')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+# Going back and forth over many libraries, as symbol lookup across the
+# libraries of a process does: each step opens one of the files (drawn
+# mostly from a hot few), decodes its section headers and looks up a
+# section by name. ELF objects opened and closed every time, against the
+# pool at a few budgets, with its hit rate and the file descriptors and
+# bytes mapped at the end.
+#
+#   python3 bench/pool.py [--steps N] [--files N] [DIR ...]
+
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import batch
+from ELF import ELF
+from ElfPool import ElfPool
+
+
+def step(elf: 'ELF'):
+    for section in elf.sections:
+        pass
+    return elf.sections.get('.dynsym')
+
+
+def open_fds() -> int:
+    return len(os.listdir('/proc/self/fd'))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('dirs', nargs='*')
+    parser.add_argument('--steps', type=int, default=20000, help='number of files opened (default 20000)')
+    parser.add_argument('--files', type=int, default=500, help='number of distinct files (default 500)')
+    args = parser.parse_args()
+
+    files = []
+    for filename in batch.find_elf_files(args.dirs or ['/usr/lib/x86_64-linux-gnu']):
+        try:
+            with ELF(filename):
+                files.append(filename)
+        except (ValueError, OSError):
+            continue
+        if len(files) == args.files:
+            break
+    rng = random.Random(0)
+    hot = files[:max(1, len(files) // 20)]
+    order = [rng.choice(hot) if rng.random() < 0.8 else rng.choice(files) for _ in range(args.steps)]
+
+    start = time.perf_counter()
+    for filename in order:
+        with ELF(filename) as elf:
+            step(elf)
+    plain = time.perf_counter() - start
+    print('files:           {} distinct, {} steps'.format(len(files), len(order)))
+    print('open and close:  {:.2f}s'.format(plain))
+
+    fds = open_fds()
+    for max_files in (16, 64, len(files)):
+        with ElfPool(max_files=max_files) as pool:
+            start = time.perf_counter()
+            for filename in order:
+                with pool.open(filename) as elf:
+                    step(elf)
+            pooled = time.perf_counter() - start
+            print('pool of {:>4d}:    {:.2f}s ({:.1f}x), {:.1%} hits, {} evictions, {} fds, {:.0f} MB mapped'.format(
+                max_files, pooled, plain / pooled, pool.hits / len(order), pool.evictions,
+                open_fds() - fds, pool.mapped / (1 << 20)))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
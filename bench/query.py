@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+# Time of filter expressions over every ELF file below the given
+# directories (/usr/lib and /usr/bin by default): compiled over the table
+# rows with the header conjuncts pushed down, compiled without the
+# pushdown, and the same tests written by hand over the ElfSection and
+# ElfSegment objects, whose results the compiled ones are checked against.
+#
+#   python3 bench/query.py [-j JOBS] [DIR ...]
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from ELF import ELF
+import batch
+from ElfQuery import ElfQuery
+
+QUERIES = [
+    # (expression, the same by hand over the objects)
+    ('header.machine like "*AARCH64*" and section.name == .text',
+     lambda elf, s: 'AARCH64' in elf.header.get_machine() and s.name == '.text'),
+    ('section.flags has A and section.size > 1M',
+     lambda elf, s: 'A' in s.flags and s.size > 1 << 20),
+    ('header.type == EXEC and segment.type == LOAD and segment.flags has WE',
+     lambda elf, s: elf.header.get_type().startswith('EXEC') and s.get_type() == 'LOAD'
+                    and 'W' in s.get_flags() and 'E' in s.get_flags()),
+    ('header.type == DYN and (section.type == SYMTAB or section.name like ".debug_*")',
+     lambda elf, s: elf.header.get_type().startswith('DYN')
+                    and (s.type == 'SYMTAB' or s.name.startswith('.debug_'))),
+]
+
+
+def by_hand(filename: str, kind: str, test) -> list:
+    with ELF(filename) as elf:
+        if kind == 'section':
+            return [(s.index, s.name) for s in elf.sections if test(elf, s)]
+        return [(s.get_type(), s.get_offset()) for s in elf.segments if test(elf, s)]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('dirs', nargs='*')
+    parser.add_argument('-j', '--jobs', type=int, default=1,
+                        help='number of worker processes (default 1)')
+    args = parser.parse_args()
+
+    files = list(batch.find_elf_files(args.dirs or ['/usr/lib', '/usr/bin']))
+    print('files:           {}'.format(len(files)))
+    wrong = 0
+    for expression, test in QUERIES:
+        print(expression)
+        results = {}
+        for label, query in (('pushdown', ElfQuery(expression)), ('no pushdown', ElfQuery(expression, False))):
+            start = time.perf_counter()
+            results[label] = {filename: matches for filename, matches, _ in query.query_files(files, args.jobs)}
+            elapsed = time.perf_counter() - start
+            found = sum(len(matches or ()) for matches in results[label].values())
+            print('    {:<16s} {:.2f}s, {:.0f} files/s, {} found'.format(label + ':', elapsed, len(files) / elapsed, found))
+
+        kind = ElfQuery(expression).kind
+        start = time.perf_counter()
+        expected = {filename: found for filename, found, _ in batch.run(by_hand, files, (kind, test), args.jobs)}
+        elapsed = time.perf_counter() - start
+        print('    {:<16s} {:.2f}s, {:.0f} files/s'.format('objects:', elapsed, len(files) / elapsed))
+
+        for filename, found in expected.items():
+            for matches in results.values():
+                if found is None or matches.get(filename) is None:
+                    continue
+                if kind == 'section':
+                    got = [(match.index, match.name) for match in matches[filename]]
+                else:
+                    got = sorted((match.name, match.offset) for match in matches[filename])
+                    found = sorted(found)
+                if got != found:
+                    wrong += 1
+                    print('    MISMATCH {}: {} != {}'.format(filename, got, found))
+    print('wrong:           {}'.format(wrong))
+    return 1 if wrong else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+# Time and peak memory of the hardening report over a tar stream of the
+# given directories (/usr/lib and /usr/bin by default), piped from tar
+# into scan_tar() with a buffer of --buffer bytes, so that the files
+# bigger than it are streamed. The reports are checked against
+# check_file() on the files on disk.
+#
+#   python3 bench/stream.py [--buffer BYTES] [DIR ...]
+
+import argparse
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from ElfHardening import check_elf, check_file
+from ElfStream import DEFAULT_LIMIT, scan_tar
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('dirs', nargs='*')
+    parser.add_argument('--buffer', type=int, default=DEFAULT_LIMIT,
+                        help='bytes of a member held in memory (default 64 MiB)')
+    args = parser.parse_args()
+
+    dirs = [os.path.relpath(os.path.abspath(d), '/') for d in args.dirs or ['/usr/lib', '/usr/bin']]
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # only the regular files, not what the links point to
+    names = []
+    for d in dirs:
+        for root, _, files in os.walk(os.path.join('/', d)):
+            for name in files:
+                path = os.path.join(root, name)
+                if os.path.isfile(path) and not os.path.islink(path):
+                    names.append(os.path.relpath(path, '/'))
+    with tempfile.NamedTemporaryFile('w', suffix='.list') as listing:
+        listing.write(''.join(name + '\n' for name in names))
+        listing.flush()
+        tar = subprocess.Popen(['tar', '-cf', '-', '-C', '/', '--files-from', listing.name],
+                               stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+
+        start = time.perf_counter()
+        reports = {}
+        errors = 0
+        for name, hardening, error in scan_tar(tar.stdout, check_elf, limit=args.buffer):
+            if error:
+                errors += 1
+                print('ERROR {}: {}'.format(name, error))
+            else:
+                reports[name] = hardening
+        elapsed = time.perf_counter() - start
+        tar.wait()
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    wrong = streamed = 0
+    size = 0
+    for name, hardening in reports.items():
+        filename = os.path.join('/', name)
+        size += os.path.getsize(filename)
+        streamed += os.path.getsize(filename) > args.buffer
+        if check_file(filename) != hardening:
+            wrong += 1
+            print('MISMATCH {}: {} != {}'.format(filename, check_file(filename), hardening))
+
+    print('ELF members:     {} ({:.0f} MB), {} bigger than the buffer, {} errors'.format(
+        len(reports), size / (1 << 20), streamed, errors))
+    print('scan_tar:        {:.2f}s, {:.0f} files/s, {:.0f} MB/s'.format(
+        elapsed, len(reports) / elapsed, size / (1 << 20) / elapsed))
+    print('peak RSS:        {:.0f} MB ({:.0f} MB before, buffer {:.0f} MB)'.format(
+        peak / 1024, rss / 1024, args.buffer / (1 << 20)))
+    print('wrong:           {}'.format(wrong))
+    return 1 if wrong or errors else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
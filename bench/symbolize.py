@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+# Symbolizing the addresses of a live process, checked and timed: a child
+# process is spawned (sleep by default), the addresses of the functions
+# of its executable and libraries are computed from their symbols and the
+# load bias read from /proc/PID/maps, and random addresses inside those
+# functions are symbolized in batches. Every answer is checked against
+# the function the address was drawn from.
+#
+#   python3 bench/symbolize.py [--count N] [--batch N] [-- COMMAND ...]
+
+import argparse
+import os
+import random
+import subprocess
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from ELF import ELF
+from ElfSymbolizer import ElfSymbolizer, read_maps
+
+STT_FUNC = 2
+
+
+def expected_functions(pid: int) -> list:
+    # (address, size, name) of the function symbols of every file mapped
+    # executable, placed with the bias of that mapping
+    functions = []
+    seen = set()
+    for mapping in read_maps(pid):
+        if 'x' not in mapping.perms or not mapping.path.startswith('/') or mapping.path in seen:
+            continue
+        seen.add(mapping.path)
+        with ELF(mapping.path) as elf:
+            segment = next(segment for segment in elf.segments if segment.get_type() == 'LOAD'
+                           and 'E' in segment.get_flags())
+            bias = mapping.start - mapping.offset + segment.get_offset() - segment.get_vaddr()
+            for symtab in elf.get_symbol_tables():
+                for i in range(len(symtab)):
+                    if symtab.info[i] & 0xf == STT_FUNC and symtab.shndx[i]:
+                        functions.append((symtab.values[i] + bias, symtab.sizes[i], symtab.get_name(i)))
+    return functions
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('command', nargs='*')
+    parser.add_argument('--count', type=int, default=500000, help='number of addresses (default 500000)')
+    parser.add_argument('--batch', type=int, default=10000, help='addresses per batch (default 10000)')
+    args = parser.parse_args()
+
+    child = subprocess.Popen(args.command or ['sleep', '60'])
+    try:
+        time.sleep(0.2)
+        functions = expected_functions(child.pid)
+        rng = random.Random(0)
+        sized = [function for function in functions if function[1]]
+        drawn = [rng.choice(sized) for _ in range(args.count)]
+        addresses = [start + rng.randrange(size) for start, size, _ in drawn]
+
+        symbolizer = ElfSymbolizer()
+        start = time.perf_counter()
+        frames = symbolizer.symbolize(child.pid, addresses[:1])
+        indexed = time.perf_counter()
+        frames = []
+        for i in range(0, len(addresses), args.batch):
+            frames += symbolizer.symbolize(child.pid, addresses[i:i + args.batch])
+        done = time.perf_counter()
+    finally:
+        child.kill()
+        child.wait()
+
+    # aliases, sized or not, share an address, so any name at the same
+    # start will do
+    by_start = {}
+    for start_address, _, name in functions:
+        by_start.setdefault(start_address, set()).add(name)
+    wrong = sum(1 for frame, (start_address, _, _) in zip(frames, drawn)
+                if frame.name not in by_start[start_address] or frame.address - frame.offset != start_address)
+
+    print('process:         {} ({} files, {} functions)'.format(
+        ' '.join(args.command or ['sleep', '60']), len(symbolizer), len(functions)))
+    print('first batch:     {:.2f}s, indexing included'.format(indexed - start))
+    print('symbolized:      {} in {:.2f}s, {:.0f} addresses/s, {} wrong'.format(
+        len(frames), done - indexed, len(frames) / (done - indexed), wrong))
+    return 1 if wrong else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,5 +1,12 @@
+from collections import OrderedDict
 import re
 from string import printable, whitespace
+from typing import List
+
+BYTES_PER_LINE = 16
+# bytes shown as themselves in the decoded column: the printable ones but
+# whitespace, the rest as '.'
+DECODE_TABLE = bytes(b if 0x21 <= b <= 0x7e else 0x2e for b in range(256))
 
 def hexdump(v: 'bytes', offset: int = 0) -> str:
     # if offset provided use it, otherwise start from 0
@@ -7,26 +14,100 @@ def hexdump(v: 'bytes', offset: int = 0) -> str:
     # offset: 10 11 12 13 14 15 16 17 18 19 1a 1b 1c 1d 1e 1f   |   ................
     # offset: 20 21 22 23 24 25 26                              |   ........
     # 16 bytes per line
-    BYTES_PER_LINE = 16
-    OFFSET_BYTES_SEPARATOR = ':  '
-    BYTES_DECODED_SEPARATOR = '  |  '
-
-    dump = ''
-    chunk_start = 0
-    while True:
-        chunk_end = chunk_start + BYTES_PER_LINE
-        chunk = v[chunk_start:min(chunk_end, len(v))]  # do not overflow v!
-        if not chunk:
-            break
-
-        off = '0x{off:0{off_pad}x}'.format(off=offset+chunk_start, off_pad=8)
-        hex = '{hex:<{hex_pad}s}'.format(hex=tohex(chunk), hex_pad=47)
-        chars = '{chars:<{chars_pad}s}'.format(chars=decode(chunk), chars_pad=16)
-        dump += off + OFFSET_BYTES_SEPARATOR + hex + BYTES_DECODED_SEPARATOR + chars + '\n'
-
-        chunk_start += BYTES_PER_LINE
-
-    return dump
+    lines = hexdump_lines(v, 0, -(-len(v) // BYTES_PER_LINE), 0, len(v), offset)
+    return ''.join(line + '\n' for line in lines)
+
+def hexdump_lines(v: 'bytes', start_line: int, end_line: int, start: int = 0, end: int = None,
+                  offset: int = None) -> List[str]:
+    # lines [start_line, end_line) of the hexdump of v[start:end], without
+    # the newlines, labelled from offset (start by default). The bytes of
+    # line i are at start + 16 * i, so no line before start_line is looked
+    # at, and only the bytes of the lines asked for are read from v, which
+    # may be an mmap
+
+    # offset, ':  ', the bytes, '  |  ', the bytes decoded
+    LINE_FORMAT = '0x%08x:  %-47s  |  %-16s'
+
+    end = len(v) if end is None else end
+    offset = start if offset is None else offset
+    first = start + start_line * BYTES_PER_LINE
+    last = min(start + end_line * BYTES_PER_LINE, end)
+    if first >= last:
+        return []
+    chunk = v[first:last]
+    chars = chunk.translate(DECODE_TABLE).decode('ascii')
+
+    label = offset + start_line * BYTES_PER_LINE
+    return [LINE_FORMAT % (label + i, chunk[i:i+BYTES_PER_LINE].hex(' '), chars[i:i+BYTES_PER_LINE])
+            for i in range(0, len(chunk), BYTES_PER_LINE)]
+
+class HexdumpTiles:
+    # Random access to the lines of the hexdump of v[start:end], for the
+    # viewers that page through large sections or whole files. Lines are
+    # rendered a tile of tile_lines at a time, straight from the offset of
+    # the tile, and the last max_tiles tiles are kept, least recently used
+    # dropped first, so a page costs the same wherever it is and scrolling
+    # back and forth renders nothing twice.
+
+    def __init__(self, v: 'bytes', start: int = 0, end: int = None, offset: int = None,
+                 tile_lines: int = 64, max_tiles: int = 256):
+        self._v = v
+        self._start = start
+        self._end = len(v) if end is None else end
+        self._offset = start if offset is None else offset
+        self._tile_lines = tile_lines
+        self._max_tiles = max_tiles
+        self._tiles = OrderedDict()     # tile number -> its lines
+        self._hits = 0
+        self._misses = 0
+
+    def __len__(self):
+        return max(0, -(-(self._end - self._start) // BYTES_PER_LINE))
+
+    def _tile(self, n: int) -> List[str]:
+        lines = self._tiles.get(n)
+        if lines is not None:
+            self._hits += 1
+            self._tiles.move_to_end(n)
+            return lines
+        self._misses += 1
+        lines = hexdump_lines(self._v, n * self._tile_lines, (n + 1) * self._tile_lines,
+                              self._start, self._end, self._offset)
+        self._tiles[n] = lines
+        if len(self._tiles) > self._max_tiles:
+            self._tiles.popitem(last=False)
+        return lines
+
+    def get_line(self, line: int) -> str:
+        if not 0 <= line < len(self):
+            raise IndexError('hexdump line out of range')
+        n, i = divmod(line, self._tile_lines)
+        return self._tile(n)[i]
+
+    def get_lines(self, start_line: int, end_line: int) -> List[str]:
+        # the lines [start_line, end_line), cut to the ones there are
+        start_line = max(start_line, 0)
+        end_line = min(end_line, len(self))
+        lines = []
+        line = start_line
+        while line < end_line:
+            n, i = divmod(line, self._tile_lines)
+            tile = self._tile(n)[i:i + end_line - line]
+            lines += tile
+            line += len(tile)
+        return lines
+
+    def line_of_offset(self, offset: int) -> int:
+        # the line showing the byte labelled offset
+        return (offset - self._offset) // BYTES_PER_LINE
+
+    @property
+    def hits(self) -> int:
+        return self._hits
+
+    @property
+    def misses(self) -> int:
+        return self._misses
 
 def decode(v: bytes) -> str:
     s = ''